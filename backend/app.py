@@ -1,21 +1,37 @@
 import matplotlib
 matplotlib.use('Agg')
 
-from flask import Flask, jsonify, send_file, request
+from flask import Flask, Response, g, jsonify, send_file, request, stream_with_context
 from flask_cors import CORS
 import mne
 import io
+import json
+import base64
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 import logging
 import threading
 from functools import lru_cache
 from datetime import datetime
 
-# Configure logging
+import annotations
+import epochs
+import export
+import ica
+import live
+import metrics
+import reference
+import resample
+import search
+import source
+import spectral
+import stats
+import topomap
+from metrics import span
+
+# Configure logging (DEBUG in hot paths is costly, so it is opt-in via LOG_LEVEL)
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S'
 )
@@ -26,6 +42,25 @@ CORS(app)
 
 # Configuration
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['ENABLE_PROFILING'] = os.environ.get('ENABLE_PROFILING', 'false').lower() == 'true'
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR')
+# Derived artifacts (ICA models, ...) persist next to the MNE data so they survive restarts
+app.config['CACHE_DIR'] = os.environ.get(
+    'ENCEPHALIC_CACHE_DIR', os.path.join(os.path.expanduser('~'), 'mne_data', 'encephalic')
+)
+app.config['ICA_N_JOBS'] = int(os.environ.get('ICA_N_JOBS', -1))
+# EEG_RECORDING=synthetic serves a generated recording instead of downloading the MNE sample data
+app.config['EEG_RECORDING'] = os.environ.get('EEG_RECORDING', 'sample')
+# EEG_DTYPE=float32 stores the recording (and computes slices, topomaps and PSDs) in single precision
+app.config['EEG_DTYPE'] = os.environ.get('EEG_DTYPE', 'float64')
+# EEG_SOURCE=live serves info, data, topomap, PSD and bands from samples pushed to /api/live/push
+app.config['EEG_SOURCE'] = os.environ.get('EEG_SOURCE', 'file')
+app.config['LIVE_CHANNELS'] = os.environ.get('LIVE_CHANNELS', ','.join(live.CHANNELS)).split(',')
+app.config['LIVE_SFREQ'] = float(os.environ.get('LIVE_SFREQ', live.SFREQ))
+app.config['LIVE_SECONDS'] = float(os.environ.get('LIVE_SECONDS', live.SECONDS))
+
+# Endpoints served before the recording is loaded
+UNGUARDED_PATHS = ('/api/health', '/api/metrics')
 
 # Initialize app
 logger.info("Initializing Encephalic Backend")
@@ -39,9 +74,19 @@ def initialize_data():
     global _initialization_complete, _initialization_error
     try:
         logger.info("Starting data initialization...")
-        # Trigger lazy-loaded functions to cache data
-        get_data_path()
-        get_raw_data()
+        if is_live():
+            # Created before workers fork; the memory-mapped files are what they share
+            get_live_buffer()
+            topomap_renderer.prepare(get_live_info())
+        else:
+            # Trigger lazy-loaded functions to cache data
+            if not is_synthetic():
+                get_data_path()
+            get_recording()
+            # Block zone maps (and prefix moments) are built with the recording, so searches never scan it
+            get_stats_index()
+            # Shared with forked workers, like the recording itself
+            topomap_renderer.prepare(get_raw_data().info)
         _initialization_complete = True
         logger.info("Data initialization completed successfully")
     except Exception as e:
@@ -58,24 +103,296 @@ def get_data_path():
     logger.info(f"Subjects directory: {subjects_dir}")
     return data_path, subjects_dir
 
+def get_recording_path():
+    """Path of the recording served by this backend"""
+    data_path, _ = get_data_path()
+    return os.path.join(data_path, 'MEG', 'sample', 'sample_audvis_raw.fif')
+
+def is_synthetic():
+    return app.config['EEG_RECORDING'] == 'synthetic'
+
 @lru_cache(maxsize=1)
-def get_raw_data():
-    """Cache raw data loading for better performance"""
+def get_recording_fingerprint():
+    """Identity of the recording file, used to key artifacts persisted on disk"""
+    if is_synthetic():
+        # Generated from a fixed seed, so always the same recording
+        return 'synthetic'
+    return ica.recording_fingerprint(get_recording_path())
+
+@lru_cache(maxsize=1)
+def get_recording():
+    """
+    Cache raw data loading for better performance
+    Events are read from the stim channel before it is dropped with the non-EEG channels;
+    only the EEG channels are then loaded, and stored as EEG_DTYPE
+    """
     logger.info("Loading raw EEG data from cache or disk")
-    data_path, _ = get_data_path()
-    raw = mne.io.read_raw_fif(
-        os.path.join(data_path, 'MEG', 'sample', 'sample_audvis_raw.fif'),
-        preload=True
-    )
+    dtype = app.config['EEG_DTYPE']
+    if dtype not in ('float32', 'float64'):
+        raise ValueError(f"EEG_DTYPE must be float32 or float64, not {dtype!r}")
+    if is_synthetic():
+        raw = live.synthetic_recording()
+    else:
+        raw = mne.io.read_raw_fif(get_recording_path(), preload=False)
+    events = epochs.find_stim_events(raw)
     raw.pick_types(eeg=True)
-    logger.info(f"Raw data loaded: {len(raw.ch_names)} channels, {raw.times[-1]:.2f}s duration")
+    # MNE always loads float64; the single-precision copy replaces it before anything else sees it
+    raw.load_data()
+    raw._data = raw._data.astype(dtype, copy=False)
+    logger.info(f"Raw data loaded: {len(raw.ch_names)} channels, {raw.times[-1]:.2f}s duration, {len(events)} events")
+    return raw, events
+
+def get_raw_data():
+    """The cached EEG-only recording"""
+    return get_recording()[0]
+
+def get_events():
+    """Events (sample, previous, id) extracted at load, samples relative to the data array"""
+    return get_recording()[1]
+
+def load_raw():
+    """Fetch the cached recording, counting the lookup as a cache hit or miss"""
+    with span('load'):
+        hit = get_recording.cache_info().currsize > 0
+        raw = get_raw_data()
+    metrics.record_cache('raw', hit)
     return raw
 
+@lru_cache(maxsize=1)
+def get_annotation_store():
+    """Annotation store of this recording, seeded once with the annotations read from the file"""
+    store = annotations.AnnotationStore(
+        os.path.join(app.config['CACHE_DIR'], 'annotations.sqlite3'), get_recording_fingerprint()
+    )
+    imported = store.import_file_annotations(annotations.file_annotations(get_raw_data()))
+    if imported:
+        logger.info(f"Imported {imported} annotations from the recording file")
+    return store
+
+def is_live():
+    return app.config['EEG_SOURCE'] == 'live'
+
+@lru_cache(maxsize=1)
+def get_live_buffer():
+    """Live ring buffer, shared by all workers through memory-mapped files in the cache directory"""
+    buffer = live.LiveBuffer(
+        os.path.join(app.config['CACHE_DIR'], 'live'),
+        app.config['LIVE_CHANNELS'], app.config['LIVE_SFREQ'], app.config['LIVE_SECONDS']
+    )
+    logger.info(f"Live buffer ready: {len(buffer.ch_names)} channels, {buffer.capacity / buffer.sfreq:.1f}s kept")
+    return buffer
+
+@lru_cache(maxsize=1)
+def get_live_info():
+    """MNE info of the live channels, for topomaps and montages"""
+    buffer = get_live_buffer()
+    return live.live_info(buffer.ch_names, buffer.sfreq)
+
+@lru_cache(maxsize=16)
+def get_live_montage(key):
+    """Re-referencing operator for the live channels"""
+    info = get_live_info()
+    return reference.build_montage(key[0], info.ch_names, reference.channel_positions(info), *key[1:])
+
+def live_window(buffer, tmin, tmax, montage=None):
+    """
+    Signal window from the live buffer, clipped to the samples still held
+    tmin is the actual start of the returned window, in seconds since acquisition began
+    """
+    montage = montage or get_live_montage(('original', None, None, reference.N_NEIGHBORS))
+    start, window = buffer.window(tmin, tmax)
+    data = montage.mix(window)
+    return {
+        "labels": montage.labels,
+        "reference": montage.kind,
+        "data": data.tolist(),
+        "times": (np.arange(window.shape[1]) / buffer.sfreq).tolist(),
+        "sfreq": buffer.sfreq,
+        "tmin": start / buffer.sfreq,
+        "annotations": []
+    }
+
+def window_bounds(raw, tmin, tmax):
+    """Sample range [start, stop) covering tmin..tmax inclusive, clipped to the recording"""
+    if tmax < tmin:
+        raise ValueError("tmax must not be less than tmin")
+    start, stop = raw.time_as_index([max(0.0, tmin), max(0.0, tmax)], use_rounding=True)
+    return int(min(start, raw.n_times)), int(min(stop + 1, raw.n_times))
+
+def recording_info(raw):
+    """Recording metadata served by /api/eeg-info"""
+    return {
+        "n_channels": len(raw.ch_names),
+        "channel_names": raw.ch_names,
+        "sampling_freq": raw.info['sfreq'],
+        "duration": float(raw.times[-1]),
+        "n_samples": len(raw.times)
+    }
+
+@lru_cache(maxsize=16)
+def get_montage(key):
+    """Re-referencing operator for a parse_reference_params key; small, so several are kept"""
+    raw = get_raw_data()
+    return reference.build_montage(
+        key[0], raw.ch_names, reference.channel_positions(raw.info), *key[1:], dtype=raw._data.dtype
+    )
+
+def load_montage(key):
+    """Fetch a cached montage, counting the lookup as a cache hit or miss"""
+    hits = get_montage.cache_info().hits
+    montage = get_montage(key)
+    metrics.record_cache('montage', get_montage.cache_info().hits > hits)
+    return montage
+
+# Polyphase resampling for eeg-data; rates requested often get a whole-recording copy
+resampler = resample.Resampler()
+
+def data_window(raw, tmin, tmax, montage=None, sfreq=None):
+    """
+    Signal window served by /api/eeg-data; times are relative to the window start
+    A montage re-references the slice alone, never the recording; with sfreq the
+    window is anti-aliased and resampled on the recording-wide output grid
+    """
+    montage = montage or get_montage(('original', None, None, reference.N_NEIGHBORS))
+    if sfreq is None:
+        start, stop = window_bounds(raw, tmin, tmax)
+        # Slice the preloaded array; raw.copy().crop() would copy the whole recording first
+        data = montage.apply(raw._data, start, stop)
+        sfreq = raw.info['sfreq']
+    else:
+        up, down = resample.ratio(raw.info['sfreq'], sfreq)
+        sfreq = raw.info['sfreq'] * up / down
+        start, stop = resample.output_range(tmin, tmax, sfreq, resample.output_length(raw.n_times, up, down))
+        window, cached = resampler.window(raw._data, up, down, start, stop)
+        metrics.record_cache('resample', cached)
+        data = montage.mix(window)
+        stop += 1
+    return {
+        "labels": montage.labels,
+        "reference": montage.kind,
+        "data": data.tolist(),
+        "times": (np.arange(stop - start) / sfreq).tolist(),
+        "sfreq": sfreq,
+        # Onsets stay on the recording's clock, not relative to the window
+        "annotations": get_annotation_store().query(tmin, tmax)
+    }
+
+@lru_cache(maxsize=1)
+def get_spectrum():
+    """Welch PSD of the whole recording, shared by the PSD, band and bootstrap endpoints"""
+    return spectral.compute_psd(get_raw_data())
+
+def load_spectrum():
+    """Fetch the cached spectrum, counting the lookup as a cache hit or miss"""
+    if is_live():
+        # Maintained segment by segment as samples arrive, so there is nothing to cache
+        with span('compute'):
+            return get_live_buffer().spectrum()
+    hit = get_spectrum.cache_info().currsize > 0
+    with span('compute'):
+        spectrum = get_spectrum()
+    metrics.record_cache('psd', hit)
+    return spectrum
+
+def render_topomap(raw, time_point):
+    """PNG topographic map of the mean signal within ±0.5 s of time_point"""
+    with span('slice'):
+        times = raw.times
+
+        # Find closest time index
+        closest_time_index = (np.abs(times - time_point)).argmin()
+        logger.debug(f"Closest time index: {closest_time_index}, actual time: {times[closest_time_index]:.3f}s")
+
+        # Average over a small window (±0.5 seconds)
+        window_samples = int(0.5 * raw.info['sfreq'])
+        start_index = max(0, closest_time_index - window_samples)
+        stop_index = min(len(times), closest_time_index + window_samples)
+
+        logger.debug(f"Window: {start_index} to {stop_index} ({stop_index - start_index} samples)")
+
+        window = raw._data[:, start_index:stop_index]
+
+    with span('compute'):
+        data_at_time = window.mean(axis=1)
+
+    return topomap_png(data_at_time, raw.info, time_point)
+
+def render_live_topomap(buffer, time_point):
+    """PNG topographic map of the mean live signal within ±0.5 s of time_point"""
+    with span('slice'):
+        _, window = buffer.window(time_point - 0.5, time_point + 0.5)
+        if window.shape[1] == 0:
+            raise ValueError(f"no live samples near {time_point:.2f}s")
+
+    with span('compute'):
+        data_at_time = window.mean(axis=1)
+
+    return topomap_png(data_at_time, get_live_info(), time_point)
+
+# Pre-built figures, one per thread, so topomaps render concurrently under gthread workers
+topomap_renderer = topomap.TopomapRenderer()
+
+def topomap_png(data_at_time, info, time_point):
+    """Render one map of per-channel values as PNG bytes"""
+    with span('render'):
+        template = topomap_renderer.template(info, data_at_time)
+        template.update(data_at_time, time_point)
+
+    with span('serialize'):
+        return template.encode()
+
+@lru_cache(maxsize=64)
+def compute_evoked(event_id, tmin, tmax, baseline):
+    """
+    Evoked average and statistics for one condition (all events when event_id is None)
+    Cached by (event_id, tmin, tmax, baseline); callers must not mutate the arrays
+    """
+    raw = get_raw_data()
+    start, stop, times = epochs.epoch_samples(raw.info['sfreq'], tmin, tmax)
+    onsets = epochs.select_events(get_events(), event_id)[:, 0]
+    # raw._data is the preloaded array; raw.get_data() would copy the whole recording
+    data, _ = epochs.gather_epochs(raw._data, onsets, start, stop)
+    if len(data) == 0:
+        raise ValueError(f"No complete epochs for event_id={event_id}")
+    epochs.apply_baseline(data, times, baseline)
+    summary = epochs.summarize_epochs(data, times)
+    summary["times"] = times
+    return summary
+
+@app.before_request
+def start_request_timer():
+    """Start timing the request; registered first so rejected requests are measured too"""
+    profile = app.config['ENABLE_PROFILING'] and request.headers.get(metrics.PROFILE_HEADER) == '1'
+    g.request_timer = metrics.RequestTimer(
+        request.endpoint or 'unmatched',
+        profile=profile,
+        profile_dir=app.config['PROFILE_DIR']
+    )
+
+@app.after_request
+def finish_request_timer(response):
+    """Record request latency and expose the profile location when one was taken"""
+    timer = g.pop('request_timer', None)
+    if timer is None:
+        return response
+    if response.is_streamed:
+        # The body (bootstrap parts, exports, files) is produced after this hook, so the
+        # request is recorded when it has been sent; the header can only time the headers
+        status = response.status_code
+        response.call_on_close(lambda: timer.finish(status))
+        response.headers['Server-Timing'] = f'headers;dur={timer.elapsed() * 1000:.1f}'
+        return response
+    elapsed = timer.finish(response.status_code)
+    response.headers['Server-Timing'] = f'total;dur={elapsed * 1000:.1f}'
+    if timer.profile_path:
+        response.headers['X-Profile-Path'] = timer.profile_path
+    return response
+
 @app.before_request
 def check_initialization():
     """Check if data is initialized before processing requests"""
-    # Skip check for health endpoint
-    if request.path == '/api/health':
+    # Skip check for health and metrics endpoints
+    if request.path in UNGUARDED_PATHS:
         return None
 
     if _initialization_error:
@@ -101,6 +418,11 @@ def health_check():
         return jsonify(status), 503
     return jsonify(status), 200
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics for this worker process"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/eeg-data', methods=['GET'])
 def get_eeg_data():
     """Get EEG signal data"""
@@ -109,29 +431,39 @@ def get_eeg_data():
         # Get query parameters for time range
         tmin = float(request.args.get('tmin', 0))
         tmax = float(request.args.get('tmax', 10))
-        logger.debug(f"Time range: {tmin}s to {tmax}s")
+        sfreq = request.args.get('sfreq')
+        sfreq = float(sfreq) if sfreq else None
+        key = reference.parse_reference_params(request.args)
+        logger.debug(f"Time range: {tmin}s to {tmax}s, reference {key[0]}")
 
-        raw = get_raw_data()
+        if is_live():
+            if sfreq is not None:
+                raise ValueError("sfreq is not supported for live data")
+            buffer = get_live_buffer()
+            montage = get_live_montage(key)
+            with span('slice'):
+                payload = live_window(buffer, tmin, tmax, montage)
+            with span('serialize'):
+                return jsonify(payload)
+
+        raw = load_raw()
 
         if not raw.ch_names:
             logger.error("No EEG channels found in raw data")
             return jsonify({"error": "No EEG channels found"}), 400
 
-        # Crop data to requested time range
-        raw_cropped = raw.copy().crop(tmin=tmin, tmax=tmax)
-        data = raw_cropped.get_data()
-        signal_labels = raw_cropped.ch_names
-        times = raw_cropped.times.tolist()
+        montage = load_montage(key)
+        with span('slice'):
+            payload = data_window(raw, tmin, tmax, montage, sfreq)
 
-        logger.info(f"Returning EEG data: {len(signal_labels)} channels, {len(times)} time points")
+        logger.info(f"Returning EEG data: {len(payload['labels'])} channels, {len(payload['times'])} time points")
 
-        return jsonify({
-            "labels": signal_labels,
-            "data": data.tolist(),
-            "times": times,
-            "sfreq": raw.info['sfreq']
-        })
+        with span('serialize'):
+            return jsonify(payload)
 
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
     except Exception as e:
         logger.error(f"Error in get_eeg_data: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
@@ -141,82 +473,57 @@ def get_eeg_info():
     """Get EEG metadata"""
     logger.info("EEG info requested")
     try:
-        raw = get_raw_data()
-
-        info_data = {
-            "n_channels": len(raw.ch_names),
-            "channel_names": raw.ch_names,
-            "sampling_freq": raw.info['sfreq'],
-            "duration": raw.times[-1],
-            "n_samples": len(raw.times)
-        }
+        info_data = get_live_buffer().info() if is_live() else recording_info(load_raw())
 
         logger.debug(f"EEG info: {info_data['n_channels']} channels, {info_data['sampling_freq']} Hz")
 
-        return jsonify(info_data)
+        with span('serialize'):
+            return jsonify(info_data)
 
     except Exception as e:
         logger.error(f"Error in get_eeg_info: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/eeg-montage', methods=['GET'])
+def get_eeg_montage():
+    """Get sensor positions from the recording and the available re-references"""
+    try:
+        raw = load_raw()
+        positions = reference.channel_positions(raw.info)
+        with span('serialize'):
+            return jsonify({
+                "channel_names": raw.ch_names,
+                "positions": reference.positions_payload(raw.ch_names, positions),
+                "references": list(reference.REFERENCES),
+                "default_linked": [raw.ch_names[i] for i in reference.default_linked_refs(positions)]
+                if not np.isnan(positions).any() else None
+            })
+
+    except Exception as e:
+        logger.error(f"Error in get_eeg_montage: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/eeg-topomap/<time_point>', methods=['GET'])
 def generate_topomap(time_point):
     """Generate topographic map at specific time point"""
     try:
         time_point = float(time_point)
         logger.info(f"Topomap requested for time point: {time_point}s")
-        raw = get_raw_data()
-        times = raw.times
-
-        # Find closest time index
-        closest_time_index = (np.abs(times - time_point)).argmin()
-        logger.debug(f"Closest time index: {closest_time_index}, actual time: {times[closest_time_index]:.3f}s")
-
-        # Average over a small window (±0.5 seconds)
-        window_samples = int(0.5 * raw.info['sfreq'])
-        start_index = max(0, closest_time_index - window_samples)
-        stop_index = min(len(times), closest_time_index + window_samples)
-
-        logger.debug(f"Window: {start_index} to {stop_index} ({stop_index - start_index} samples)")
-
-        data_at_time = raw.get_data(start=start_index, stop=stop_index).mean(axis=1)
-
-        # Create topographic plot
-        fig, ax = plt.subplots(figsize=(8, 6), facecolor='#000000')
-        ax.set_facecolor('#000000')
-
-        im, _ = mne.viz.plot_topomap(
-            data_at_time,
-            raw.info,
-            axes=ax,
-            show=False,
-            cmap='RdBu_r',
-            contours=6
-        )
-
-        ax.set_title(
-            f'Topographic Map at {time_point:.2f}s',
-            color='white',
-            fontsize=14,
-            pad=20
-        )
-
-        # Customize colorbar
-        cbar = plt.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
-        cbar.ax.yaxis.set_tick_params(color='white')
-        cbar.ax.tick_params(labelcolor='white')
-        cbar.set_label('Amplitude (µV)', color='white', fontsize=12)
-        cbar.outline.set_edgecolor('white')
-
-        # Save to bytes
-        img = io.BytesIO()
-        plt.savefig(img, format='png', facecolor='#000000', bbox_inches='tight', dpi=150)
-        img.seek(0)
-        plt.close(fig)
+        if is_live():
+            img = io.BytesIO(render_live_topomap(get_live_buffer(), time_point))
+        else:
+            img = io.BytesIO(render_topomap(load_raw(), time_point))
 
         logger.info(f"Topomap generated successfully for {time_point:.2f}s")
-        return send_file(img, mimetype='image/png')
+        response = send_file(img, mimetype='image/png')
+        if is_live():
+            # Live maps change as samples arrive; no browser or proxy may keep a frame
+            response.headers['Cache-Control'] = 'no-store'
+        return response
 
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
     except Exception as e:
         logger.error(f"Error in generate_topomap: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
@@ -226,25 +533,17 @@ def get_power_spectral_density():
     """Get power spectral density data"""
     logger.info("PSD data requested")
     try:
-        raw = get_raw_data()
-
-        # Compute PSD
-        logger.debug("Computing power spectral density...")
-        spectrum = raw.compute_psd(fmax=50)
-        psds, freqs = spectrum.get_data(return_freqs=True)
-
-        # Average across channels
-        psd_mean = psds.mean(axis=0)
+        ch_names = get_live_buffer().ch_names if is_live() else load_raw().ch_names
+        psds, freqs = load_spectrum()
 
-        logger.info(f"PSD computed: {len(freqs)} frequency bins, {psds.shape[0]} channels")
+        logger.info(f"PSD ready: {len(freqs)} frequency bins, {psds.shape[0]} channels")
 
-        return jsonify({
-            "frequencies": freqs.tolist(),
-            "psd": psd_mean.tolist(),
-            "channel_psds": psds.tolist(),
-            "channel_names": raw.ch_names
-        })
+        with span('serialize'):
+            return jsonify(spectral.psd_payload(psds, freqs, ch_names))
 
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
     except Exception as e:
         logger.error(f"Error in get_power_spectral_density: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
@@ -254,37 +553,597 @@ def get_frequency_bands():
     """Get power in different frequency bands"""
     logger.info("Frequency band data requested")
     try:
-        raw = get_raw_data()
+        psds, freqs = load_spectrum()
 
-        # Define frequency bands
-        bands = {
-            'delta': (0.5, 4),
-            'theta': (4, 8),
-            'alpha': (8, 13),
-            'beta': (13, 30),
-            'gamma': (30, 50)
-        }
-
-        logger.debug("Computing PSD for frequency bands...")
-        spectrum = raw.compute_psd(fmax=50)
-        psds, freqs = spectrum.get_data(return_freqs=True)
-
-        band_powers = {}
-        for band_name, (fmin, fmax) in bands.items():
-            freq_mask = (freqs >= fmin) & (freqs < fmax)
-            # Average across both channels and frequencies
-            band_power = psds[:, freq_mask].mean()
-            band_powers[band_name] = float(band_power)
-            logger.debug(f"{band_name} ({fmin}-{fmax} Hz): {band_power:.4f} µV²/Hz")
+        with span('compute'):
+            band_powers = spectral.band_powers(psds, freqs)
 
         logger.info(f"Frequency bands computed: {list(band_powers.keys())}")
 
-        return jsonify(band_powers)
+        with span('serialize'):
+            return jsonify(band_powers)
 
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
     except Exception as e:
         logger.error(f"Error in get_frequency_bands: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/eeg-bootstrap', methods=['GET'])
+def get_eeg_bootstrap():
+    """
+    Everything the dashboard needs on mount, as one NDJSON stream
+    Parts (info, data, topomap, psd, bands) are flushed as each becomes ready,
+    cheapest first; psd and bands share one spectral computation
+    """
+    try:
+        tmin = float(request.args.get('tmin', 0))
+        tmax = float(request.args.get('tmax', 10))
+        time_point = float(request.args.get('time_point', 0.01))
+        logger.info(f"Bootstrap requested: window {tmin}-{tmax}s, topomap at {time_point}s")
+        buffer = get_live_buffer() if is_live() else None
+        raw = load_raw() if buffer is None else None
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+
+    def parts():
+        if buffer is not None:
+            yield 'info', buffer.info()
+            with span('slice'):
+                yield 'data', live_window(buffer, tmin, tmax)
+            png = render_live_topomap(buffer, time_point)
+            ch_names = buffer.ch_names
+        else:
+            yield 'info', recording_info(raw)
+            with span('slice'):
+                yield 'data', data_window(raw, tmin, tmax)
+            png = render_topomap(raw, time_point)
+            ch_names = raw.ch_names
+        image = base64.b64encode(png).decode('ascii')
+        yield 'topomap', {"time_point": time_point, "image": f"data:image/png;base64,{image}"}
+        psds, freqs = load_spectrum()
+        yield 'psd', spectral.psd_payload(psds, freqs, ch_names)
+        yield 'bands', spectral.band_powers(psds, freqs)
+
+    def body():
+        try:
+            for part, payload in parts():
+                with span('serialize'):
+                    line = json.dumps({"part": part, "data": payload})
+                yield line + '\n'
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-band
+            logger.error(f"Error in get_eeg_bootstrap: {str(e)}", exc_info=True)
+            yield json.dumps({"part": "error", "data": {"error": str(e)}}) + '\n'
+
+    return Response(stream_with_context(metrics.streamed(body())), mimetype='application/x-ndjson')
+
+@app.route('/api/live/push', methods=['POST'])
+def push_live():
+    """Append samples to the live buffer; float32 frames or JSON (see live.parse_push)"""
+    if not is_live():
+        return jsonify({"error": "Live mode is off; start the backend with EEG_SOURCE=live"}), 409
+    try:
+        buffer = get_live_buffer()
+        if request.args.get('reset', 'false').lower() == 'true':
+            buffer.reset()
+            logger.info("Live buffer reset")
+        with span('compute'):
+            samples = live.parse_push(request.get_data(), request.content_type, len(buffer.ch_names))
+            total = buffer.push(samples)
+        logger.debug(f"Live push: {samples.shape[1]} samples, {total} in total")
+        return jsonify({"received": samples.shape[1], "n_samples": total, "duration": total / buffer.sfreq})
+
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in push_live: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+def parse_epoch_params(args):
+    """Read event_id, tmin, tmax and baseline from query parameters (times rounded to ms)"""
+    event_id = args.get('event_id')
+    event_id = int(event_id) if event_id not in (None, '', 'all') else None
+    tmin = round(float(args.get('tmin', -0.2)), 3)
+    tmax = round(float(args.get('tmax', 0.5)), 3)
+    baseline = epochs.parse_baseline(args.get('baseline'), tmin)
+    return event_id, tmin, tmax, baseline
+
+@app.route('/api/eeg-events', methods=['GET'])
+def get_eeg_events():
+    """Get events extracted from the stim channel"""
+    logger.info("EEG events requested")
+    try:
+        raw = load_raw()
+        events = get_events()
+        ids, counts = np.unique(events[:, 2], return_counts=True)
+
+        with span('serialize'):
+            return jsonify({
+                "samples": events[:, 0].tolist(),
+                "times": (events[:, 0] / raw.info['sfreq']).tolist(),
+                "event_ids": events[:, 2].tolist(),
+                "counts": {str(i): int(n) for i, n in zip(ids, counts)}
+            })
+
+    except Exception as e:
+        logger.error(f"Error in get_eeg_events: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/eeg-evoked', methods=['GET'])
+def get_eeg_evoked():
+    """Get the evoked response (ERP) and per-condition statistics"""
+    try:
+        event_id, tmin, tmax, baseline = parse_epoch_params(request.args)
+        logger.info(f"Evoked requested: event_id={event_id}, {tmin}s to {tmax}s, baseline={baseline}")
+        raw = load_raw()
+
+        hit = compute_evoked.cache_info().hits
+        with span('compute'):
+            summary = compute_evoked(event_id, tmin, tmax, baseline)
+        metrics.record_cache('evoked', compute_evoked.cache_info().hits > hit)
+
+        with span('serialize'):
+            return jsonify({
+                "event_id": event_id,
+                "channel_names": raw.ch_names,
+                "times": summary["times"].tolist(),
+                "n_epochs": summary["n_epochs"],
+                "evoked": summary["evoked"].tolist(),
+                "std": summary["std"].tolist(),
+                "sem": summary["sem"].tolist(),
+                "gfp": summary["gfp"].tolist(),
+                "peak_latency": summary["peak_latency"],
+                "peak_gfp": summary["peak_gfp"]
+            })
+
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in get_eeg_evoked: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/eeg-epochs', methods=['GET'])
+def get_eeg_epochs():
+    """Get a page of individual epochs (params: event_id, tmin, tmax, baseline, start, count)"""
+    try:
+        event_id, tmin, tmax, baseline = parse_epoch_params(request.args)
+        start = max(0, int(request.args.get('start', 0)))
+        count = min(100, max(1, int(request.args.get('count', 10))))
+        logger.info(f"Epochs requested: event_id={event_id}, epochs {start}-{start + count}")
+        raw = load_raw()
+
+        with span('slice'):
+            first, stop, times = epochs.epoch_samples(raw.info['sfreq'], tmin, tmax)
+            events = epochs.select_events(get_events(), event_id)
+            page = events[start:start + count]
+            data, kept = epochs.gather_epochs(raw._data, page[:, 0], first, stop)
+
+        with span('compute'):
+            epochs.apply_baseline(data, times, baseline)
+
+        with span('serialize'):
+            return jsonify({
+                "event_id": event_id,
+                "channel_names": raw.ch_names,
+                "times": times.tolist(),
+                "n_total": len(events),
+                "onsets": (page[kept, 0] / raw.info['sfreq']).tolist(),
+                "epochs": data.tolist()
+            })
+
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in get_eeg_epochs: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/annotations', methods=['GET'])
+def get_annotations():
+    """Get annotations overlapping tmin..tmax (every annotation when neither is given)"""
+    try:
+        tmin = request.args.get('tmin', type=float)
+        tmax = request.args.get('tmax', type=float)
+        load_raw()
+        with span('slice'):
+            rows = get_annotation_store().query(tmin, tmax)
+
+        logger.info(f"Returning {len(rows)} annotations for {tmin}-{tmax}s")
+        with span('serialize'):
+            return jsonify({"annotations": rows, "count": len(rows)})
+
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in get_annotations: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/annotations', methods=['POST'])
+def create_annotations():
+    """Create annotations in one transaction (JSON body: {"annotations": [{onset, duration, description, kind, color}]})"""
+    try:
+        body = request.get_json(silent=True) or {}
+        items = body.get('annotations')
+        if not isinstance(items, list) or not items:
+            raise ValueError("annotations must be a non-empty list")
+        load_raw()
+        with span('compute'):
+            created = get_annotation_store().create(items)
+
+        logger.info(f"Created {len(created)} annotations")
+        return jsonify({"annotations": created, "count": len(created)}), 201
+
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in create_annotations: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/annotations', methods=['DELETE'])
+def delete_annotations():
+    """Delete annotations in one transaction (JSON body {"ids": [...]} or ?ids=1,2,3)"""
+    try:
+        body = request.get_json(silent=True) or {}
+        ids = body.get('ids')
+        if ids is None:
+            ids = [i for i in request.args.get('ids', '').split(',') if i]
+        if not isinstance(ids, list) or not ids:
+            raise ValueError("ids must be a non-empty list")
+        load_raw()
+        with span('compute'):
+            deleted = get_annotation_store().delete(ids)
+
+        logger.info(f"Deleted {deleted} annotations")
+        return jsonify({"deleted": deleted})
+
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in delete_annotations: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@lru_cache(maxsize=1)
+def get_stats_index():
+    """
+    Prefix moment index and whole-recording statistics, built in one streaming pass
+    Returns (StatsIndex, whole-recording stats dict)
+    """
+    raw = get_raw_data()
+    data = raw._data
+    index, moments = stats.StatsIndex.build(lambda a, b: data[:, a:b], data.shape[0], data.shape[1])
+    return index, moments.result()
+
+@app.route('/api/eeg-stats', methods=['GET'])
+def get_eeg_stats():
+    """Get per-channel statistics for the whole recording or a tmin..tmax window"""
+    try:
+        raw = load_raw()
+        window = request.args.get('tmin') is not None or request.args.get('tmax') is not None
+        tmin = float(request.args.get('tmin', 0))
+        tmax = float(request.args.get('tmax', raw.times[-1]))
+        logger.info(f"Stats requested: {f'{tmin}s to {tmax}s' if window else 'whole recording'}")
+
+        hit = get_stats_index.cache_info().currsize > 0
+        with span('compute'):
+            index, whole = get_stats_index()
+            if window:
+                start, stop = window_bounds(raw, tmin, tmax)
+                result = index.window(start, stop)
+            else:
+                start, stop = 0, raw.n_times
+                result = whole
+        metrics.record_cache('stats', hit)
+
+        with span('serialize'):
+            return jsonify({
+                **stats.serialize(result, raw.ch_names),
+                "tmin": float(start / raw.info['sfreq']),
+                "tmax": float((stop - 1) / raw.info['sfreq']),
+                "n_samples": int(stop - start)
+            })
+
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in get_eeg_stats: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/eeg-search', methods=['GET'])
+def search_eeg():
+    """Find threshold crossings or the top-k amplitude peaks, reading only blocks that can match"""
+    try:
+        raw = load_raw()
+        sfreq = raw.info['sfreq']
+        params = search.parse_search_params(request.args, sfreq)
+        picks = export.parse_channels(request.args.get('channels'), raw.ch_names)
+        tmin = float(request.args.get('tmin', 0))
+        tmax = float(request.args.get('tmax', raw.times[-1]))
+        start, stop = window_bounds(raw, tmin, tmax)
+        if stop <= start:
+            raise ValueError("empty window")
+        logger.info(f"Search requested: {params} over {tmin}s to {tmax}s, {len(picks)} channels")
+
+        hit = get_stats_index.cache_info().currsize > 0
+        with span('compute'):
+            index, _ = get_stats_index()
+            result = search.run_search(index, params, picks, start, stop, sfreq, raw.ch_names)
+        metrics.record_cache('stats', hit)
+
+        logger.info(f"Search read {result['blocks_read']} of {result['blocks_total']} blocks")
+        with span('serialize'):
+            return jsonify(result)
+
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in search_eeg: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/eeg-export', methods=['GET'])
+def export_eeg():
+    """Stream the recording (or a tmin..tmax window) as CSV, EDF or NPZ"""
+    try:
+        raw = load_raw()
+        fmt, picks, l_freq, h_freq = export.parse_export_params(request.args, raw)
+        tmin = float(request.args.get('tmin', 0))
+        tmax = float(request.args.get('tmax', raw.times[-1]))
+        start, stop = window_bounds(raw, tmin, tmax)
+        if stop <= start:
+            raise ValueError("empty time window")
+        logger.info(f"Export requested: {fmt}, {tmin}s to {tmax}s, {len(picks)} channels, filter={l_freq}-{h_freq}")
+
+        sfreq = raw.info['sfreq']
+        ch_names = [raw.ch_names[i] for i in picks]
+        reader = export.ChunkReader(raw._data, picks, sfreq, l_freq, h_freq)
+        headers = {'Content-Disposition': f'attachment; filename="{export.filename(fmt, tmin, tmax)}"'}
+
+        if fmt == 'csv':
+            body = export.stream_csv(reader, start, stop, ch_names, sfreq)
+        elif fmt == 'npz':
+            body = export.stream_npz(reader, start, stop, ch_names, sfreq)
+        else:
+            with span('compute'):
+                if reader.h is None:
+                    # EDF needs each channel's range up front; unfiltered ranges come from the stats index
+                    window = get_stats_index()[0].window(start, stop)
+                    vmin, vmax = window['min'][picks], window['max'][picks]
+                else:
+                    vmin, vmax = export.channel_ranges(reader, start, stop)
+            prefilter = f'HP:{l_freq or 0}Hz LP:{h_freq or 0}Hz' if reader.h is not None else ''
+            body = export.stream_edf(
+                reader, start, stop, ch_names, sfreq, vmin, vmax,
+                meas_date=raw.info['meas_date'], prefilter=prefilter
+            )
+            headers['Content-Length'] = str(export.edf_size(len(picks), stop - start, sfreq))
+
+        return Response(stream_with_context(body), mimetype=export.FORMATS[fmt][0], headers=headers)
+
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in export_eeg: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@lru_cache(maxsize=1)
+def get_source_model():
+    """Forward/inverse setup for the sample subject, persisted under the cache directory"""
+    if is_synthetic():
+        raise ValueError("source localization needs the sample recording (EEG_RECORDING=sample)")
+    data_path, subjects_dir = get_data_path()
+    return source.SourceModel(
+        os.path.join(app.config['CACHE_DIR'], 'source'),
+        subject='sample',
+        subjects_dir=subjects_dir,
+        fwd_path=os.path.join(data_path, 'MEG', 'sample', 'sample_audvis-meg-eeg-oct-6-fwd.fif'),
+        cov_path=os.path.join(data_path, 'MEG', 'sample', 'sample_audvis-cov.fif'),
+        fingerprint=get_recording_fingerprint()
+    )
+
+def load_inverse_kernel(method, snr):
+    """Inverse kernel for the recording; the first call builds or reads the operator"""
+    raw = load_raw()
+    model = get_source_model()
+    with span('load'):
+        hit = model.cache_info().hits
+        kernel = model.kernel(raw, method, snr)
+    metrics.record_cache('inverse', model.cache_info().hits > hit)
+    return raw, model, kernel
+
+@app.route('/api/eeg-source/labels', methods=['GET'])
+def get_source_labels():
+    """Get per-label source time courses (params: tmin, tmax, method, snr, parc)"""
+    try:
+        tmin = float(request.args.get('tmin', 0))
+        tmax = float(request.args.get('tmax', 1))
+        method, snr = source.parse_source_params(request.args)
+        parc = request.args.get('parc', 'aparc')
+        logger.info(f"Source label time courses requested: {tmin}s to {tmax}s, {method}, parc={parc}")
+        raw, model, kernel = load_inverse_kernel(method, snr)
+
+        with span('slice'):
+            start, stop = window_bounds(raw, tmin, tmax)
+            window = raw._data[:, start:stop]
+
+        with span('compute'):
+            labels = model.labels(parc)
+            time_courses = kernel.label_time_courses(window, labels)
+
+        with span('serialize'):
+            return jsonify({
+                "labels": [label.name for label in labels],
+                "data": time_courses.tolist(),
+                "times": raw.times[start:stop].tolist(),
+                "method": method
+            })
+
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in get_source_labels: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/eeg-source/peaks', methods=['GET'])
+def get_source_peaks():
+    """Get the strongest source vertices in a window (params: tmin, tmax, method, snr, k)"""
+    try:
+        tmin = float(request.args.get('tmin', 0))
+        tmax = float(request.args.get('tmax', 1))
+        method, snr = source.parse_source_params(request.args)
+        k = min(100, max(1, int(request.args.get('k', 10))))
+        logger.info(f"Source peaks requested: {tmin}s to {tmax}s, {method}, k={k}")
+        raw, _, kernel = load_inverse_kernel(method, snr)
+
+        with span('slice'):
+            start, stop = window_bounds(raw, tmin, tmax)
+            window = raw._data[:, start:stop]
+
+        with span('compute'):
+            peaks = kernel.peaks(window, raw.times[start:stop], k)
+
+        with span('serialize'):
+            return jsonify({
+                "peaks": peaks,
+                "n_sources": kernel.n_sources,
+                "method": method
+            })
+
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in get_source_peaks: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+# Background ICA fits; models are shared between workers through the cache directory
+ica_store = ica.ICAStore(os.path.join(app.config['CACHE_DIR'], 'ica'), n_jobs=app.config['ICA_N_JOBS'])
+
+def load_ica_operator(key):
+    """Fitted ICA for this recording as dense matrices (raises LookupError until ready)"""
+    raw = load_raw()
+    with span('load'):
+        hit = ica_store.cache_info().hits
+        operator = ica_store.operator(key, raw.ch_names)
+    metrics.record_cache('ica', ica_store.cache_info().hits > hit)
+    return raw, operator
+
+@app.route('/api/eeg-ica', methods=['POST'])
+def fit_ica():
+    """Start a background ICA fit (JSON body: n_components, method, random_state, l_freq, decim)"""
+    try:
+        params = ica.normalize_params(request.get_json(silent=True))
+        key = ica.model_key(get_recording_fingerprint(), params)
+        logger.info(f"ICA fit requested: {key} {params}")
+        state = ica_store.submit(key, load_raw(), params)
+        return jsonify({**state, "params": params}), 200 if state['status'] == 'ready' else 202
+
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in fit_ica: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/eeg-ica/<key>', methods=['GET'])
+def get_ica_status(key):
+    """Get the state of an ICA fit: ready, running, failed or missing"""
+    return jsonify(ica_store.status(key))
+
+@app.route('/api/eeg-ica/<key>/components', methods=['GET'])
+def get_ica_components(key):
+    """Get component topographies (one sensor pattern per component)"""
+    try:
+        _, operator = load_ica_operator(key)
+        with span('serialize'):
+            return jsonify({
+                "channel_names": operator.ch_names,
+                "n_components": operator.n_components,
+                "patterns": operator.patterns.T.tolist()
+            })
+
+    except LookupError as e:
+        return jsonify({"error": str(e), **ica_store.status(key)}), 409
+    except Exception as e:
+        logger.error(f"Error in get_ica_components: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/eeg-ica/<key>/sources', methods=['GET'])
+def get_ica_sources(key):
+    """Get component time courses for a window (params: tmin, tmax)"""
+    try:
+        tmin = float(request.args.get('tmin', 0))
+        tmax = float(request.args.get('tmax', 10))
+        raw, operator = load_ica_operator(key)
+
+        with span('slice'):
+            start, stop = window_bounds(raw, tmin, tmax)
+            window = raw._data[:, start:stop]
+
+        with span('compute'):
+            sources = operator.sources(window)
+
+        with span('serialize'):
+            return jsonify({
+                "components": [f"ICA{i:03d}" for i in range(operator.n_components)],
+                "data": sources.tolist(),
+                "times": raw.times[start:stop].tolist(),
+                "sfreq": raw.info['sfreq']
+            })
+
+    except LookupError as e:
+        return jsonify({"error": str(e), **ica_store.status(key)}), 409
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in get_ica_sources: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/eeg-ica/<key>/clean', methods=['GET'])
+def get_ica_clean(key):
+    """Get artifact-cleaned data for a window (params: tmin, tmax, exclude=0,3)"""
+    try:
+        tmin = float(request.args.get('tmin', 0))
+        tmax = float(request.args.get('tmax', 10))
+        exclude = [int(i) for i in request.args.get('exclude', '').split(',') if i.strip()]
+        raw, operator = load_ica_operator(key)
+
+        with span('slice'):
+            start, stop = window_bounds(raw, tmin, tmax)
+            window = raw._data[:, start:stop]
+
+        with span('compute'):
+            cleaned = operator.clean(window, exclude)
+
+        with span('serialize'):
+            return jsonify({
+                "labels": operator.ch_names,
+                "data": cleaned.tolist(),
+                "times": raw.times[start:stop].tolist(),
+                "sfreq": raw.info['sfreq'],
+                "exclude": sorted(set(exclude))
+            })
+
+    except LookupError as e:
+        return jsonify({"error": str(e), **ica_store.status(key)}), 409
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in get_ica_clean: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 # Initialize data when module is loaded (for gunicorn with --preload)
 # This runs once in the master process before forking workers
 _init_lock = threading.Lock()
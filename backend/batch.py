@@ -0,0 +1,231 @@
+"""
+Batch analysis over a directory of recordings
+Runs the same info, PSD, band power and statistics code the API uses on every FIF/EDF
+file under a directory, one file per worker process, and writes one columnar table
+with a row per (recording, channel). Files whose fingerprint matches a row in the
+previous output are not recomputed.
+
+    python batch.py recordings/ -o results.csv --jobs 8
+"""
+import argparse
+import csv
+import importlib.util
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import numpy as np
+
+import ica
+import spectral
+import stats
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = ('.fif', '.fif.gz', '.edf', '.bdf')
+# Every PSD is interpolated onto this grid so recordings at different rates share columns
+PSD_STEP = 0.5
+STAT_FIELDS = ('mean', 'variance', 'rms', 'min', 'max', 'kurtosis', 'line_length')
+# Samples per chunk when streaming statistics
+CHUNK = stats.BLOCK_SIZE * stats.CHUNK_BLOCKS
+
+
+def find_recordings(directory):
+    """Recording files under directory, sorted so output order is stable"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(EXTENSIONS))
+    return sorted(paths)
+
+
+def psd_grid(fmax=spectral.FMAX, step=PSD_STEP):
+    return np.arange(0.0, fmax + step / 2, step)
+
+
+def columns_for(grid):
+    """Output columns in order; the PSD columns depend on the frequency grid"""
+    return (
+        ['path', 'fingerprint', 'channel', 'sfreq', 'n_channels', 'duration']
+        + [f'{band}_power' for band in spectral.BANDS]
+        + list(STAT_FIELDS)
+        + [f'psd_{f:g}' for f in grid]
+    )
+
+
+def analyze(path, fingerprint, fmax=spectral.FMAX):
+    """All rows for one recording, as a dict of equal-length column lists"""
+    import mne
+
+    raw = mne.io.read_raw(path, preload=True, verbose=False)
+    raw.pick(mne.pick_types(raw.info, eeg=True, exclude=[]))
+    n_channels, n_times = raw._data.shape
+    sfreq = raw.info['sfreq']
+    grid = psd_grid(fmax)
+
+    # Every Welch bin up to Nyquist, so grid points between the last bin below fmax and fmax
+    # still have a neighbour above them to interpolate from
+    psds, freqs = spectral.compute_psd(raw, fmax=sfreq / 2)
+    powers = spectral.channel_band_powers(psds, freqs)
+    moments = stats.RunningMoments(n_channels)
+    for start in range(0, n_times, CHUNK):
+        moments.update(raw._data[:, start:start + CHUNK])
+    result = moments.result()
+
+    rows = {
+        'path': [path] * n_channels,
+        'fingerprint': [fingerprint] * n_channels,
+        'channel': list(raw.ch_names),
+        'sfreq': [float(sfreq)] * n_channels,
+        'n_channels': [n_channels] * n_channels,
+        'duration': [n_times / sfreq] * n_channels,
+    }
+    for band, values in powers.items():
+        rows[f'{band}_power'] = values.tolist()
+    for field in STAT_FIELDS:
+        rows[field] = np.asarray(result[field], dtype=np.float64).tolist()
+    # Only grid points above the recording's own Nyquist frequency are unknown
+    on_grid = np.array([np.interp(grid, freqs, psd, right=np.nan) for psd in psds])
+    on_grid[:, grid > sfreq / 2] = np.nan
+    for j, f in enumerate(grid):
+        rows[f'psd_{f:g}'] = on_grid[:, j].tolist()
+    return rows
+
+
+def read_table(path):
+    """Previous output as a dict of column lists, or None if there is none"""
+    if not os.path.exists(path):
+        return None
+    if path.endswith('.npz'):
+        with np.load(path, allow_pickle=False) as table:
+            return {name: table[name].tolist() for name in table.files}
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(path).to_pydict()
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return None
+        columns = {name: [] for name in header}
+        for row in reader:
+            for name, value in zip(header, row):
+                columns[name].append(value)
+    for name in header[3:]:
+        cast = int if name == 'n_channels' else float
+        columns[name] = [cast(value) for value in columns[name]]
+    return columns
+
+
+def write_table(path, columns, names):
+    """Write column lists in the format given by the file extension (.csv, .npz, .parquet)"""
+    tmp = f'{path}.tmp'
+    if path.endswith('.npz'):
+        with open(tmp, 'wb') as f:
+            np.savez(f, **{name: np.asarray(columns[name]) for name in names})
+    elif path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.table({name: columns[name] for name in names}), tmp)
+    else:
+        with open(tmp, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            writer.writerows(zip(*(columns[name] for name in names)))
+    # Replace atomically so an interrupted run leaves the previous table intact
+    os.replace(tmp, path)
+
+
+def previous_results(table, names):
+    """{path: (fingerprint, rows)} from a previous run with the same columns"""
+    if not table or list(table) != names:
+        if table:
+            logger.info("Previous output has different columns; recomputing every file")
+        return {}
+    previous = {}
+    for i, path in enumerate(table['path']):
+        fingerprint, rows = previous.setdefault(path, (table['fingerprint'][i], []))
+        rows.append(i)
+    return {
+        path: (fingerprint, {name: [table[name][i] for i in rows] for name in names})
+        for path, (fingerprint, rows) in previous.items()
+    }
+
+
+def _single_threaded():
+    # Each process analyses one file; BLAS threads on top would oversubscribe the cores
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(var, '1')
+
+
+def run(directory, output, jobs=None, fmax=spectral.FMAX, force=False):
+    """Analyse every changed recording under directory; returns the number of failures"""
+    if not output.endswith(('.csv', '.npz', '.parquet')):
+        raise ValueError("output must end in .csv, .npz or .parquet")
+    # Checked before any file is analysed, not when the finished table is written
+    if output.endswith('.parquet') and importlib.util.find_spec('pyarrow') is None:
+        raise ValueError("writing .parquet needs pyarrow (pip install pyarrow)")
+    names = columns_for(psd_grid(fmax))
+    previous = {} if force else previous_results(read_table(output), names)
+
+    paths = find_recordings(directory)
+    results = {}
+    pending = {}
+    for path in paths:
+        fingerprint = ica.recording_fingerprint(path)
+        cached = previous.get(path)
+        if cached and cached[0] == fingerprint:
+            results[path] = cached[1]
+        else:
+            pending[path] = fingerprint
+    logger.info(f"{len(paths)} recordings: {len(results)} unchanged, {len(pending)} to analyse")
+
+    failures = 0
+    start = time.perf_counter()
+    if pending:
+        _single_threaded()
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=get_context('spawn')) as pool:
+            futures = {
+                pool.submit(analyze, path, fingerprint, fmax): path
+                for path, fingerprint in pending.items()
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                    logger.info(f"Analysed {path}")
+                except Exception as e:
+                    failures += 1
+                    logger.error(f"Failed to analyse {path}: {e}")
+    logger.info(f"Analysis finished in {time.perf_counter() - start:.1f}s")
+
+    columns = {name: [] for name in names}
+    for path in paths:
+        if path in results:
+            for name in names:
+                columns[name].extend(results[path][name])
+    write_table(output, columns, names)
+    logger.info(f"Wrote {len(columns['path'])} rows to {output}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch EEG analysis over a directory of FIF/EDF recordings")
+    parser.add_argument('directory', help="directory searched recursively for recordings")
+    parser.add_argument('-o', '--output', default='results.csv', help="output table (.csv, .npz or .parquet)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--fmax', type=float, default=spectral.FMAX, help="highest PSD frequency in Hz")
+    parser.add_argument('--force', action='store_true', help="recompute files even if unchanged")
+    args = parser.parse_args(argv)
+    try:
+        failures = run(args.directory, args.output, args.jobs, args.fmax, args.force)
+    except ValueError as e:
+        parser.error(str(e))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,5 @@
 """Gunicorn configuration file"""
+import os
 
 # Server socket
 bind = "0.0.0.0:8000"
@@ -7,6 +8,8 @@ backlog = 2048
 # Worker processes
 workers = 4
 worker_class = "sync"
+# More than one thread switches the sync workers to gthread; topomaps render per thread
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
 worker_connections = 1000
 timeout = 120
 keepalive = 5
@@ -0,0 +1,305 @@
+"""
+Load test replaying the dashboard's request mix
+Each simulated viewer opens the dashboard (one bootstrap request), then plays topomaps
+back at 10 Hz while panning the signal window every few seconds, with the annotation
+page following the window. For every worker/thread configuration the harness starts a
+backend under gunicorn on the synthetic recording (EEG_RECORDING=synthetic), drives it,
+and reports throughput, p50/p99 latency and error rate per endpoint.
+
+    python loadtest.py --backend flask --configs 4x1,2x4,4x4 --viewers 50 --duration 60
+    python loadtest.py --url http://localhost:8000 --viewers 20    # a server that is already running
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Dashboard behaviour: playback advances 0.1 s every 100 ms, windows span 10 s
+PLAYBACK_INTERVAL = 0.1
+WINDOW_SECONDS = 10.0
+ANNOTATION_PAGE = 10.0
+# Mean seconds between window pans of one viewer
+PAN_INTERVAL = 3.0
+REQUEST_TIMEOUT = 120
+STARTUP_TIMEOUT = 300
+
+
+class Recorder:
+    """Latency samples per endpoint, shared by all viewer threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self.frames = 0
+        self.late_frames = 0
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            self._samples.setdefault(endpoint, []).append((seconds, ok))
+
+    def frame(self, late):
+        with self._lock:
+            self.frames += 1
+            self.late_frames += late
+
+    def summary(self, elapsed):
+        """{endpoint: {requests, throughput, p50_ms, p99_ms, error_rate}}, plus 'all'"""
+        with self._lock:
+            samples = {endpoint: list(values) for endpoint, values in self._samples.items()}
+        samples['all'] = [value for values in samples.values() for value in values]
+        result = {}
+        for endpoint, values in samples.items():
+            latencies = np.array([seconds for seconds, _ in values])
+            errors = sum(not ok for _, ok in values)
+            result[endpoint] = {
+                "requests": len(values),
+                "throughput": len(values) / elapsed,
+                "p50_ms": float(np.percentile(latencies, 50) * 1000) if len(values) else None,
+                "p99_ms": float(np.percentile(latencies, 99) * 1000) if len(values) else None,
+                "error_rate": errors / len(values) if values else 0.0
+            }
+        return result
+
+
+class Client:
+    """One keep-alive connection; gunicorn's sync workers close it, and it reopens on demand"""
+
+    def __init__(self, url, recorder):
+        parts = urlsplit(url)
+        self._connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=REQUEST_TIMEOUT)
+        self._recorder = recorder
+
+    def get(self, path, endpoint):
+        """Body of a successful response, or None; the request is recorded either way"""
+        start = time.perf_counter()
+        body = None
+        try:
+            self._connection.request('GET', path)
+            response = self._connection.getresponse()
+            body = response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            self._connection.close()
+            ok = False
+        # The bootstrap stream reports failures in-band, after a 200
+        if ok and endpoint == 'bootstrap':
+            ok = b'"part": "error"' not in body
+        self._recorder.record(endpoint, time.perf_counter() - start, ok)
+        return body if ok else None
+
+    def close(self):
+        self._connection.close()
+
+
+def viewer(url, recorder, stop_at, seed):
+    """One dashboard session: bootstrap, then playback with concurrent window pans"""
+    rng = random.Random(seed)
+    client = Client(url, recorder)
+    body = client.get(f'/api/eeg-bootstrap?tmin=0&tmax={WINDOW_SECONDS:g}&time_point=0.01', 'bootstrap')
+    if body is None:
+        client.close()
+        return
+    info = json.loads(body.splitlines()[0])['data']
+    duration = info['duration']
+
+    pans = threading.Thread(target=panner, args=(url, recorder, stop_at, rng.random(), duration), daemon=True)
+    pans.start()
+
+    # Playback from a random point, at the dashboard's 10 Hz; a frame is late when the
+    # previous topomap had not arrived by its tick
+    time_point = rng.uniform(0, duration)
+    next_tick = time.monotonic()
+    while time.monotonic() < stop_at:
+        client.get(f'/api/eeg-topomap/{time_point:.2f}', 'topomap')
+        time_point = time_point + PLAYBACK_INTERVAL
+        if time_point >= duration:
+            time_point = 0.01
+        next_tick += PLAYBACK_INTERVAL
+        delay = next_tick - time.monotonic()
+        recorder.frame(delay < 0)
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_tick = time.monotonic()
+    client.close()
+    pans.join()
+
+
+def panner(url, recorder, stop_at, seed, duration):
+    """Window pans at random moments, each fetching a 10 s window and its annotation page"""
+    rng = random.Random(seed)
+    client = Client(url, recorder)
+    while True:
+        wait = rng.expovariate(1 / PAN_INTERVAL)
+        if time.monotonic() + wait >= stop_at:
+            break
+        time.sleep(wait)
+        tmin = round(rng.uniform(0, max(0.0, duration - WINDOW_SECONDS)), 1)
+        client.get(f'/api/eeg-data?tmin={tmin:g}&tmax={tmin + WINDOW_SECONDS:g}', 'eeg-data')
+        page = ANNOTATION_PAGE * (tmin // ANNOTATION_PAGE)
+        client.get(f'/api/annotations?tmin={page:g}&tmax={page + ANNOTATION_PAGE:g}', 'annotations')
+    client.close()
+
+
+def run_load(url, viewers, duration, ramp, seed=0):
+    """Drive viewers against url for duration seconds; returns the summary"""
+    recorder = Recorder()
+    started = time.monotonic()
+    stop_at = started + duration
+    threads = []
+    for i in range(viewers):
+        # Viewers arrive spread over the ramp rather than all at once
+        delay = ramp * i / max(viewers, 1)
+        thread = threading.Timer(delay, viewer, args=(url, recorder, stop_at, seed * 100003 + i))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    # Each viewer joins its own panner before returning
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    result = recorder.summary(elapsed)
+    result['playback'] = {
+        "frames": recorder.frames,
+        "on_time": 1 - recorder.late_frames / recorder.frames if recorder.frames else None
+    }
+    return result
+
+
+def parse_configs(text):
+    """'4x1,2x4' -> [(4, 1), (2, 4)] as (workers, threads)"""
+    configs = []
+    for item in text.split(','):
+        workers, _, threads = item.strip().partition('x')
+        configs.append((int(workers), int(threads or 1)))
+    return configs
+
+
+def launch(backend, workers, threads, port, workdir):
+    """Start a backend under gunicorn on the synthetic recording; returns the process"""
+    env = {
+        **os.environ,
+        'EEG_RECORDING': 'synthetic',
+        'ENCEPHALIC_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'DATABASE_PATH': os.path.join(workdir, 'encephalic.sqlite3'),
+        'LOG_LEVEL': 'WARNING',
+        'PYTHONUNBUFFERED': '1'
+    }
+    # More than one thread makes gunicorn switch from sync to gthread workers
+    common = ['--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+              '--access-logfile', os.devnull]
+    if backend == 'flask':
+        cwd = os.path.join(ROOT, 'backend')
+        command = ['gunicorn', '--config', 'gunicorn_config.py', '--preload', *common, 'app:app']
+    else:
+        cwd = os.path.join(ROOT, 'backend_django')
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '--noinput'], cwd=cwd, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        command = ['gunicorn', '--timeout', '120', *common, 'encephalic.wsgi:application']
+    log = open(os.path.join(workdir, f'{backend}-{workers}x{threads}.log'), 'w')
+    return subprocess.Popen(command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+
+
+def wait_ready(url, process, workers):
+    """Block until the recording is loaded, then warm every worker with a couple of requests"""
+    parts = urlsplit(url)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"backend exited with status {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=REQUEST_TIMEOUT)
+            connection.request('GET', '/api/eeg-info')
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            if response.status == 200:
+                break
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(1)
+    else:
+        raise RuntimeError(f"backend not ready after {STARTUP_TIMEOUT}s")
+    warm = Client(url, Recorder())
+    for _ in range(2 * workers):
+        warm.get('/api/eeg-info', 'info')
+    warm.close()
+
+
+def stop(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+def print_report(label, result):
+    print(f"\n{label}")
+    print(f"{'endpoint':<14}{'requests':>10}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    endpoints = sorted(k for k in result if k not in ('all', 'playback')) + ['all']
+    for endpoint in endpoints:
+        row = result[endpoint]
+        p50 = f"{row['p50_ms']:.0f}" if row['p50_ms'] is not None else '-'
+        p99 = f"{row['p99_ms']:.0f}" if row['p99_ms'] is not None else '-'
+        print(f"{endpoint:<14}{row['requests']:>10}{row['throughput']:>9.1f}{p50:>10}{p99:>10}"
+              f"{row['error_rate']:>8.1%}")
+    on_time = result['playback']['on_time']
+    if on_time is not None:
+        print(f"playback frames on time: {on_time:.1%} of {result['playback']['frames']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay dashboard traffic against a local backend")
+    parser.add_argument('--backend', choices=('flask', 'django'), default='flask')
+    parser.add_argument('--configs', default='4x1', help="comma-separated WORKERSxTHREADS (default: 4x1)")
+    parser.add_argument('--viewers', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=60, help="seconds of load per configuration")
+    parser.add_argument('--ramp', type=float, default=5, help="seconds over which viewers arrive")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--url', help="test a running server instead of starting one per configuration")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    if args.url:
+        wait_ready(args.url, None, 1)
+        result = run_load(args.url, args.viewers, args.duration, args.ramp)
+        print_report(f"{args.url}, {args.viewers} viewers, {args.duration:g}s", result)
+        results.append({"url": args.url, "viewers": args.viewers, "result": result})
+    else:
+        if shutil.which('gunicorn') is None:
+            parser.error("gunicorn is not installed; pip install -r requirements.txt or use --url")
+        url = f'http://127.0.0.1:{args.port}'
+        for workers, threads in parse_configs(args.configs):
+            with tempfile.TemporaryDirectory(prefix='encephalic-loadtest-') as workdir:
+                process = launch(args.backend, workers, threads, args.port, workdir)
+                try:
+                    wait_ready(url, process, workers)
+                    result = run_load(url, args.viewers, args.duration, args.ramp)
+                finally:
+                    stop(process)
+            label = f"{args.backend}, {workers} workers x {threads} threads, {args.viewers} viewers, {args.duration:g}s"
+            print_report(label, result)
+            results.append({"backend": args.backend, "workers": workers, "threads": threads,
+                            "viewers": args.viewers, "result": result})
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Re-referencing montages as channel-mixing operators
+Each montage is one (n_outputs, n_channels) matrix, sparse except for the average
+reference, applied to a requested slice only; no re-referenced copy of the recording
+is ever built, so a montage costs one small matrix product per window
+"""
+import numpy as np
+from scipy import sparse
+
+REFERENCES = ('original', 'average', 'linked', 'bipolar', 'laplacian')
+# Neighbours averaged by the Hjorth Laplacian (a typical 10-20 electrode has four)
+N_NEIGHBORS = 4
+
+
+class Montage:
+    """Output labels plus the matrix mapping recorded channels to them (None: identity)"""
+
+    def __init__(self, kind, labels, matrix=None, dtype=np.float64):
+        self.kind = kind
+        self.labels = labels
+        # Built in the recording's precision, so a float32 window is mixed in float32
+        self.matrix = matrix if matrix is None else matrix.astype(dtype)
+
+    def apply(self, data, start, stop):
+        """Re-referenced samples [start, stop) of a (n_channels, n_times) array"""
+        return self.mix(data[:, start:stop])
+
+    def mix(self, window):
+        """Re-reference an already sliced (n_channels, n_samples) window"""
+        if self.matrix is None:
+            return window
+        return np.asarray(self.matrix @ window)
+
+
+def channel_positions(info):
+    """(n_channels, 3) sensor positions in head coordinates (metres); NaN where unknown"""
+    positions = np.array([ch['loc'][:3] for ch in info['chs']], dtype=np.float64)
+    unknown = ~np.isfinite(positions).all(axis=1) | (np.abs(positions).sum(axis=1) == 0)
+    positions[unknown] = np.nan
+    return positions
+
+
+def _require_positions(positions, kind):
+    if np.isnan(positions).any():
+        raise ValueError(f"{kind} reference needs a position for every channel")
+
+
+def _indices(names, ch_names):
+    missing = [name for name in names if name not in ch_names]
+    if missing:
+        raise ValueError(f"unknown channels: {', '.join(missing)}")
+    return [ch_names.index(name) for name in names]
+
+
+def average_operator(n):
+    """Subtract the instantaneous mean of all channels"""
+    return np.eye(n) - 1.0 / n
+
+
+def linked_operator(n, ref_picks):
+    """Subtract the mean of the reference channels (e.g. linked mastoids)"""
+    weights = np.zeros(n)
+    weights[ref_picks] = 1.0 / len(ref_picks)
+    return (sparse.identity(n, format='csr') - sparse.csr_matrix(np.outer(np.ones(n), weights))).tocsr()
+
+
+def bipolar_operator(n, pairs):
+    """One output per (anode, cathode) pair: anode - cathode"""
+    rows = np.repeat(np.arange(len(pairs)), 2)
+    cols = np.array(pairs, dtype=int).ravel()
+    values = np.tile([1.0, -1.0], len(pairs))
+    return sparse.csr_matrix((values, (rows, cols)), shape=(len(pairs), n))
+
+
+def laplacian_operator(positions, n_neighbors=N_NEIGHBORS):
+    """Hjorth surface Laplacian: each channel minus the mean of its nearest neighbours"""
+    n = len(positions)
+    n_neighbors = min(n_neighbors, n - 1)
+    distances = np.linalg.norm(positions[:, None] - positions[None], axis=2)
+    np.fill_diagonal(distances, np.inf)
+    neighbors = np.argsort(distances, axis=1)[:, :n_neighbors]
+    rows = np.repeat(np.arange(n), n_neighbors)
+    mixing = sparse.csr_matrix(
+        (np.full(rows.size, 1.0 / n_neighbors), (rows, neighbors.ravel())), shape=(n, n)
+    )
+    return (sparse.identity(n, format='csr') - mixing).tocsr()
+
+
+def default_linked_refs(positions):
+    """The most lateral left and right electrodes, standing in for the mastoids"""
+    return [int(np.argmin(positions[:, 0])), int(np.argmax(positions[:, 0]))]
+
+
+def default_bipolar_pairs(positions):
+    """
+    Longitudinal chains: every channel paired with its nearest neighbour further back,
+    within 45 degrees of straight back, so chains run front to back as in a
+    longitudinal bipolar ("double banana") montage
+    """
+    pairs = []
+    for i, position in enumerate(positions):
+        behind = np.flatnonzero(position[1] - positions[:, 1] > np.abs(positions[:, 0] - position[0]))
+        if len(behind):
+            j = behind[np.argmin(np.linalg.norm(positions[behind] - position, axis=1))]
+            pairs.append((i, int(j)))
+    return pairs
+
+
+def build_montage(kind, ch_names, positions, ref_channels=None, pairs=None, n_neighbors=N_NEIGHBORS,
+                  dtype=np.float64):
+    """
+    Montage for one reference scheme, its operator in dtype (that of the data it mixes)
+    ref_channels (linked) and pairs (bipolar, as (anode, cathode) names) default to
+    choices derived from the sensor positions
+    """
+    n = len(ch_names)
+    if kind == 'original':
+        return Montage(kind, list(ch_names))
+    if kind == 'average':
+        return Montage(kind, list(ch_names), average_operator(n), dtype)
+    if kind == 'linked':
+        if ref_channels:
+            ref_picks = _indices(ref_channels, ch_names)
+        else:
+            _require_positions(positions, kind)
+            ref_picks = default_linked_refs(positions)
+        return Montage(kind, list(ch_names), linked_operator(n, ref_picks), dtype)
+    if kind == 'bipolar':
+        if pairs:
+            picks = [tuple(_indices(pair, ch_names)) for pair in pairs]
+        else:
+            _require_positions(positions, kind)
+            picks = default_bipolar_pairs(positions)
+        labels = [f'{ch_names[a]}-{ch_names[c]}' for a, c in picks]
+        return Montage(kind, labels, bipolar_operator(n, picks), dtype)
+    if kind == 'laplacian':
+        _require_positions(positions, kind)
+        if n_neighbors < 1:
+            raise ValueError("n_neighbors must be at least 1")
+        return Montage(kind, list(ch_names), laplacian_operator(positions, n_neighbors), dtype)
+    raise ValueError(f"reference must be one of {', '.join(REFERENCES)}")
+
+
+def parse_reference_params(args):
+    """
+    Read reference, ref_channels, pairs and n_neighbors query parameters
+    Returns a hashable key for build_montage(kind, ch_names, positions, *key[1:])
+    """
+    kind = args.get('reference', 'original')
+    if kind not in REFERENCES:
+        raise ValueError(f"reference must be one of {', '.join(REFERENCES)}")
+    ref_channels = args.get('ref_channels')
+    ref_channels = tuple(c.strip() for c in ref_channels.split(',') if c.strip()) if ref_channels else None
+    pairs = args.get('pairs')
+    if pairs:
+        # Anode-cathode pairs, comma separated: "Fp1-F3,F3-C3"
+        pairs = tuple(tuple(p.strip() for p in pair.split('-', 1)) for pair in pairs.split(',') if pair.strip())
+        if any(len(pair) != 2 for pair in pairs):
+            raise ValueError("pairs must look like anode-cathode,anode-cathode")
+    n_neighbors = int(args.get('n_neighbors', N_NEIGHBORS))
+    return kind, ref_channels, pairs or None, n_neighbors
+
+
+def positions_payload(ch_names, positions):
+    """JSON-ready sensor positions; channels without a known position are left out"""
+    return [
+        {"channel": name, "x": float(x), "y": float(y), "z": float(z)}
+        for name, (x, y, z) in zip(ch_names, positions)
+        if np.isfinite(x)
+    ]
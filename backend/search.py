@@ -0,0 +1,203 @@
+"""
+Amplitude search over block zone maps
+Threshold and peak queries consult the per-block min/max/abs-max summaries of the
+stats index first and read raw samples only from blocks that can still match
+"""
+import heapq
+
+import numpy as np
+
+DIRECTIONS = ('abs', 'above', 'below')
+# Cap on returned intervals; a threshold near the noise floor would otherwise match everywhere
+MAX_INTERVALS = 1000
+MAX_PEAKS = 100
+
+
+def _signed(values, direction):
+    """Values transformed so that every direction becomes "greater than threshold\""""
+    if direction == 'abs':
+        return np.abs(values)
+    return values if direction == 'above' else -values
+
+
+def _block_bounds(index, direction):
+    """Per-block upper bound of the transformed values, shape (n_channels, n_blocks)"""
+    if direction == 'abs':
+        return index.block_absmax
+    return index.block_max if direction == 'above' else -index.block_min
+
+
+def _runs(mask):
+    """[start, stop) pairs of consecutive True values"""
+    edges = np.flatnonzero(np.diff(np.concatenate([[False], mask, [False]]).astype(np.int8)))
+    return edges.reshape(-1, 2)
+
+
+def _descending(bounds, first):
+    """
+    Indices of bounds in decreasing order, sorted lazily in growing batches
+    Peak searches usually stop after a few dozen blocks, so a full argsort is wasted
+    """
+    seen = np.zeros(len(bounds), dtype=bool)
+    size = first
+    while True:
+        size = min(size, len(bounds))
+        top = np.argpartition(-bounds, size - 1)[:size] if size < len(bounds) else np.arange(size)
+        for i in top[np.argsort(-bounds[top], kind='stable')]:
+            if not seen[i]:
+                seen[i] = True
+                yield i
+        if size == len(bounds):
+            return
+        size *= 4
+
+
+def threshold_intervals(index, picks, start, stop, threshold, direction='abs', limit=MAX_INTERVALS):
+    """
+    Sample intervals in [start, stop) where a picked channel crosses threshold
+    direction 'abs' matches |x| > threshold, 'above' x > threshold, 'below' x < threshold
+    Returns (intervals, truncated, blocks_read); each interval is
+    (pick, first_sample, last_sample, peak_sample, peak_value) and runs across block
+    boundaries are joined, since only runs of adjacent candidate blocks are read together
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {', '.join(DIRECTIONS)}")
+    block = index.block
+    target = -threshold if direction == 'below' else threshold
+    b0, b1 = start // block, -(-stop // block)
+    bounds = _block_bounds(index, direction)
+
+    intervals = []
+    blocks_read = 0
+    for pick in picks:
+        candidates = bounds[pick, b0:b1] > target
+        for r0, r1 in _runs(candidates):
+            a = max(start, (b0 + r0) * block)
+            b = min(stop, (b0 + r1) * block)
+            blocks_read += r1 - r0
+            values = index.read_chunk(a, b)[pick]
+            signed = _signed(values, direction)
+            for s0, s1 in _runs(signed > target):
+                peak = s0 + int(np.argmax(signed[s0:s1]))
+                intervals.append((int(pick), a + s0, a + s1 - 1, a + peak, float(values[peak])))
+                if len(intervals) >= limit:
+                    return intervals, True, blocks_read
+    return intervals, False, blocks_read
+
+
+def _push_best(pending, accepted, pick, a, magnitudes, values, min_separation):
+    """
+    Queue a read block's largest |x| outside the neighbourhood of every accepted peak
+    on its channel; magnitudes is masked in place, so each later call only narrows it
+    """
+    for p, s, _ in accepted:
+        if p == pick:
+            magnitudes[max(0, s - min_separation - a):max(0, s + min_separation + 1 - a)] = -np.inf
+    i = int(np.argmax(magnitudes))
+    if magnitudes[i] > -np.inf:
+        heapq.heappush(pending, (-float(magnitudes[i]), pick, a + i, float(values[i]), a, magnitudes, values))
+
+
+def top_peaks(index, picks, start, stop, k=10, min_separation=0):
+    """
+    The k largest |x| peaks in [start, stop) across the picked channels
+    A peak within min_separation samples of a larger one on the same channel is
+    suppressed. Blocks are read in decreasing order of their abs-max bound, and a read
+    block stays queued with its best sample outside the accepted peaks' neighbourhoods,
+    so it can yield several peaks; the search stops as soon as no unread block can
+    beat the k-th accepted peak.
+    Returns (peaks, blocks_read); each peak is (pick, sample, value)
+    """
+    block = index.block
+    b0, b1 = start // block, -(-stop // block)
+    picks = np.asarray(picks)
+    bounds = index.block_absmax[picks, b0:b1].ravel()
+    n_blocks = b1 - b0
+    order = _descending(bounds, 4 * k)
+
+    accepted = []
+    # Max-heap of (-|value|, pick, sample, value, block start, block magnitudes, block values),
+    # one entry per read block that still has unsuppressed samples
+    pending = []
+    blocks_read = 0
+    while True:
+        flat = next(order, None)
+        next_bound = bounds[flat] if flat is not None else -np.inf
+        # Anything pending at or above every unread bound is final
+        while pending and -pending[0][0] >= next_bound:
+            _, pick, sample, value, a, magnitudes, values = heapq.heappop(pending)
+            if all(p != pick or abs(s - sample) > min_separation for p, s, _ in accepted):
+                accepted.append((pick, sample, value))
+                if len(accepted) == k:
+                    return accepted, blocks_read
+            _push_best(pending, accepted, pick, a, magnitudes, values, min_separation)
+        if flat is None:
+            break
+        pick, b = int(picks[flat // n_blocks]), b0 + flat % n_blocks
+        a, z = max(start, b * block), min(stop, (b + 1) * block)
+        if z <= a:
+            continue
+        blocks_read += 1
+        values = index.read_chunk(a, z)[pick]
+        _push_best(pending, accepted, pick, a, np.abs(values).astype(np.float64), values, min_separation)
+    return accepted, blocks_read
+
+
+def parse_search_params(args, sfreq):
+    """Read type, threshold, direction, limit, k and min_separation query parameters"""
+    kind = args.get('type', 'threshold')
+    if kind == 'threshold':
+        threshold = args.get('threshold')
+        if threshold in (None, ''):
+            raise ValueError("threshold is required")
+        return {
+            "type": kind,
+            "threshold": float(threshold),
+            "direction": args.get('direction', 'abs'),
+            "limit": min(MAX_INTERVALS, max(1, int(args.get('limit', MAX_INTERVALS))))
+        }
+    if kind == 'peaks':
+        return {
+            "type": kind,
+            "k": min(MAX_PEAKS, max(1, int(args.get('k', 10)))),
+            # Seconds in the query, samples internally
+            "min_separation": int(round(float(args.get('min_separation', 0.1)) * sfreq))
+        }
+    raise ValueError("type must be threshold or peaks")
+
+
+def run_search(index, params, picks, start, stop, sfreq, ch_names):
+    """Run a parsed search over samples [start, stop); JSON-ready, times in seconds"""
+    result = {"type": params["type"]}
+    if params["type"] == 'threshold':
+        intervals, truncated, blocks_read = threshold_intervals(
+            index, picks, start, stop, params["threshold"], params["direction"], params["limit"]
+        )
+        result.update({
+            "threshold": params["threshold"],
+            "direction": params["direction"],
+            "intervals": [
+                {"channel": ch_names[pick], "tmin": first / sfreq, "tmax": last / sfreq,
+                 "peak_time": peak / sfreq, "peak": value}
+                for pick, first, last, peak, value in intervals
+            ],
+            "count": len(intervals),
+            "truncated": truncated
+        })
+    else:
+        peaks, blocks_read = top_peaks(index, picks, start, stop, params["k"], params["min_separation"])
+        result.update({
+            "peaks": [
+                {"channel": ch_names[pick], "time": sample / sfreq, "value": value}
+                for pick, sample, value in peaks
+            ],
+            "count": len(peaks)
+        })
+    b0, b1 = start // index.block, -(-stop // index.block)
+    result.update({
+        "tmin": start / sfreq,
+        "tmax": (stop - 1) / sfreq,
+        "blocks_read": int(blocks_read),
+        "blocks_total": int(len(picks) * (b1 - b0))
+    })
+    return result
@@ -0,0 +1,203 @@
+"""
+Source localization
+The forward and inverse operators are built once per recording and persisted to disk;
+the inverse is then folded into a dense kernel so any time window costs one matrix
+product, reduced to per-label time courses or peak vertices
+"""
+import os
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+
+import mne
+import numpy as np
+from mne.minimum_norm import apply_inverse, make_inverse_operator
+from mne.minimum_norm import read_inverse_operator, write_inverse_operator
+from mne.io.constants import FIFF
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('MNE', 'dSPM', 'sLORETA', 'eLORETA')
+
+
+def _combine_xyz(sol):
+    """Source amplitude for free-orientation solutions (three rows per source)"""
+    return np.linalg.norm(sol.reshape(-1, 3, sol.shape[-1]), axis=1)
+
+
+class InverseKernel:
+    """
+    Inverse operator folded into a dense (n_sources, n_channels) matrix
+    Equivalent to apply_inverse_raw for the same method and regularization
+    """
+
+    def __init__(self, inv, ch_names, method, lambda2):
+        free = inv['source_ori'] == FIFF.FIFFV_MNE_FREE_ORI
+        surface = inv['src'].kind == 'surface'
+        # Cortical sources use the surface normal; volume sources keep three rows each
+        self.free_ori = free and not surface
+        pick_ori = 'vector' if self.free_ori else 'normal' if free else None
+
+        # Every orientation choice above is linear in the data, noise normalization
+        # included, so the inverse of an identity "evoked" is the kernel itself
+        inv_ch_names = inv['noise_cov'].ch_names
+        missing = sorted(set(inv_ch_names) - set(ch_names))
+        if missing:
+            raise ValueError(f"inverse operator channels missing from the data: {', '.join(missing)}")
+        info = mne.create_info(inv_ch_names, sfreq=1.0, ch_types='eeg')
+        identity = mne.EvokedArray(np.eye(len(inv_ch_names)), info, nave=1, verbose=False)
+        identity.add_proj(inv['projs'], verbose=False)
+        stc = apply_inverse(identity, inv, lambda2, method, pick_ori=pick_ori, verbose=False)
+
+        self.picks = np.array([list(ch_names).index(name) for name in inv_ch_names])
+        self.vertices = stc.vertices
+        self.src = inv['src']
+        # Three consecutive rows (x, y, z) per source for free orientation
+        self.kernel = stc.data.reshape(-1, len(inv_ch_names))
+        self._label_cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def n_sources(self):
+        return sum(len(v) for v in self.vertices)
+
+    def apply(self, data):
+        """Source amplitudes for a (n_channels, n_times) slice of the full recording"""
+        sol = self.kernel @ data[self.picks]
+        return _combine_xyz(sol) if self.free_ori else sol
+
+    def label_matrix(self, labels):
+        """(n_labels, n_sources) sign-flipped mean weights, cached per label set"""
+        key = tuple(label.name for label in labels)
+        with self._lock:
+            cached = self._label_cache.get(key)
+        if cached is not None:
+            return cached
+
+        offsets = np.cumsum([0] + [len(v) for v in self.vertices])
+        weights = np.zeros((len(labels), self.n_sources))
+        for row, label in enumerate(labels):
+            hemi = 0 if label.hemi == 'lh' else 1
+            _, idx, _ = np.intersect1d(self.vertices[hemi], label.vertices, return_indices=True)
+            if len(idx) == 0:
+                continue
+            # Sign flip keeps opposing-normal sources from cancelling in the average
+            flip = mne.label_sign_flip(label, self.src) if not self.free_ori else np.ones(len(idx))
+            weights[row, offsets[hemi] + idx] = flip / len(idx)
+
+        cached = weights if self.free_ori else weights @ self.kernel
+        with self._lock:
+            self._label_cache[key] = cached
+        return cached
+
+    def label_time_courses(self, data, labels):
+        """Per-label time courses in one product with the label-reduced kernel"""
+        matrix = self.label_matrix(labels)
+        if self.free_ori:
+            return matrix @ self.apply(data)
+        return matrix @ data[self.picks]
+
+    def peaks(self, data, times, k):
+        """The k sources with the largest absolute amplitude in the window"""
+        sol = np.abs(self.apply(data))
+        peak_idx = sol.argmax(axis=1)
+        peak_val = sol[np.arange(len(sol)), peak_idx]
+        k = min(k, len(peak_val))
+        top = np.argpartition(peak_val, -k)[-k:]
+        top = top[np.argsort(peak_val[top])[::-1]]
+
+        n_lh = len(self.vertices[0])
+        hemis = ('lh', 'rh') if len(self.vertices) == 2 else ('vol',)
+        peaks = []
+        for src_idx in top:
+            hemi = 0 if src_idx < n_lh or len(self.vertices) == 1 else 1
+            vertex = self.vertices[hemi][src_idx - (n_lh if hemi else 0)]
+            peaks.append({
+                "hemi": hemis[hemi],
+                "vertex": int(vertex),
+                "amplitude": float(peak_val[src_idx]),
+                "time": float(times[peak_idx[src_idx]])
+            })
+        return peaks
+
+
+class SourceModel:
+    """
+    Forward/inverse setup for one recording
+    The inverse operator is written to the cache directory on first use and read back
+    on every later start; assembled kernels are kept in memory per (method, snr)
+    """
+
+    def __init__(self, cache_dir, subject, subjects_dir, fwd_path, cov_path, fingerprint):
+        self.cache_dir = cache_dir
+        self.subject = subject
+        self.subjects_dir = subjects_dir
+        self.fwd_path = fwd_path
+        self.cov_path = cov_path
+        key = hashlib.sha1(f'{fingerprint}:{fwd_path}:{cov_path}'.encode()).hexdigest()[:16]
+        self.inverse_path = os.path.join(cache_dir, f'{key}-eeg-inv.fif')
+        self._lock = threading.Lock()
+        self._inverse = None
+        self._kernel = lru_cache(maxsize=8)(self._build_kernel)
+        self.labels = lru_cache(maxsize=4)(self._read_labels)
+
+    def inverse(self, raw):
+        """Load the persisted EEG inverse operator, building it on first use"""
+        with self._lock:
+            if self._inverse is None:
+                if os.path.exists(self.inverse_path):
+                    logger.info(f"Loading inverse operator from {self.inverse_path}")
+                    self._inverse = read_inverse_operator(self.inverse_path, verbose=False)
+                else:
+                    self._inverse = self._build_inverse(raw)
+            return self._inverse
+
+    def _build_inverse(self, raw):
+        logger.info("Building EEG forward/inverse operator (one-time setup)")
+        # EEG inverses require an average reference projector; only the info is needed
+        info_raw = mne.io.RawArray(raw._data[:, :1], raw.info.copy(), verbose=False)
+        if not any(p['desc'].lower().startswith('average eeg reference') for p in info_raw.info['projs']):
+            info_raw.set_eeg_reference('average', projection=True, verbose=False)
+
+        fwd = mne.read_forward_solution(self.fwd_path, verbose=False)
+        fwd = mne.pick_types_forward(fwd, meg=False, eeg=True, exclude=info_raw.info['bads'])
+        noise_cov = mne.read_cov(self.cov_path, verbose=False)
+        inv = make_inverse_operator(info_raw.info, fwd, noise_cov, loose=0.2, depth=0.8, verbose=False)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write then rename so other workers never read a partial file
+        tmp_path = self.inverse_path.replace('-eeg-inv.fif', '-partial-inv.fif')
+        write_inverse_operator(tmp_path, inv, overwrite=True, verbose=False)
+        os.replace(tmp_path, self.inverse_path)
+        logger.info(f"Inverse operator saved to {self.inverse_path}")
+        return inv
+
+    def kernel(self, raw, method, snr):
+        """Assembled InverseKernel for raw's channels, cached per (method, snr)"""
+        self.inverse(raw)
+        return self._kernel(method, snr, tuple(raw.ch_names))
+
+    def cache_info(self):
+        """Hit/miss statistics of the in-memory kernel cache"""
+        return self._kernel.cache_info()
+
+    def _build_kernel(self, method, snr, ch_names):
+        return InverseKernel(self._inverse, list(ch_names), method, 1.0 / snr ** 2)
+
+    def _read_labels(self, parc):
+        labels = mne.read_labels_from_annot(
+            self.subject, parc=parc, subjects_dir=self.subjects_dir, verbose=False
+        )
+        return tuple(label for label in labels if 'unknown' not in label.name)
+
+
+def parse_source_params(args):
+    """Read method and snr query parameters"""
+    method = args.get('method', 'dSPM')
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    snr = float(args.get('snr', 3.0))
+    if snr <= 0:
+        raise ValueError("snr must be positive")
+    return method, snr
@@ -0,0 +1,50 @@
+"""
+Spectral summaries
+One Welch PSD of the recording feeds both the PSD and the band-power views
+"""
+import numpy as np
+
+# Canonical EEG bands (Hz), lower edge inclusive
+BANDS = {
+    'delta': (0.5, 4),
+    'theta': (4, 8),
+    'alpha': (8, 13),
+    'beta': (13, 30),
+    'gamma': (30, 50)
+}
+FMAX = 50
+
+
+def compute_psd(raw, fmax=FMAX):
+    """Welch PSD of every channel: (psds (n_channels, n_freqs), freqs)"""
+    spectrum = raw.compute_psd(fmax=fmax, verbose=False)
+    return spectrum.get_data(return_freqs=True)
+
+
+def channel_band_powers(psds, freqs, bands=BANDS):
+    """Mean power per band for every channel: {band: (n_channels,)}"""
+    psds = np.asarray(psds)
+    freqs = np.asarray(freqs)
+    powers = {}
+    for band_name, (fmin, fmax) in bands.items():
+        freq_mask = (freqs >= fmin) & (freqs < fmax)
+        powers[band_name] = psds[:, freq_mask].mean(axis=1)
+    return powers
+
+
+def band_powers(psds, freqs, bands=BANDS):
+    """Mean power per band, averaged across both channels and frequencies"""
+    return {
+        band_name: float(powers.mean())
+        for band_name, powers in channel_band_powers(psds, freqs, bands).items()
+    }
+
+
+def psd_payload(psds, freqs, ch_names):
+    """JSON-ready PSD: channel average plus every channel's spectrum"""
+    return {
+        "frequencies": freqs.tolist(),
+        "psd": psds.mean(axis=0).tolist(),
+        "channel_psds": psds.tolist(),
+        "channel_names": list(ch_names)
+    }
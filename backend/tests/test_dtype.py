@@ -0,0 +1,99 @@
+import importlib
+import sys
+
+import numpy as np
+import pytest
+
+DTYPES = ('float64', 'float32')
+WINDOWS = {
+    'original': '/api/eeg-data?tmin=10&tmax=20',
+    'average': '/api/eeg-data?tmin=10&tmax=20&reference=average',
+    'laplacian': '/api/eeg-data?tmin=10&tmax=20&reference=laplacian',
+    'resampled': '/api/eeg-data?tmin=10&tmax=20&sfreq=150',
+}
+TOPOMAP_TIMES = (0.5, 12.3, 150.0)
+
+
+def serve(dtype, cache_dir):
+    """Outputs of a freshly imported app serving the synthetic recording as dtype"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('EEG_RECORDING', 'synthetic')
+        mp.setenv('EEG_DTYPE', dtype)
+        mp.setenv('ENCEPHALIC_CACHE_DIR', str(cache_dir))
+        mp.setenv('LOG_LEVEL', 'WARNING')
+        sys.modules.pop('app', None)
+        app = importlib.import_module('app')
+        app.ensure_initialized()
+        client = app.app.test_client()
+
+        def get(url):
+            response = client.get(url)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            return response.get_json()
+
+        raw = app.get_raw_data()
+        outputs = {
+            'dtype': raw._data.dtype,
+            'nbytes': raw._data.nbytes,
+            'windows': {name: np.array(get(url)['data']) for name, url in WINDOWS.items()},
+            'psd': np.array(get('/api/eeg-psd')['channel_psds']),
+            'bands': get('/api/eeg-bands'),
+            'stats': get('/api/eeg-stats?tmin=0&tmax=300'),
+            'evoked': np.array(get('/api/eeg-evoked?tmin=-0.2&tmax=0.5')['evoked']),
+        }
+        # The values handed to the renderer, not the PNG
+        captured = []
+        mp.setattr(app, 'topomap_png', lambda values, info, time_point: captured.append(values) or b'')
+        for time_point in TOPOMAP_TIMES:
+            app.render_topomap(raw, time_point)
+        outputs['topomap'] = np.array(captured)
+    sys.modules.pop('app', None)
+    return outputs
+
+
+@pytest.fixture(scope='module')
+def outputs(tmp_path_factory):
+    return {dtype: serve(dtype, tmp_path_factory.mktemp(dtype)) for dtype in DTYPES}
+
+
+def relative_error(reference, value):
+    """Largest deviation relative to the reference's peak magnitude"""
+    reference = np.asarray(reference, dtype=np.float64)
+    return np.abs(np.asarray(value, dtype=np.float64) - reference).max() / np.abs(reference).max()
+
+
+def test_storage_is_halved(outputs):
+    assert outputs['float64']['dtype'] == np.float64
+    assert outputs['float32']['dtype'] == np.float32
+    assert outputs['float32']['nbytes'] * 2 == outputs['float64']['nbytes']
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_windows(outputs, window):
+    assert relative_error(outputs['float64']['windows'][window], outputs['float32']['windows'][window]) < 1e-6
+
+
+def test_psd(outputs):
+    assert relative_error(outputs['float64']['psd'], outputs['float32']['psd']) < 2e-6
+
+
+def test_band_powers(outputs):
+    reference = outputs['float64']['bands']
+    for band, value in reference.items():
+        if isinstance(value, float):
+            assert relative_error(value, outputs['float32']['bands'][band]) < 1e-6, band
+
+
+def test_stats(outputs):
+    reference = outputs['float64']['stats']
+    for field in ('mean', 'variance', 'rms', 'min', 'max', 'kurtosis', 'line_length'):
+        # Accumulated in float64 in both modes; only the stored samples are rounded
+        assert relative_error(reference[field], outputs['float32']['stats'][field]) < 2e-7, field
+
+
+def test_evoked(outputs):
+    assert relative_error(outputs['float64']['evoked'], outputs['float32']['evoked']) < 2e-7
+
+
+def test_topomap_values(outputs):
+    assert relative_error(outputs['float64']['topomap'], outputs['float32']['topomap']) < 1e-6
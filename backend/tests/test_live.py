@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from mne.time_frequency import psd_array_welch
+
+import live
+
+SFREQ = 250.0
+# Four whole segments of live.N_FFT samples
+SECONDS = 30.0
+CH_NAMES = ('Fz', 'Cz', 'Pz')
+
+
+def make_buffer(directory):
+    return live.LiveBuffer(str(directory), CH_NAMES, SFREQ, SECONDS)
+
+
+def signal(n_times, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_times) / SFREQ
+    # Noise, a 10 Hz rhythm and a DC offset, which the per-segment detrend must remove
+    return 10e-6 * rng.standard_normal((len(CH_NAMES), n_times)) + 20e-6 * np.sin(2 * np.pi * 10 * t) + 1e-3
+
+
+def push_in_chunks(buffer, data, seed=0):
+    """Push data in irregular chunks, some crossing segment boundaries"""
+    rng = np.random.default_rng(seed)
+    pos = 0
+    while pos < data.shape[1]:
+        take = int(rng.integers(1, 3 * live.N_FFT // 2))
+        buffer.push(data[:, pos:pos + take])
+        pos += take
+
+
+def welch(data):
+    """Welch PSD over whole N_FFT segments, as Raw.compute_psd computes it"""
+    return psd_array_welch(data, SFREQ, fmin=0, fmax=live.FMAX, n_fft=live.N_FFT, n_overlap=0,
+                           window='hamming', average='mean', verbose=False)
+
+
+@pytest.mark.parametrize('trailing', [0, 500])
+@pytest.mark.parametrize('n_segments', [1, 3, 4, 11])
+def test_spectrum_matches_psd_array_welch(tmp_path, n_segments, trailing):
+    buffer = make_buffer(tmp_path)
+    # A partial trailing segment is not part of the spectrum yet
+    data = signal(n_segments * live.N_FFT + trailing)
+    push_in_chunks(buffer, data)
+
+    # Whole segments still in the ring; a partial one has already taken the oldest slot
+    kept = min(n_segments, buffer.n_segments - (trailing > 0))
+    expected, freqs = welch(data[:, (n_segments - kept) * live.N_FFT:n_segments * live.N_FFT])
+    psds, value_freqs = buffer.spectrum()
+    np.testing.assert_allclose(value_freqs, freqs)
+    np.testing.assert_allclose(psds, expected, rtol=1e-9, atol=1e-12 * expected.max())
+
+
+def test_segment_psd_matches_psd_array_welch():
+    segment = signal(live.N_FFT, seed=1)
+    freqs, mask = live.welch_frequencies(SFREQ)
+    expected, expected_freqs = welch(segment)
+    np.testing.assert_allclose(freqs, expected_freqs)
+    np.testing.assert_allclose(live.segment_psd(segment, SFREQ, mask), expected, rtol=1e-12)
+
+
+def test_workers_share_state(tmp_path):
+    writer = make_buffer(tmp_path)
+    data = signal(6 * live.N_FFT + 10, seed=2)
+    push_in_chunks(writer, data, seed=2)
+    reader = make_buffer(tmp_path)
+    np.testing.assert_array_equal(reader.spectrum()[0], writer.spectrum()[0])
+    # The window read back wraps around the ring
+    start, window = reader.window(0, data.shape[1] / SFREQ)
+    assert start == data.shape[1] - reader.capacity
+    np.testing.assert_array_equal(window, data[:, start:])
+
+
+def test_spectrum_before_first_segment(tmp_path):
+    buffer = make_buffer(tmp_path)
+    buffer.push(signal(live.N_FFT - 1))
+    with pytest.raises(ValueError):
+        buffer.spectrum()
+    buffer.reset()
+    assert buffer.extent() == (0, 0)
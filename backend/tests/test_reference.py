@@ -0,0 +1,96 @@
+import mne
+import numpy as np
+import pytest
+
+import live
+import reference
+
+WINDOW = (300, 900)
+
+
+@pytest.fixture(scope='module')
+def raw():
+    raw = live.synthetic_recording(seconds=10, sfreq=200, n_channels=32, seed=0)
+    return raw.pick('eeg')
+
+
+def montage(raw, kind, **kwargs):
+    return reference.build_montage(kind, raw.ch_names, reference.channel_positions(raw.info), **kwargs)
+
+
+def window(inst):
+    return inst.get_data()[:, WINDOW[0]:WINDOW[1]]
+
+
+def assert_mixes_like(montage, raw, expected):
+    np.testing.assert_allclose(montage.apply(raw.get_data(), *WINDOW), expected, rtol=0, atol=1e-12 * np.abs(expected).max())
+
+
+def test_original_is_unchanged(raw):
+    m = montage(raw, 'original')
+    assert m.labels == raw.ch_names
+    assert_mixes_like(m, raw, window(raw))
+
+
+def test_average_matches_mne(raw):
+    expected = raw.copy().set_eeg_reference('average', verbose=False)
+    assert_mixes_like(montage(raw, 'average'), raw, window(expected))
+
+
+@pytest.mark.parametrize('ref_picks', [None, (3, 28), (15,)])
+def test_linked_matches_mne(raw, ref_picks):
+    ref_channels = ref_picks and tuple(raw.ch_names[i] for i in ref_picks)
+    m = montage(raw, 'linked', ref_channels=ref_channels)
+    if ref_channels is None:
+        # The most lateral left and right electrodes
+        x = {name: pos[0] for name, pos in raw.get_montage().get_positions()['ch_pos'].items()}
+        ref_channels = (min(raw.ch_names, key=x.get), max(raw.ch_names, key=x.get))
+    expected = raw.copy().set_eeg_reference(list(ref_channels), verbose=False)
+    assert_mixes_like(m, raw, window(expected))
+
+
+@pytest.mark.parametrize('pair_picks', [None, ((0, 5), (5, 10), (20, 12))])
+def test_bipolar_matches_mne(raw, pair_picks):
+    pairs = pair_picks and tuple((raw.ch_names[a], raw.ch_names[c]) for a, c in pair_picks)
+    m = montage(raw, 'bipolar', pairs=pairs)
+    if pairs is None:
+        pairs = [tuple(label.split('-')) for label in m.labels]
+        assert pairs, "no default pairs"
+    anodes, cathodes = zip(*pairs)
+    expected = mne.set_bipolar_reference(raw, list(anodes), list(cathodes), drop_refs=False, verbose=False)
+    labels = [f'{a}-{c}' for a, c in pairs]
+    assert m.labels == labels
+    assert_mixes_like(m, raw, window(expected.copy().pick(labels)))
+
+
+@pytest.mark.parametrize('n_neighbors', [1, 4, 6])
+def test_laplacian_matches_per_channel_reference(raw, n_neighbors):
+    # MNE has no Hjorth Laplacian; each output is that channel referenced to its neighbours' mean
+    positions = raw.get_montage().get_positions()['ch_pos']
+    expected = []
+    for name in raw.ch_names:
+        others = sorted((np.linalg.norm(positions[other] - positions[name]), other)
+                        for other in raw.ch_names if other != name)
+        neighbors = [other for _, other in others[:n_neighbors]]
+        expected.append(window(raw.copy().set_eeg_reference(neighbors, verbose=False).pick([name]))[0])
+    assert_mixes_like(montage(raw, 'laplacian', n_neighbors=n_neighbors), raw, np.array(expected))
+
+
+@pytest.mark.parametrize('kind', ['average', 'linked', 'bipolar', 'laplacian'])
+def test_float32_mixing(raw, kind):
+    data = raw.get_data()
+    m64 = montage(raw, kind)
+    m32 = montage(raw, kind, dtype=np.float32)
+    value = m32.mix(data[:, WINDOW[0]:WINDOW[1]].astype(np.float32))
+    assert value.dtype == np.float32
+    expected = m64.apply(data, *WINDOW)
+    assert np.abs(value - expected).max() < 1e-6 * np.abs(expected).max()
+
+
+def test_missing_positions(raw):
+    positions = reference.channel_positions(raw.info)
+    positions[3] = np.nan
+    with pytest.raises(ValueError):
+        reference.build_montage('laplacian', raw.ch_names, positions)
+    with pytest.raises(ValueError):
+        reference.build_montage('linked', raw.ch_names, positions, ref_channels=('nope',))
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+
+import resample
+
+N_TIMES = 6000
+RATIOS = [(1, 2), (1, 4), (2, 3), (5, 12), (1, 7)]
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    # Noise plus a DC offset, so zero padding at either end shows up in the edge windows
+    return rng.standard_normal((3, N_TIMES)) + np.array([[0.0], [5.0], [-2.0]])
+
+
+def windows(n_out):
+    """Inclusive (k0, k1) ranges: both recording edges, the interior, one sample, everything"""
+    return [(0, 40), (n_out // 3, n_out // 3 + 250), (n_out - 57, n_out - 1), (123, 123), (0, n_out - 1)]
+
+
+@pytest.mark.parametrize('up, down', RATIOS)
+def test_window_matches_resample_poly_slice(data, up, down):
+    expected = resample_poly(data, up, down, axis=1)
+    n_out = resample.output_length(N_TIMES, up, down)
+    assert expected.shape[1] == n_out
+    for k0, k1 in windows(n_out):
+        value = resample.resample_window(data, up, down, k0, k1)
+        np.testing.assert_allclose(value, expected[:, k0:k1 + 1], rtol=0, atol=1e-12, err_msg=f'{k0}..{k1}')
+
+
+@pytest.mark.parametrize('up, down', RATIOS[:3])
+def test_float32_window(data, up, down):
+    data32 = data.astype(np.float32)
+    expected = resample_poly(data32, up, down, axis=1)
+    k0, k1 = windows(expected.shape[1])[1]
+    value = resample.resample_window(data32, up, down, k0, k1)
+    assert value.dtype == np.float32
+    np.testing.assert_allclose(value, expected[:, k0:k1 + 1], rtol=0, atol=1e-5)
+
+
+def test_consecutive_windows_stitch(data):
+    up, down = 2, 3
+    n_out = resample.output_length(N_TIMES, up, down)
+    h = resample.design_filter(up, down)
+    edges = [0, 311, 312, 1500, n_out]
+    pieces = [resample.resample_window(data, up, down, a, b - 1, h) for a, b in zip(edges, edges[1:]) if b > a]
+    np.testing.assert_allclose(np.hstack(pieces), resample_poly(data, up, down, axis=1), rtol=0, atol=1e-12)
+
+
+def test_resampler_cached_copy_matches_windows(data):
+    resampler = resample.Resampler(cache_after=2, cached_rates=1)
+    expected = resample_poly(data, 1, 4, axis=1)
+    results = [resampler.window(data, 1, 4, 100, 300) for _ in range(3)]
+    assert [cached for _, cached in results] == [False, False, True]
+    for window, _ in results:
+        np.testing.assert_allclose(window, expected[:, 100:301], rtol=0, atol=1e-12)
+
+    # A second popular rate evicts the first copy
+    for _ in range(2):
+        resampler.window(data, 1, 2, 0, 10)
+    assert resampler.cache_info()['cached'] == [(1, 2)]
+
+
+def test_ratio():
+    assert resample.ratio(600, 150) == (1, 4)
+    up, down = resample.ratio(600.614990234375, 200)
+    assert abs(600.614990234375 * up / down - 200) < 0.5
+    for sfreq in (0, 600, 1000):
+        with pytest.raises(ValueError):
+            resample.ratio(600, sfreq)
+
+
+def test_output_range():
+    assert resample.output_range(1.0, 2.0, 150, 1000) == (150, 300)
+    assert resample.output_range(-1.0, 100.0, 150, 1000) == (0, 999)
+    with pytest.raises(ValueError):
+        resample.output_range(2.0, 1.0, 150, 1000)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import search
+import stats
+
+
+def build_index(data):
+    index, _ = stats.StatsIndex.build(lambda a, b: data[:, a:b], data.shape[0], data.shape[1])
+    return index
+
+
+def greedy_peaks(data, picks, start, stop, k, min_separation):
+    """Every sample in decreasing |x|, skipping those near an accepted peak"""
+    candidates = [(abs(data[p, s]), p, s) for p in picks for s in range(start, stop)]
+    accepted = []
+    for _, p, s in sorted(candidates, reverse=True):
+        if all(q != p or abs(t - s) > min_separation for q, t, _ in accepted):
+            accepted.append((p, s, float(data[p, s])))
+            if len(accepted) == k:
+                break
+    return accepted
+
+
+def test_two_separated_peaks_in_one_block():
+    data = np.zeros((1, 4 * stats.BLOCK_SIZE))
+    data[0, 10] = 5.0
+    data[0, 200] = -4.0
+    data[0, 600] = 1.0
+    peaks, _ = search.top_peaks(build_index(data), [0], 0, data.shape[1], k=2, min_separation=50)
+    assert peaks == [(0, 10, 5.0), (0, 200, -4.0)]
+
+
+def test_block_whose_max_is_suppressed_still_contributes():
+    # The second block's maximum sits right next to the first block's peak
+    block = stats.BLOCK_SIZE
+    data = np.zeros((1, 3 * block))
+    data[0, block - 2] = 9.0
+    data[0, block + 1] = 8.0
+    data[0, block + 100] = 7.0
+    data[0, 2 * block + 5] = 1.0
+    peaks, _ = search.top_peaks(build_index(data), [0], 0, data.shape[1], k=2, min_separation=10)
+    assert peaks == [(0, block - 2, 9.0), (0, block + 100, 7.0)]
+
+
+@pytest.mark.parametrize("min_separation", [0, 20, 300])
+def test_matches_greedy_search(min_separation):
+    rng = np.random.default_rng(min_separation)
+    data = rng.standard_normal((3, 10 * stats.BLOCK_SIZE + 37))
+    picks, start, stop = [0, 2], 100, data.shape[1] - 50
+    peaks, blocks_read = search.top_peaks(build_index(data), picks, start, stop, k=8, min_separation=min_separation)
+    assert peaks == greedy_peaks(data, picks, start, stop, 8, min_separation)
@@ -0,0 +1,49 @@
+import mne
+import numpy as np
+import pytest
+
+import live
+import source
+
+WINDOW = slice(400, 600)
+LAMBDA2 = 1.0 / 3.0 ** 2
+
+
+@pytest.fixture(scope='module')
+def recording():
+    """Synthetic EEG with an average reference projector and a sphere-model forward"""
+    raw = live.synthetic_recording(seconds=20, sfreq=200, n_channels=32, seed=0)
+    raw.pick('eeg')
+    raw.set_eeg_reference('average', projection=True, verbose=False)
+    sphere = mne.make_sphere_model('auto', 'auto', raw.info, verbose=False)
+    src = mne.setup_volume_source_space(sphere=sphere, pos=25.0, verbose=False)
+    fwd = mne.make_forward_solution(raw.info, None, src, sphere, meg=False, eeg=True, verbose=False)
+    cov = mne.compute_raw_covariance(raw, verbose=False)
+    return raw, fwd, cov
+
+
+@pytest.mark.parametrize('fixed', (False, True), ids=('free', 'fixed'))
+@pytest.mark.parametrize('method', source.METHODS)
+def test_kernel_matches_apply_inverse_raw(recording, method, fixed):
+    raw, fwd, cov = recording
+    inv = mne.minimum_norm.make_inverse_operator(
+        raw.info, fwd, cov, fixed=fixed, loose=0.0 if fixed else 1.0, depth=0.8, verbose=False
+    )
+    # Data channels in a different order than the inverse's, as after a montage change
+    order = np.random.default_rng(0).permutation(len(raw.ch_names))
+    ch_names = [raw.ch_names[i] for i in order]
+    kernel = source.InverseKernel(inv, ch_names, method, LAMBDA2)
+
+    expected = mne.minimum_norm.apply_inverse_raw(
+        raw, inv, LAMBDA2, method, start=WINDOW.start, stop=WINDOW.stop, verbose=False
+    ).data
+    value = kernel.apply(raw.get_data()[order, WINDOW])
+    assert value.shape == expected.shape
+    assert np.abs(value - expected).max() <= 1e-10 * np.abs(expected).max()
+
+
+def test_missing_channel(recording):
+    raw, fwd, cov = recording
+    inv = mne.minimum_norm.make_inverse_operator(raw.info, fwd, cov, verbose=False)
+    with pytest.raises(ValueError, match=raw.ch_names[0]):
+        source.InverseKernel(inv, raw.ch_names[1:], 'dSPM', LAMBDA2)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import scipy.stats
+
+import stats
+
+N_TIMES = 20 * stats.BLOCK_SIZE + 113
+WINDOWS = {
+    'inside one block': (10, 200),
+    'block aligned': (stats.BLOCK_SIZE, 5 * stats.BLOCK_SIZE),
+    'ragged edges': (37, N_TIMES - 41),
+    'whole recording': (0, N_TIMES),
+    'two samples': (stats.BLOCK_SIZE - 1, stats.BLOCK_SIZE + 1),
+    'one sample': (500, 501),
+    'clamped': (-100, N_TIMES + 100),
+}
+
+
+def reference_stats(x):
+    """The same figures computed directly from the samples"""
+    return {
+        "mean": x.mean(axis=1),
+        "variance": x.var(axis=1),
+        "rms": np.sqrt((x * x).mean(axis=1)),
+        "min": x.min(axis=1),
+        "max": x.max(axis=1),
+        # Excess kurtosis of a constant window is reported as 0
+        "kurtosis": np.nan_to_num(scipy.stats.kurtosis(x, axis=1, fisher=True, bias=True)),
+        "line_length": np.abs(np.diff(x, axis=1)).sum(axis=1),
+    }
+
+
+@pytest.fixture(scope='module')
+def data():
+    """EEG-scaled noise on DC offsets far larger than the signal, plus a few spikes"""
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((4, N_TIMES)) * 20e-6 + np.array([[0.0], [1e-3], [-5e-2], [3e-6]])
+    x[1, 1234] += 400e-6
+    x[2, ::97] -= 150e-6
+    return x
+
+
+def assert_stats_equal(value, expected):
+    for name, reference in expected.items():
+        # Kurtosis is a ratio of reconstructed fourth and second moments; the rest are direct
+        rtol = 1e-7 if name == 'kurtosis' else 1e-9
+        np.testing.assert_allclose(value[name], reference, rtol=rtol, atol=1e-12 * np.abs(reference).max(), err_msg=name)
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_window_matches_scipy(data, window):
+    index, _ = stats.StatsIndex.build(lambda a, b: data[:, a:b], data.shape[0], data.shape[1])
+    start, stop = WINDOWS[window]
+    expected = reference_stats(data[:, max(start, 0):min(stop, N_TIMES)])
+    assert_stats_equal(index.window(start, stop), expected)
+
+
+def test_empty_window(data):
+    index, _ = stats.StatsIndex.build(lambda a, b: data[:, a:b], data.shape[0], data.shape[1])
+    with pytest.raises(ValueError):
+        index.window(300, 300)
+
+
+@pytest.mark.parametrize('chunk', (1, 100, stats.BLOCK_SIZE, N_TIMES))
+def test_running_moments_match_scipy(data, chunk):
+    moments = stats.RunningMoments(data.shape[0])
+    for start in range(0, N_TIMES, chunk):
+        moments.update(data[:, start:start + chunk])
+    assert moments.n == N_TIMES
+    assert_stats_equal(moments.result(), reference_stats(data))
+
+
+def test_build_returns_whole_recording_moments(data):
+    _, moments = stats.StatsIndex.build(
+        lambda a, b: data[:, a:b], data.shape[0], data.shape[1], chunk_blocks=3
+    )
+    assert_stats_equal(moments.result(), reference_stats(data))
@@ -0,0 +1,151 @@
+"""
+Topographic map rendering without pyplot
+pyplot's figure manager is global state, so maps could not be drawn by several threads
+of one worker. Here every thread keeps its own object-oriented Figure per channel
+layout, with axes, head outline, sensors and colorbar built once. Interpolating the
+channel values onto the image grid is one matrix precomputed per layout. A frame only
+swaps the image data, contours, colour limits and title, then encodes the PNG
+"""
+import io
+import threading
+import warnings
+
+import mne
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+BACKGROUND = '#000000'
+CMAP = 'RdBu_r'
+CONTOURS = 6
+# Figure layout; each backend passes its own
+STYLE = {
+    "figsize": (8, 6),
+    "dpi": 150,
+    "title_size": 14,
+    "title_pad": 20,
+    "label_size": 12
+}
+# Added around the tight bounding box measured when a template is built, so longer
+# colorbar tick labels of later frames still fit
+MARGIN = 0.15
+
+
+def interpolation_matrix(info):
+    """
+    (extent, weights): MNE's topomap image for channel values v is weights @ v
+    The interpolation (Clough-Tocher, with extrapolated points set to their neighbours'
+    mean) is linear in v, so each column is the image of one unit vector
+    """
+    n_channels = len(info.ch_names)
+    fig = Figure()
+    ax = fig.add_subplot()
+    columns = []
+    for i in range(n_channels):
+        unit = np.zeros(n_channels)
+        unit[i] = 1.0
+        ax.clear()
+        im, _ = mne.viz.plot_topomap(unit, info, axes=ax, show=False, contours=0, sensors=False)
+        columns.append(np.asarray(im.get_array(), dtype=np.float64).ravel())
+    return im.get_extent(), np.stack(columns, axis=1)
+
+
+class TopomapTemplate:
+    """One pre-built figure; a template must not be used by two threads at once"""
+
+    def __init__(self, info, extent, weights, values, style=STYLE):
+        self.weights = weights
+        self.dpi = style['dpi']
+        self.fig = Figure(figsize=style['figsize'], dpi=self.dpi, facecolor=BACKGROUND)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_facecolor(BACKGROUND)
+
+        # Head outline, sensors and the image and contour artists come from MNE once
+        self.image, contours = mne.viz.plot_topomap(
+            values, info, axes=self.ax, show=False, cmap=CMAP, contours=CONTOURS
+        )
+        self.shape = self.image.get_array().shape
+        xmin, xmax, ymin, ymax = extent
+        self.grid = np.meshgrid(np.linspace(xmin, xmax, self.shape[1]), np.linspace(ymin, ymax, self.shape[0]))
+        self.head = self.image.get_clip_path()
+        self.contours = contours
+        self.contour_style = {"colors": 'k', "linewidths": 0.5}
+        if contours is not None:
+            self.contour_style.update(linewidths=contours.get_linewidths(), zorder=contours.get_zorder())
+
+        self.title = self.ax.set_title('', color='white', fontsize=style['title_size'], pad=style['title_pad'])
+
+        cbar = self.fig.colorbar(self.image, ax=self.ax, fraction=0.046, pad=0.04)
+        cbar.ax.yaxis.set_tick_params(color='white')
+        cbar.ax.tick_params(labelcolor='white')
+        cbar.set_label('Amplitude (µV)', color='white', fontsize=style['label_size'])
+        cbar.outline.set_edgecolor('white')
+
+        # Measured once; savefig(bbox_inches='tight') would lay the figure out again per frame
+        self.update(values, 0.0)
+        self.canvas.draw()
+        self.bbox = self.fig.get_tightbbox(self.canvas.get_renderer()).padded(MARGIN)
+
+    def update(self, values, time_point):
+        """Point the image, contours, colour limits and title at one vector of channel values"""
+        values = np.asarray(values, dtype=np.float64)
+        image = (self.weights @ values).reshape(self.shape)
+        self.image.set_data(image)
+        # Symmetric limits around zero unless every value is non-negative, as plot_topomap picks
+        vmax = np.abs(values).max()
+        vmin = 0.0 if values.min() >= 0 else -vmax
+        self.image.set_clim(vmin, vmax)
+
+        if self.contours is not None:
+            self.contours.remove()
+            self.contours = None
+        # Constant maps have no contours
+        if not np.all((image == image.flat[0]) | np.isnan(image)):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                self.contours = self.ax.contour(*self.grid, image, CONTOURS, **self.contour_style)
+            self.contours.set_clip_path(self.head)
+
+        self.title.set_text(f'Topographic Map at {time_point:.2f}s')
+
+    def encode(self):
+        """PNG bytes of the current map"""
+        img = io.BytesIO()
+        self.fig.savefig(img, format='png', facecolor=BACKGROUND, bbox_inches=self.bbox, dpi=self.dpi)
+        return img.getvalue()
+
+
+class TopomapRenderer:
+    """
+    Thread-local templates keyed by channel layout
+    The interpolation matrices are shared by all threads; figures never are
+    """
+
+    def __init__(self, style=STYLE):
+        self.style = style
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._matrices = {}
+
+    def prepare(self, info):
+        """Build the interpolation matrix for info's channels ahead of the first frame"""
+        self._matrix(info)
+
+    def _matrix(self, info):
+        key = tuple(info.ch_names)
+        with self._lock:
+            if key not in self._matrices:
+                self._matrices[key] = interpolation_matrix(info)
+            return self._matrices[key]
+
+    def template(self, info, values):
+        """This thread's template for info's channels, built on first use from values"""
+        templates = getattr(self._local, 'templates', None)
+        if templates is None:
+            templates = self._local.templates = {}
+        key = tuple(info.ch_names)
+        if key not in templates:
+            extent, weights = self._matrix(info)
+            templates[key] = TopomapTemplate(info, extent, weights, values, self.style)
+        return templates[key]
@@ -0,0 +1,256 @@
+"""
+Recording annotations
+Annotations live in a local SQLite database keyed by recording; each worker keeps an
+in-memory interval index over them that answers overlap queries in O(log n + m) and
+is rebuilt only when the recording's revision counter shows another write
+"""
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import numpy as np
+
+FIELDS = ('id', 'onset', 'duration', 'description', 'kind', 'color', 'source')
+KINDS = ('stimulus', 'response', 'artifact', 'custom')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS annotation (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recording TEXT NOT NULL,
+    onset REAL NOT NULL,
+    duration REAL NOT NULL DEFAULT 0,
+    description TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'custom',
+    color TEXT,
+    source TEXT NOT NULL DEFAULT 'user'
+);
+CREATE INDEX IF NOT EXISTS annotation_recording_onset ON annotation (recording, onset);
+CREATE TABLE IF NOT EXISTS annotation_revision (
+    recording TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL DEFAULT 0,
+    imported INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class IntervalIndex:
+    """
+    Static interval index: intervals sorted by onset plus a max-end segment tree
+    An overlap query bisects the onsets for candidates starting before tmax, then
+    descends the tree only into subtrees whose latest end reaches tmin
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (row['onset'], row['id']))
+        self.rows = rows
+        self.onsets = np.array([row['onset'] for row in rows], dtype=np.float64)
+        self.ends = self.onsets + np.array([row['duration'] for row in rows], dtype=np.float64)
+
+        size = 1
+        while size < max(len(rows), 1):
+            size *= 2
+        self.size = size
+        tree = np.full(2 * size, -np.inf)
+        tree[size:size + len(rows)] = self.ends
+        # Each level up is the pairwise max of the level below
+        level = size
+        while level > 1:
+            tree[level // 2:level] = np.maximum(tree[level:2 * level:2], tree[level + 1:2 * level:2])
+            level //= 2
+        self.tree = tree
+
+    def __len__(self):
+        return len(self.rows)
+
+    def overlapping(self, tmin, tmax):
+        """Rows whose [onset, onset + duration] intersects [tmin, tmax], in onset order"""
+        limit = int(np.searchsorted(self.onsets, tmax, side='right'))
+        if limit == 0:
+            return []
+        hits = []
+        # (node, node_lo, node_hi): node covers sorted positions [node_lo, node_hi)
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo >= limit or self.tree[node] < tmin:
+                continue
+            if node >= self.size:
+                hits.append(lo)
+                continue
+            mid = (lo + hi) // 2
+            # Right pushed first so hits come out in onset order
+            stack.append((2 * node + 1, mid, hi))
+            stack.append((2 * node, lo, mid))
+        return [self.rows[i] for i in hits]
+
+
+def _row(values):
+    return dict(zip(FIELDS, values))
+
+
+def normalize_annotation(item):
+    """Validate one annotation from a request body"""
+    try:
+        onset = float(item['onset'])
+        description = str(item['description']).strip()
+    except (KeyError, TypeError):
+        raise ValueError("each annotation needs onset and description")
+    duration = float(item.get('duration') or 0.0)
+    kind = item.get('kind') or 'custom'
+    if onset < 0 or duration < 0:
+        raise ValueError("onset and duration must be non-negative")
+    if not description:
+        raise ValueError("description must not be empty")
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    return {'onset': onset, 'duration': duration, 'description': description,
+            'kind': kind, 'color': item.get('color')}
+
+
+def file_annotations(raw):
+    """raw.annotations with onsets relative to the first sample, as store rows"""
+    annotations = raw.annotations
+    # With orig_time set, onsets count from the measurement start rather than the first sample
+    offset = raw.first_time if annotations.orig_time is not None else 0.0
+    return [
+        {'onset': max(0.0, float(onset) - offset), 'duration': float(duration),
+         'description': str(description), 'kind': 'artifact' if str(description).upper().startswith('BAD') else 'custom',
+         'color': None}
+        for onset, duration, description in zip(annotations.onset, annotations.duration, annotations.description)
+    ]
+
+
+class AnnotationStore:
+    """
+    SQLite-backed annotation store for one recording
+    Bulk writes run in a single transaction and bump the revision counter, which is
+    how other worker processes learn that their interval index is stale. Each thread
+    keeps one open connection for that revision check, since it runs on every data window
+    """
+
+    def __init__(self, db_path, recording):
+        self.db_path = db_path
+        self.recording = recording
+        self._lock = threading.Lock()
+        self._index = None
+        self._revision = None
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with closing(self._connect()) as conn:
+            # Stored in the database file, so every later connection is in WAL mode too
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _reader(self):
+        """This thread's long-lived connection; reopened in a forked worker, never shared"""
+        pid, conn = getattr(self._local, 'reader', (None, None))
+        if pid != os.getpid():
+            conn = self._connect()
+            self._local.reader = (os.getpid(), conn)
+        return conn
+
+    def _bump(self, conn):
+        conn.execute(
+            'INSERT INTO annotation_revision (recording, revision) VALUES (?, 1) '
+            'ON CONFLICT(recording) DO UPDATE SET revision = revision + 1',
+            (self.recording,)
+        )
+
+    def import_file_annotations(self, rows):
+        """Copy the recording's own annotations in once; later calls are no-ops"""
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                done = conn.execute(
+                    'SELECT imported FROM annotation_revision WHERE recording = ?', (self.recording,)
+                ).fetchone()
+                if done and done[0]:
+                    conn.execute('COMMIT')
+                    return 0
+                conn.executemany(
+                    'INSERT INTO annotation (recording, onset, duration, description, kind, color, source) '
+                    "VALUES (?, ?, ?, ?, ?, ?, 'file')",
+                    [(self.recording, r['onset'], r['duration'], r['description'], r['kind'], r['color']) for r in rows]
+                )
+                conn.execute(
+                    'INSERT INTO annotation_revision (recording, revision, imported) VALUES (?, 1, 1) '
+                    'ON CONFLICT(recording) DO UPDATE SET revision = revision + 1, imported = 1',
+                    (self.recording,)
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return len(rows)
+
+    def create(self, items):
+        """Insert annotations in one transaction; returns the stored rows"""
+        items = [normalize_annotation(item) for item in items]
+        created = []
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for item in items:
+                    cursor = conn.execute(
+                        'INSERT INTO annotation (recording, onset, duration, description, kind, color) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        (self.recording, item['onset'], item['duration'], item['description'], item['kind'], item['color'])
+                    )
+                    created.append({'id': cursor.lastrowid, **item, 'source': 'user'})
+                self._bump(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return created
+
+    def delete(self, ids):
+        """Delete annotations by id in one transaction; returns the number removed"""
+        ids = [int(i) for i in ids]
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = conn.executemany(
+                    'DELETE FROM annotation WHERE recording = ? AND id = ?',
+                    [(self.recording, i) for i in ids]
+                )
+                deleted = cursor.rowcount
+                self._bump(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return deleted
+
+    def index(self):
+        """The interval index, rebuilt if any process has written since it was built"""
+        conn = self._reader()
+        revision = conn.execute(
+            'SELECT revision FROM annotation_revision WHERE recording = ?', (self.recording,)
+        ).fetchone()
+        revision = revision[0] if revision else 0
+        with self._lock:
+            if self._index is not None and self._revision == revision:
+                return self._index
+        rows = conn.execute(
+            f'SELECT {", ".join(FIELDS)} FROM annotation WHERE recording = ?', (self.recording,)
+        ).fetchall()
+        index = IntervalIndex([_row(values) for values in rows])
+        with self._lock:
+            self._index, self._revision = index, revision
+        return index
+
+    def query(self, tmin=None, tmax=None):
+        """Annotations overlapping [tmin, tmax] (all of them when unbounded), in onset order"""
+        index = self.index()
+        if tmin is None and tmax is None:
+            return list(index.rows)
+        tmin = -np.inf if tmin is None else float(tmin)
+        tmax = np.inf if tmax is None else float(tmax)
+        if tmax < tmin:
+            raise ValueError("tmax must not be less than tmin")
+        return index.overlapping(tmin, tmax)
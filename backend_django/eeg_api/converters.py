@@ -0,0 +1,14 @@
+"""
+Custom URL path converters
+"""
+
+
+class FloatConverter:
+    """Matches signed decimal numbers such as 5, 5.0 or -0.25"""
+    regex = r'-?\d+(?:\.\d+)?'
+
+    def to_python(self, value):
+        return float(value)
+
+    def to_url(self, value):
+        return str(value)
@@ -0,0 +1,264 @@
+"""
+Streaming recording export
+Every format is written by a generator that reads the recording one chunk at a time,
+so server memory stays flat however long the exported range is. Optional band-pass
+filtering is done chunk by chunk with overlap-save convolution, matching the
+zero-phase FIR filter of raw.filter without ever holding a filtered copy
+"""
+import io
+import zipfile
+from datetime import datetime, timezone
+
+import mne
+import numpy as np
+from scipy.signal import oaconvolve
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'edf': ('application/octet-stream', 'edf'),
+    'npz': ('application/zip', 'npz'),
+}
+
+# Samples per streamed chunk (about 10 s at 600 Hz)
+CHUNK_SAMPLES = 6000
+# EDF stores 16-bit integers scaled between physical min and max (in µV)
+EDF_DIGITAL_MIN, EDF_DIGITAL_MAX = -32768, 32767
+
+
+def parse_channels(channels, ch_names):
+    """Picks for a comma-separated channel list (every channel when empty)"""
+    if not channels:
+        return np.arange(len(ch_names))
+    names = [c.strip() for c in channels.split(',') if c.strip()]
+    missing = [c for c in names if c not in ch_names]
+    if missing:
+        raise ValueError(f"unknown channels: {', '.join(missing)}")
+    return np.array([ch_names.index(c) for c in names])
+
+
+def parse_export_params(args, raw):
+    """Read format, channels, l_freq and h_freq query parameters"""
+    fmt = args.get('format', 'csv').lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+    picks = parse_channels(args.get('channels'), raw.ch_names)
+
+    l_freq = args.get('l_freq')
+    h_freq = args.get('h_freq')
+    l_freq = float(l_freq) if l_freq not in (None, '') else None
+    h_freq = float(h_freq) if h_freq not in (None, '') else None
+    return fmt, picks, l_freq, h_freq
+
+
+class ChunkReader:
+    """
+    Reads (picked) chunks of a data array, optionally band-pass filtered
+    Filtered chunks read len(h) // 2 extra samples on each side; the recording
+    edges are odd-reflected as raw.filter does, so output matches it exactly
+    """
+
+    def __init__(self, data, picks, sfreq, l_freq=None, h_freq=None):
+        self.data = data
+        self.picks = picks
+        self.h = None
+        if l_freq is not None or h_freq is not None:
+            self.h = mne.filter.create_filter(
+                None, sfreq, l_freq, h_freq, fir_design='firwin', verbose=False
+            )
+
+    def read(self, start, stop):
+        if self.h is None:
+            return self.data[self.picks, start:stop]
+        half = len(self.h) // 2
+        n_times = self.data.shape[1]
+        lo, hi = max(0, start - half), min(n_times, stop + half)
+        segment = self.data[self.picks, lo:hi]
+        pad = (half - (start - lo), half - (hi - stop))
+        if any(pad):
+            # Reflect about the recording edge (only ever at the first or last chunk)
+            segment = _reflect_pad(self.data, self.picks, segment, pad)
+        return oaconvolve(segment, self.h[np.newaxis], mode='valid', axes=1)
+
+    def chunks(self, start, stop, size=CHUNK_SAMPLES):
+        for a in range(start, stop, size):
+            b = min(a + size, stop)
+            yield a, b, self.read(a, b)
+
+
+def _reflect_pad(data, picks, segment, pad):
+    """Odd reflection about the first/last sample, zeros beyond the recording length"""
+    left, right = pad
+    n_times = data.shape[1]
+    parts = []
+    if left:
+        n = min(left, n_times - 1)
+        edge = data[picks, :n + 1]
+        parts += [np.zeros((len(picks), left - n)), 2 * edge[:, :1] - edge[:, n:0:-1]]
+    parts.append(segment)
+    if right:
+        n = min(right, n_times - 1)
+        edge = data[picks, n_times - n - 1:]
+        parts += [2 * edge[:, -1:] - edge[:, -2:-n - 2:-1], np.zeros((len(picks), right - n))]
+    return np.concatenate(parts, axis=1)
+
+
+def stream_csv(reader, start, stop, ch_names, sfreq):
+    """time column plus one column per channel, in volts"""
+    yield ','.join(['time'] + list(ch_names)) + '\n'
+    for a, b, chunk in reader.chunks(start, stop):
+        buffer = io.StringIO()
+        times = np.arange(a, b) / sfreq
+        np.savetxt(buffer, np.column_stack([times, chunk.T]), fmt='%.9g', delimiter=',')
+        yield buffer.getvalue()
+
+
+def _edf_field(value, width):
+    text = str(value)
+    if len(text) > width:
+        raise ValueError(f"EDF header field too long: {text!r}")
+    return text.ljust(width).encode('ascii')
+
+
+def _edf_number(value, width=8):
+    """Shortest decimal representation of value that fits an EDF header field"""
+    for digits in range(width, 0, -1):
+        text = f'{value:.{digits}g}'
+        if len(text) <= width:
+            return text
+    raise ValueError(f"cannot represent {value} in {width} characters")
+
+
+def edf_layout(n_times, sfreq):
+    """Samples per data record, record duration and record count (last record zero-padded)"""
+    per_record = max(1, int(round(sfreq)))
+    duration = _edf_number(per_record / sfreq)
+    return per_record, duration, -(-n_times // per_record)
+
+
+def edf_size(n_channels, n_times, sfreq):
+    """Exact byte size of the EDF file, for Content-Length"""
+    per_record, _, n_records = edf_layout(n_times, sfreq)
+    return 256 * (n_channels + 1) + n_records * n_channels * per_record * 2
+
+
+def channel_ranges(reader, start, stop):
+    """Per-channel (min, max) of what the reader yields over [start, stop), one streaming pass"""
+    vmin = vmax = None
+    for _, _, chunk in reader.chunks(start, stop):
+        cmin, cmax = chunk.min(axis=1), chunk.max(axis=1)
+        vmin = cmin if vmin is None else np.minimum(vmin, cmin)
+        vmax = cmax if vmax is None else np.maximum(vmax, cmax)
+    return vmin, vmax
+
+
+def stream_edf(reader, start, stop, ch_names, sfreq, vmin, vmax, meas_date=None, prefilter=''):
+    """
+    EDF (European Data Format) file in µV with roughly one-second data records
+    vmin/vmax (volts) set each channel's physical range and so its 16-bit resolution
+    """
+    n_ch = len(ch_names)
+    per_record, duration, n_records = edf_layout(stop - start, sfreq)
+
+    phys_min = np.floor(np.asarray(vmin) * 1e6)
+    phys_max = np.ceil(np.asarray(vmax) * 1e6)
+    phys_max = np.where(phys_max > phys_min, phys_max, phys_min + 1)
+    gain = (phys_max - phys_min) / (EDF_DIGITAL_MAX - EDF_DIGITAL_MIN)
+    offset = phys_max / gain - EDF_DIGITAL_MAX
+
+    start_time = (meas_date or datetime(1985, 1, 1, tzinfo=timezone.utc))
+    header = b''.join([
+        _edf_field('0', 8),
+        _edf_field('X X X X', 80),
+        _edf_field(f'Startdate {start_time:%d-%b-%Y}'.upper() + ' X X X', 80),
+        _edf_field(f'{start_time:%d.%m.%y}', 8),
+        _edf_field(f'{start_time:%H.%M.%S}', 8),
+        _edf_field(256 * (n_ch + 1), 8),
+        _edf_field('', 44),
+        _edf_field(n_records, 8),
+        _edf_field(duration, 8),
+        _edf_field(n_ch, 4),
+        b''.join(_edf_field(name[:16], 16) for name in ch_names),
+        _edf_field('', 80) * n_ch,
+        _edf_field('uV', 8) * n_ch,
+        b''.join(_edf_field(_edf_number(v), 8) for v in phys_min),
+        b''.join(_edf_field(_edf_number(v), 8) for v in phys_max),
+        _edf_field(EDF_DIGITAL_MIN, 8) * n_ch,
+        _edf_field(EDF_DIGITAL_MAX, 8) * n_ch,
+        _edf_field(prefilter[:80], 80) * n_ch,
+        _edf_field(per_record, 8) * n_ch,
+        _edf_field('', 32) * n_ch,
+    ])
+    yield header
+
+    # Chunks are whole records so each one encodes independently
+    size = per_record * max(1, CHUNK_SAMPLES // per_record)
+    for a, b, chunk in reader.chunks(start, stop, size):
+        digital = np.round(chunk * 1e6 / gain[:, None] - offset[:, None])
+        digital = np.clip(digital, EDF_DIGITAL_MIN, EDF_DIGITAL_MAX).astype('<i2')
+        n_rec = -(-(b - a) // per_record)
+        if digital.shape[1] < n_rec * per_record:
+            digital = np.pad(digital, ((0, 0), (0, n_rec * per_record - digital.shape[1])))
+        # Data records are channel-major: record r holds per_record samples of each channel in turn
+        yield digital.reshape(n_ch, n_rec, per_record).transpose(1, 0, 2).tobytes()
+
+
+class _Sink:
+    """Write-only buffer drained between zip writes (no tell(), so zipfile streams)"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def _npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+def stream_npz(reader, start, stop, ch_names, sfreq):
+    """
+    NumPy .npz archive with data (n_channels, n_times), times, ch_names and sfreq
+    data is written in Fortran order so each time chunk is one contiguous run of bytes
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, array in (('ch_names', np.array(ch_names)), ('sfreq', np.array(sfreq))):
+            archive.writestr(f'{name}.npy', _npy_bytes(array))
+            yield sink.drain()
+
+        with archive.open('times.npy', 'w', force_zip64=True) as entry:
+            np.lib.format.write_array_header_1_0(entry, {
+                'descr': np.lib.format.dtype_to_descr(np.dtype('<f8')),
+                'fortran_order': False,
+                'shape': (stop - start,),
+            })
+            for a in range(start, stop, CHUNK_SAMPLES):
+                entry.write((np.arange(a, min(a + CHUNK_SAMPLES, stop)) / sfreq).astype('<f8').tobytes())
+        yield sink.drain()
+
+        with archive.open('data.npy', 'w', force_zip64=True) as entry:
+            np.lib.format.write_array_header_1_0(entry, {
+                'descr': np.lib.format.dtype_to_descr(np.dtype('<f8')),
+                'fortran_order': True,
+                'shape': (len(ch_names), stop - start),
+            })
+            for _, _, chunk in reader.chunks(start, stop):
+                entry.write(np.asarray(chunk, dtype='<f8').tobytes(order='F'))
+                yield sink.drain()
+    yield sink.drain()
+
+
+def filename(fmt, tmin, tmax):
+    return f'encephalic_{tmin:g}-{tmax:g}s.{FORMATS[fmt][1]}'
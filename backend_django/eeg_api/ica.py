@@ -0,0 +1,259 @@
+"""
+Background ICA decomposition
+Fits run on a worker thread against a high-passed copy of the recording and are
+persisted to disk keyed by recording and parameters. Fitted models are reduced to
+dense matrices so sources and cleaned data cost one matrix product per window
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from mne.preprocessing import ICA, read_ica
+
+try:
+    from mne._fiff.proj import make_projector
+except ImportError:  # mne < 1.6
+    from mne.io.proj import make_projector
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAMS = {
+    'n_components': 20,
+    'method': 'fastica',
+    'random_state': 97,
+    'l_freq': 1.0,
+    'decim': 3,
+}
+METHODS = ('fastica', 'infomax', 'picard')
+
+# A lock file older than this is assumed to belong to a crashed worker
+STALE_LOCK_SECONDS = 3600
+
+
+def normalize_params(params):
+    """Validate fit parameters and fill in defaults"""
+    params = {**DEFAULT_PARAMS, **{k: v for k, v in (params or {}).items() if v is not None}}
+    normalized = {
+        'n_components': int(params['n_components']),
+        'method': str(params['method']),
+        'random_state': int(params['random_state']),
+        'l_freq': float(params['l_freq']),
+        'decim': int(params['decim']),
+    }
+    if normalized['method'] not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    if normalized['n_components'] < 2:
+        raise ValueError("n_components must be at least 2")
+    if normalized['decim'] < 1 or normalized['l_freq'] <= 0:
+        raise ValueError("decim must be >= 1 and l_freq > 0")
+    return normalized
+
+
+def recording_fingerprint(path):
+    """Cheap identity of a recording file: path, size and modification time"""
+    stat = os.stat(path)
+    return f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'
+
+
+def model_key(fingerprint, params):
+    """Stable key for a (recording, parameters) pair"""
+    payload = json.dumps([fingerprint, params], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def fit_ica(raw, params, n_jobs=-1):
+    """Fit ICA on a high-passed copy, subsampling by decim during the fit"""
+    raw_fit = raw.copy().filter(params['l_freq'], None, n_jobs=n_jobs, verbose=False)
+    ica = ICA(
+        n_components=min(params['n_components'], len(raw.ch_names)),
+        method=params['method'],
+        random_state=params['random_state'],
+        max_iter='auto',
+        verbose=False
+    )
+    ica.fit(raw_fit, picks='eeg', decim=params['decim'], verbose=False)
+    return ica
+
+
+class ICAOperator:
+    """
+    A fitted ICA reduced to dense matrices
+    Matches ICA.get_sources / ICA.apply (n_pca_components=None) on the same data
+    """
+
+    def __init__(self, ica, ch_names):
+        self.ch_names = list(ica.ch_names)
+        self.picks = np.array([ch_names.index(name) for name in self.ch_names])
+        self.n_components = ica.n_components_
+        self.patterns = ica.get_components()
+
+        n_ch = len(self.ch_names)
+        projs = [p for p in ica.info['projs'] if p['active']]
+        proj, n_proj, _ = make_projector(projs, self.ch_names, include_active=True)
+        proj = proj if n_proj else np.eye(n_ch)
+
+        pre_whitener = ica.pre_whitener_[:, 0]
+        self._pre_whitener = pre_whitener
+        self._mean = ica.pca_mean_ if ica.pca_mean_ is not None else np.zeros(n_ch)
+        # Whitened input: y = proj @ x / pre_whitener - mean
+        self._whiten = proj / pre_whitener[:, None]
+
+        n_pca = getattr(ica, '_max_pca_components', None) or ica.pca_components_.shape[0]
+        pca_components = ica.pca_components_[:n_pca]
+        unmixing = np.eye(n_pca)
+        unmixing[:self.n_components, :self.n_components] = ica.unmixing_matrix_
+        mixing = np.eye(n_pca)
+        mixing[:self.n_components, :self.n_components] = ica.mixing_matrix_
+        self._unmixing = unmixing @ pca_components
+        self._mixing = pca_components.T @ mixing
+
+        self.source_matrix = self._unmixing[:self.n_components] @ self._whiten
+        self.source_offset = self._unmixing[:self.n_components] @ self._mean
+        self._clean_cache = {}
+        self._lock = threading.Lock()
+
+    def sources(self, data):
+        """Component time courses for a (n_channels, n_times) slice"""
+        return self.source_matrix @ data[self.picks] - self.source_offset[:, None]
+
+    def _cleaning_matrix(self, exclude):
+        with self._lock:
+            cached = self._clean_cache.get(exclude)
+            if cached is None:
+                keep = np.setdiff1d(np.arange(self._unmixing.shape[0]), exclude)
+                back = self._mixing[:, keep] @ self._unmixing[keep]
+                matrix = self._pre_whitener[:, None] * (back @ self._whiten)
+                offset = self._pre_whitener * (self._mean - back @ self._mean)
+                cached = self._clean_cache[exclude] = (matrix, offset)
+            return cached
+
+    def clean(self, data, exclude):
+        """Data with the excluded components removed, for the ICA channels"""
+        exclude = tuple(sorted({int(i) for i in exclude}))
+        if any(i < 0 or i >= self.n_components for i in exclude):
+            raise ValueError(f"exclude indices must be in [0, {self.n_components})")
+        matrix, offset = self._cleaning_matrix(exclude)
+        return matrix @ data[self.picks] + offset[:, None]
+
+
+class ICAStore:
+    """
+    Runs ICA fits in the background and serves persisted models
+    The on-disk model is the source of truth, so any worker process can serve a model
+    fitted by another; a lock file stops workers from fitting the same model twice, and
+    a failed fit leaves a marker file holding its error for every worker to report
+    """
+
+    def __init__(self, cache_dir, n_jobs=-1):
+        self.cache_dir = cache_dir
+        self.n_jobs = n_jobs
+        # Threads start lazily on first submit, so this is safe to create before forking
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='encephalic-ica')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._load = lru_cache(maxsize=4)(self._load_operator)
+
+    def model_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}-ica.fif')
+
+    def _lock_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.lock')
+
+    def _failed_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.failed')
+
+    def status(self, key):
+        """One of 'ready', 'running', 'failed' or 'missing' (plus an error message when failed)"""
+        if os.path.exists(self.model_path(key)):
+            return {'key': key, 'status': 'ready'}
+        with self._lock:
+            job = self._jobs.get(key)
+        if (job is not None and not job.done()) or self._locked(key):
+            return {'key': key, 'status': 'running'}
+        try:
+            with open(self._failed_path(key)) as f:
+                return {'key': key, 'status': 'failed', 'error': f.read()}
+        except FileNotFoundError:
+            return {'key': key, 'status': 'missing'}
+
+    def _locked(self, key):
+        try:
+            return time.time() - os.path.getmtime(self._lock_path(key)) < STALE_LOCK_SECONDS
+        except OSError:
+            return False
+
+    def submit(self, key, raw, params):
+        """Start a background fit unless the model exists or is already being fitted"""
+        state = self.status(key)
+        if state['status'] in ('ready', 'running'):
+            return state
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        lock = self._lock_path(key)
+        for attempt in range(2):
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                break
+            except FileExistsError:
+                # A fresh lock belongs to a fit in another worker; only a stale one,
+                # left by a worker that died mid-fit, is removed (and only once)
+                if attempt or self._locked(key):
+                    return {'key': key, 'status': 'running'}
+                try:
+                    os.remove(lock)
+                except FileNotFoundError:
+                    pass
+        # A retry clears the previous failure; the lock covers the new fit from here on
+        try:
+            os.remove(self._failed_path(key))
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            self._jobs[key] = self._executor.submit(self._fit, key, raw, params)
+        logger.info(f"ICA fit {key} queued: {params}")
+        return {'key': key, 'status': 'running'}
+
+    def _fit(self, key, raw, params):
+        try:
+            start = time.perf_counter()
+            ica = fit_ica(raw, params, n_jobs=self.n_jobs)
+            # Write then rename so readers never see a partial file
+            tmp_path = os.path.join(self.cache_dir, f'{key}-partial-ica.fif')
+            ica.save(tmp_path, overwrite=True, verbose=False)
+            os.replace(tmp_path, self.model_path(key))
+            logger.info(f"ICA fit {key} finished in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            logger.error(f"ICA fit {key} failed", exc_info=True)
+            # Written before the lock is released, so no worker reports 'missing' in between
+            tmp_path = f'{self._failed_path(key)}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(str(e))
+            os.replace(tmp_path, self._failed_path(key))
+            raise
+        finally:
+            try:
+                os.remove(self._lock_path(key))
+            except OSError:
+                pass
+
+    def _load_operator(self, key, ch_names):
+        ica = read_ica(self.model_path(key), verbose=False)
+        return ICAOperator(ica, list(ch_names))
+
+    def cache_info(self):
+        """Hit/miss statistics of the in-memory operator cache"""
+        return self._load.cache_info()
+
+    def operator(self, key, ch_names):
+        """Load a fitted model as an ICAOperator; raises LookupError if it is not ready"""
+        if not os.path.exists(self.model_path(key)):
+            raise LookupError(f"ICA model {key} is {self.status(key)['status']}")
+        return self._load(key, tuple(ch_names))
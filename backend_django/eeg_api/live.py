@@ -0,0 +1,318 @@
+"""
+Live acquisition
+Samples pushed by an acquisition client land in a fixed-size ring buffer per channel.
+Buffer and spectral state live in memory-mapped files, so every worker process reads
+what any of them received. Welch spectra are a running sum of per-segment
+periodograms: each segment is transformed once when it completes and subtracted when
+it falls out of the buffer, so a spectrum request never touches the samples.
+
+Run as a script to stream a synthetic recording into a backend:
+
+    python live.py --url http://localhost:8000 --seconds 120
+"""
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from scipy.signal import lfilter, periodogram
+
+# 10-20 electrodes of the synthetic source and the default live montage
+CHANNELS = ('Fp1', 'Fp2', 'F7', 'F3', 'Fz', 'F4', 'F8', 'T7', 'C3', 'Cz', 'C4', 'T8',
+            'P7', 'P3', 'Pz', 'P4', 'P8', 'O1', 'O2')
+SFREQ = 250.0
+# Seconds of signal kept per channel
+SECONDS = 60.0
+# Welch segment length, matching spectral.compute_psd (Raw.compute_psd: 2048 samples, no overlap, Hamming)
+N_FFT = 2048
+FMAX = 50
+# Samples per synthetic push (0.1 s at SFREQ)
+CHUNK_SECONDS = 0.1
+# Synthetic recording served with EEG_RECORDING=synthetic, sized like the MNE sample recording
+SYNTHETIC_SECONDS = 300.0
+SYNTHETIC_SFREQ = 600.0
+SYNTHETIC_CHANNELS = 60
+
+
+def live_info(ch_names=CHANNELS, sfreq=SFREQ):
+    """MNE info for the live channels, with standard 10-20 positions where known"""
+    import mne
+
+    info = mne.create_info(list(ch_names), sfreq, 'eeg')
+    info.set_montage('standard_1020', on_missing='ignore')
+    return info
+
+
+def welch_frequencies(sfreq, n_fft=N_FFT, fmax=FMAX):
+    """Frequencies kept from each segment's periodogram, and the mask selecting them"""
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sfreq)
+    mask = freqs <= fmax
+    return freqs[mask], mask
+
+
+def segment_psd(segment, sfreq, mask, n_fft=N_FFT):
+    """Hamming-windowed, mean-removed periodogram of one (n_channels, n_fft) segment, one-sided density"""
+    _, psd = periodogram(segment, sfreq, window='hamming', nfft=n_fft, detrend='constant', axis=-1)
+    return psd[:, mask]
+
+
+class LiveBuffer:
+    """
+    Ring buffer of the most recent samples plus incrementally updated Welch spectra
+    Samples are addressed by their absolute index since acquisition started; only the
+    last `capacity` are kept. Writers take an exclusive file lock and readers a shared
+    one, so a read never sees half a push.
+    """
+
+    def __init__(self, directory, ch_names=CHANNELS, sfreq=SFREQ, seconds=SECONDS, n_fft=N_FFT, fmax=FMAX):
+        self.directory = directory
+        self.ch_names = list(ch_names)
+        self.sfreq = float(sfreq)
+        self.n_fft = n_fft
+        # Whole segments only, so every segment sits contiguously in the ring
+        self.n_segments = max(1, int(np.ceil(seconds * sfreq / n_fft)))
+        self.capacity = self.n_segments * n_fft
+        self.freqs, self._mask = welch_frequencies(sfreq, n_fft, fmax)
+        n_channels, n_freqs = len(self.ch_names), len(self.freqs)
+
+        meta = {"ch_names": self.ch_names, "sfreq": self.sfreq, "capacity": self.capacity,
+                "n_fft": n_fft, "n_freqs": n_freqs}
+        os.makedirs(directory, exist_ok=True)
+        with self._locked(exclusive=True):
+            fresh = self._read_meta() != meta
+            mode = 'w+' if fresh else 'r+'
+            self._ring = np.memmap(self._path('ring'), np.float64, mode, shape=(n_channels, self.capacity))
+            self._spectra = np.memmap(self._path('spectra'), np.float64, mode,
+                                      shape=(self.n_segments, n_channels, n_freqs))
+            self._sum = np.memmap(self._path('sum'), np.float64, mode, shape=(n_channels, n_freqs))
+            # total samples received, segments in the sum, segments added since the last resum
+            self._state = np.memmap(self._path('state'), np.int64, mode, shape=(3,))
+            if fresh:
+                with open(self._path('meta'), 'w') as f:
+                    json.dump(meta, f)
+
+    def _path(self, name):
+        return os.path.join(self.directory, f'live.{name}')
+
+    def _read_meta(self):
+        try:
+            with open(self._path('meta')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @contextmanager
+    def _locked(self, exclusive=False):
+        # A descriptor per acquisition: flock is per open file, so threads sharing one would not exclude each other
+        fd = os.open(self._path('lock'), os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)
+
+    def reset(self):
+        """Forget everything received so far"""
+        with self._locked(exclusive=True):
+            self._state[:] = 0
+            self._sum[:] = 0.0
+
+    def push(self, samples):
+        """Append (n_channels, n_samples) samples; returns the total received"""
+        samples = np.asarray(samples, dtype=np.float64)
+        if samples.ndim != 2 or samples.shape[0] != len(self.ch_names):
+            raise ValueError(f"expected {len(self.ch_names)} channels, got shape {samples.shape}")
+        n_fft = self.n_fft
+        with self._locked(exclusive=True):
+            total, pos = int(self._state[0]), 0
+            while pos < samples.shape[1]:
+                offset = total % n_fft
+                segment = total // n_fft
+                slot = segment % self.n_segments
+                if offset == 0 and segment >= self.n_segments:
+                    # The slot's old segment is about to be overwritten
+                    self._sum -= self._spectra[slot]
+                    self._state[1] -= 1
+                take = min(samples.shape[1] - pos, n_fft - offset)
+                start = slot * n_fft + offset
+                self._ring[:, start:start + take] = samples[:, pos:pos + take]
+                total += take
+                pos += take
+                if offset + take == n_fft:
+                    self._add_segment(slot)
+            self._state[0] = total
+            return total
+
+    def _add_segment(self, slot):
+        n_fft = self.n_fft
+        psd = segment_psd(self._ring[:, slot * n_fft:(slot + 1) * n_fft], self.sfreq, self._mask, n_fft)
+        self._spectra[slot] = psd
+        self._state[1] += 1
+        self._state[2] += 1
+        if self._state[2] >= self.n_segments:
+            # Re-add from scratch once per buffer length so add/subtract rounding cannot drift
+            valid = min(int(self._state[1]), self.n_segments)
+            order = (slot - np.arange(valid)) % self.n_segments
+            self._sum[:] = self._spectra[order].sum(axis=0)
+            self._state[2] = 0
+        else:
+            self._sum += psd
+
+    def extent(self):
+        """(first, total): absolute indices of the oldest kept sample and one past the newest"""
+        total = int(self._state[0])
+        return max(0, total - self.capacity), total
+
+    def window(self, tmin, tmax):
+        """
+        (start, samples) covering tmin..tmax inclusive, clipped to what is still kept
+        Bounds and copy happen under one lock, so a concurrent push cannot evict the window
+        """
+        if tmax < tmin:
+            raise ValueError("tmax must not be less than tmin")
+        with self._locked():
+            first, total = self.extent()
+            start = min(max(int(round(max(0.0, tmin) * self.sfreq)), first), total)
+            stop = min(max(int(round(max(0.0, tmax) * self.sfreq)) + 1, first), total)
+            a, n = start % self.capacity, stop - start
+            if a + n <= self.capacity:
+                return start, np.array(self._ring[:, a:a + n])
+            return start, np.concatenate([self._ring[:, a:], self._ring[:, :a + n - self.capacity]], axis=1)
+
+    def spectrum(self):
+        """Welch PSD over the whole segments in the buffer: (psds, freqs)"""
+        with self._locked():
+            count = int(self._state[1])
+            if count == 0:
+                raise ValueError(f"no complete {self.n_fft}-sample segment received yet")
+            return np.array(self._sum) / count, self.freqs
+
+    def info(self):
+        """Metadata in the shape of /api/eeg-info, plus the span still buffered"""
+        first, total = self.extent()
+        return {
+            "n_channels": len(self.ch_names),
+            "channel_names": self.ch_names,
+            "sampling_freq": self.sfreq,
+            "duration": total / self.sfreq,
+            "n_samples": total,
+            "live": True,
+            "buffer_start": first / self.sfreq,
+            "buffer_seconds": self.capacity / self.sfreq
+        }
+
+
+def parse_push(body, content_type, n_channels):
+    """
+    Samples from a push request body as (n_channels, n_samples)
+    application/octet-stream: little-endian float32 frames, one value per channel per
+    sample (the interleaved layout acquisition devices emit); JSON: {"data": [[...], ...]}
+    with one list per channel, as returned by /api/eeg-data
+    """
+    if (content_type or '').startswith('application/json'):
+        try:
+            data = np.asarray(json.loads(body)['data'], dtype=np.float64)
+        except (KeyError, TypeError):
+            raise ValueError('JSON body must look like {"data": [[...], ...]}')
+        if data.ndim != 2 or data.shape[0] != n_channels:
+            raise ValueError(f"data must have {n_channels} channel lists")
+        return data
+    if len(body) % (4 * n_channels):
+        raise ValueError(f"body length is not a whole number of {n_channels}-channel float32 frames")
+    frames = np.frombuffer(body, dtype='<f4')
+    return frames.reshape(-1, n_channels).T.astype(np.float64)
+
+
+class SyntheticSource:
+    """
+    Endless stand-in for an amplifier: posterior alpha, pink-ish background, line noise
+    and the occasional frontal blink, continuous across reads
+    """
+
+    def __init__(self, ch_names=CHANNELS, sfreq=SFREQ, seed=0):
+        self.ch_names = list(ch_names)
+        self.sfreq = float(sfreq)
+        self._rng = np.random.default_rng(seed)
+        self._n = 0
+        self._background = np.zeros((len(ch_names), 1))
+        posterior = np.array([name[0] in 'PO' for name in ch_names])
+        self._alpha = np.where(posterior, 20e-6, 6e-6)
+        self._phase = self._rng.uniform(0, 2 * np.pi, len(ch_names))
+        self._frontal = np.array([name.startswith('Fp') for name in ch_names])
+
+    def read(self, n):
+        """The next n samples, (n_channels, n) in volts"""
+        t = (self._n + np.arange(n)) / self.sfreq
+        alpha = self._alpha[:, None] * np.sin(2 * np.pi * 10 * t + self._phase[:, None])
+        line = 1e-6 * np.sin(2 * np.pi * 50 * t)
+        # AR(1) background, carried over between reads
+        noise = self._rng.standard_normal((len(self.ch_names), n)) * 3e-6
+        background, self._background = lfilter([1.0], [1.0, -0.95], noise, axis=1, zi=self._background)
+        data = alpha + line + background
+        # Blinks, one every five seconds on average: a 0.3 s half-sine of about 100 µV on the frontal pole
+        width = int(0.3 * self.sfreq)
+        blink = 100e-6 * np.sin(np.pi * np.arange(width) / width)
+        for onset in np.flatnonzero(self._rng.random(n) < 1 / (5 * self.sfreq)):
+            end = min(n, onset + width)
+            data[self._frontal, onset:end] += blink[:end - onset]
+        self._n += n
+        return data
+
+
+def synthetic_recording(seconds=SYNTHETIC_SECONDS, sfreq=SYNTHETIC_SFREQ, n_channels=SYNTHETIC_CHANNELS, seed=0):
+    """
+    Preloaded Raw of synthetic signal with a stim channel, a stand-in for the sample recording
+    Electrodes are spread evenly over the 10-20 montage; events alternate between ids 1
+    and 2 every two seconds so the epoch endpoints have two conditions
+    """
+    import mne
+
+    names = mne.channels.make_standard_montage('standard_1020').ch_names
+    ch_names = [names[i] for i in np.linspace(0, len(names) - 1, min(n_channels, len(names))).round().astype(int)]
+    n = int(seconds * sfreq)
+    data = SyntheticSource(ch_names, sfreq, seed).read(n)
+    stim = np.zeros((1, n))
+    onsets = np.arange(int(sfreq), n - int(sfreq), int(2 * sfreq))
+    stim[0, onsets] = 1 + np.arange(len(onsets)) % 2
+    info = mne.create_info(ch_names + ['STI 014'], sfreq, ['eeg'] * len(ch_names) + ['stim'])
+    raw = mne.io.RawArray(np.vstack([data, stim]), info, verbose=False)
+    raw.set_montage('standard_1020', on_missing='ignore')
+    return raw
+
+
+def stream(url, seconds=None, chunk_seconds=CHUNK_SECONDS, reset=True):
+    """Push a synthetic recording to {url}/api/live/push in real time, shaped to the backend's channels"""
+    import urllib.request
+
+    with urllib.request.urlopen(f"{url.rstrip('/')}/api/eeg-info") as response:
+        info = json.load(response)
+    sfreq = info['sampling_freq']
+    source = SyntheticSource(info['channel_names'], sfreq)
+    n = max(1, int(round(chunk_seconds * sfreq)))
+    endpoint = f"{url.rstrip('/')}/api/live/push"
+    started = time.monotonic()
+    sent = 0
+    while seconds is None or sent < seconds * sfreq:
+        body = source.read(n).T.astype('<f4').tobytes()
+        query = '?reset=true' if reset and sent == 0 else ''
+        request = urllib.request.Request(endpoint + query, data=body, method='POST',
+                                         headers={'Content-Type': 'application/octet-stream'})
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        sent += n
+        # Pace to the acquisition clock rather than sleeping a fixed amount per chunk
+        delay = started + sent / sfreq - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream a synthetic EEG recording to a live backend")
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--seconds', type=float, default=None, help="stop after this long (default: never)")
+    args = parser.parse_args()
+    stream(args.url, args.seconds)
@@ -0,0 +1,239 @@
+"""
+Request instrumentation
+Per-stage timing spans, cache hit/miss counters, Prometheus text exposition
+and an opt-in sampling profiler
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+import contextvars
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+# Latency buckets in seconds, spanning cached lookups up to long spectral computations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Header that asks for a sampling profile of a single request
+PROFILE_HEADER = 'X-Encephalic-Profile'
+
+_current_endpoint = contextvars.ContextVar('encephalic_endpoint', default='unknown')
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (not thread-safe, guarded by the registry lock)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Process-local metric store
+    Every gunicorn worker keeps its own registry, so a scrape reflects the worker that answered it
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._request_counts = Counter()
+        self._stages = {}
+        self._cache = Counter()
+
+    def observe_request(self, endpoint, status, seconds):
+        with self._lock:
+            histogram = self._requests.get(endpoint)
+            if histogram is None:
+                histogram = self._requests[endpoint] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            self._request_counts[(endpoint, str(status))] += 1
+
+    def observe_stage(self, endpoint, stage, seconds):
+        with self._lock:
+            key = (endpoint, stage)
+            histogram = self._stages.get(key)
+            if histogram is None:
+                histogram = self._stages[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def record_cache(self, family, hit):
+        with self._lock:
+            self._cache[(family, 'hit' if hit else 'miss')] += 1
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            lines = [
+                '# HELP encephalic_request_duration_seconds End-to-end request latency',
+                '# TYPE encephalic_request_duration_seconds histogram',
+            ]
+            for endpoint, histogram in sorted(self._requests.items()):
+                lines.extend(_render_histogram(
+                    'encephalic_request_duration_seconds', histogram, {'endpoint': endpoint}
+                ))
+
+            lines.append('# HELP encephalic_requests_total Requests served by endpoint and status')
+            lines.append('# TYPE encephalic_requests_total counter')
+            for (endpoint, status), count in sorted(self._request_counts.items()):
+                lines.append(f'encephalic_requests_total{_labels({"endpoint": endpoint, "status": status})} {count}')
+
+            lines.append('# HELP encephalic_stage_duration_seconds Time spent per processing stage')
+            lines.append('# TYPE encephalic_stage_duration_seconds histogram')
+            for (endpoint, stage), histogram in sorted(self._stages.items()):
+                lines.extend(_render_histogram(
+                    'encephalic_stage_duration_seconds', histogram, {'endpoint': endpoint, 'stage': stage}
+                ))
+
+            lines.append('# HELP encephalic_cache_requests_total Cache lookups by key family and result')
+            lines.append('# TYPE encephalic_cache_requests_total counter')
+            for (family, result), count in sorted(self._cache.items()):
+                lines.append(f'encephalic_cache_requests_total{_labels({"family": family, "result": result})} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _render_histogram(name, histogram, labels):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels({**labels, "le": repr(float(bound))})} {cumulative}')
+    lines.append(f'{name}_bucket{_labels({**labels, "le": "+Inf"})} {histogram.count}')
+    lines.append(f'{name}_sum{_labels(labels)} {histogram.sum!r}')
+    lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+    return lines
+
+
+# Singleton registry shared by the whole process
+registry = MetricsRegistry()
+
+
+@contextmanager
+def span(stage):
+    """Time a processing stage (load, slice, compute, render, serialize) of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe_stage(_current_endpoint.get(), stage, time.perf_counter() - start)
+
+
+def streamed(body):
+    """
+    Keep spans inside a streamed response body attributed to the current endpoint
+    The body runs after the view has returned, outside the context holding the label
+    """
+    endpoint = _current_endpoint.get()
+
+    def run():
+        _current_endpoint.set(endpoint)
+        yield from body
+    return run()
+
+
+def record_cache(family, hit):
+    """Count a cache lookup for a key family (e.g. 'topomap', 'psd')"""
+    registry.record_cache(family, hit)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a single thread
+    A daemon thread snapshots the target thread's stack at a fixed interval and
+    aggregates the samples as folded stacks (flamegraph.pl / speedscope input)
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='encephalic-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.samples.most_common()) + '\n'
+
+
+class RequestTimer:
+    """
+    Tracks one request: binds the endpoint label for spans and optionally runs the profiler
+    For streamed responses finish() is called once the body has been sent, not with the headers
+    """
+
+    def __init__(self, endpoint, profile=False, profile_dir=None):
+        self.endpoint = endpoint
+        self.profile_dir = profile_dir or os.path.join(tempfile.gettempdir(), 'encephalic-profiles')
+        self.profile_path = None
+        self._token = _current_endpoint.set(endpoint)
+        self._profiler = SamplingProfiler().start() if profile else None
+        self._start = time.perf_counter()
+
+    def set_endpoint(self, endpoint):
+        """Rename the request once routing has resolved it"""
+        self.endpoint = endpoint
+        _current_endpoint.set(endpoint)
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def finish(self, status):
+        elapsed = self.elapsed()
+        registry.observe_request(self.endpoint, status, elapsed)
+
+        if self._profiler is not None:
+            self._profiler.stop()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            self.profile_path = os.path.join(
+                self.profile_dir,
+                f'{self.endpoint}-{int(time.time() * 1000)}-{os.getpid()}.folded'
+            )
+            with open(self.profile_path, 'w') as f:
+                f.write(self._profiler.folded())
+
+        try:
+            _current_endpoint.reset(self._token)
+        except ValueError:
+            # Token created in a different context (e.g. streamed responses); just clear the label
+            _current_endpoint.set('unknown')
+        return elapsed
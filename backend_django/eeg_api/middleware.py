@@ -0,0 +1,73 @@
+"""
+Request instrumentation middleware
+Times every request end to end and attributes DRF rendering to the 'serialize' stage
+"""
+import time
+from django.conf import settings
+from . import metrics
+
+
+class MetricsMiddleware:
+    """
+    Must be the innermost middleware (last in MIDDLEWARE) so the serialize span
+    measures only response rendering, not compression or other middleware
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = (
+            getattr(settings, 'ENABLE_PROFILING', False)
+            and request.headers.get(metrics.PROFILE_HEADER) == '1'
+        )
+        timer = metrics.RequestTimer(
+            'unmatched',
+            profile=profile,
+            profile_dir=getattr(settings, 'PROFILE_DIR', None)
+        )
+        request._metrics_timer = timer
+
+        response = self.get_response(request)
+
+        render_start = getattr(request, '_metrics_render_start', None)
+        if render_start is not None:
+            metrics.registry.observe_stage(timer.endpoint, 'serialize', time.perf_counter() - render_start)
+
+        if response.streaming:
+            # The body (bootstrap parts, exports) is produced after this returns, so the
+            # request is recorded when the server closes the response; the header can
+            # only time the headers
+            self._finish_on_close(response, timer)
+            response['Server-Timing'] = f'headers;dur={timer.elapsed() * 1000:.1f}'
+            return response
+
+        elapsed = timer.finish(response.status_code)
+        response['Server-Timing'] = f'total;dur={elapsed * 1000:.1f}'
+        if timer.profile_path:
+            response['X-Profile-Path'] = timer.profile_path
+        return response
+
+    @staticmethod
+    def _finish_on_close(response, timer):
+        close = response.close
+
+        def finish_on_close():
+            # Servers may close more than once; the request is recorded the first time
+            response.close = close
+            try:
+                close()
+            finally:
+                timer.finish(response.status_code)
+        response.close = finish_on_close
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if match is not None and match.url_name:
+            request._metrics_timer.set_endpoint(match.url_name)
+        return None
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook returns
+        request._metrics_render_start = time.perf_counter()
+        return response
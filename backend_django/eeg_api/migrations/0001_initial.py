@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnotationRevision',
+            fields=[
+                ('recording', models.CharField(max_length=512, primary_key=True, serialize=False)),
+                ('revision', models.IntegerField(default=0)),
+                ('imported', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Annotation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recording', models.CharField(max_length=512)),
+                ('onset', models.FloatField()),
+                ('duration', models.FloatField(default=0.0)),
+                ('description', models.CharField(max_length=255)),
+                ('kind', models.CharField(choices=[('stimulus', 'stimulus'), ('response', 'response'), ('artifact', 'artifact'), ('custom', 'custom')], default='custom', max_length=16)),
+                ('color', models.CharField(blank=True, max_length=32, null=True)),
+                ('source', models.CharField(choices=[('file', 'file'), ('user', 'user')], default='user', max_length=8)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recording', 'onset'], name='annotation_recording_onset')],
+            },
+        ),
+    ]
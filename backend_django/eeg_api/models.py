@@ -0,0 +1,32 @@
+from django.db import models
+
+from .annotations import KINDS
+
+
+class Annotation(models.Model):
+    """One annotation of a recording; onsets are seconds from the first sample"""
+
+    KIND_CHOICES = [(kind, kind) for kind in KINDS]
+    SOURCE_CHOICES = [('file', 'file'), ('user', 'user')]
+
+    recording = models.CharField(max_length=512)
+    onset = models.FloatField()
+    duration = models.FloatField(default=0.0)
+    description = models.CharField(max_length=255)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, default='custom')
+    color = models.CharField(max_length=32, null=True, blank=True)
+    source = models.CharField(max_length=8, choices=SOURCE_CHOICES, default='user')
+
+    class Meta:
+        indexes = [models.Index(fields=['recording', 'onset'], name='annotation_recording_onset')]
+
+
+class AnnotationRevision(models.Model):
+    """
+    Write counter per recording, bumped in the same transaction as every annotation write
+    Workers compare it with the revision their interval index was built at
+    """
+
+    recording = models.CharField(max_length=512, primary_key=True)
+    revision = models.IntegerField(default=0)
+    imported = models.BooleanField(default=False)
@@ -0,0 +1,126 @@
+"""
+Anti-aliased polyphase resampling of data windows
+Windows are computed on one global output grid (sample k at k / sfreq_out) from real
+samples on either side, so they equal the matching slice of resample_poly applied to
+the whole recording and consecutive windows stitch together exactly
+"""
+import threading
+from collections import Counter, OrderedDict
+from fractions import Fraction
+
+import numpy as np
+from scipy.signal import firwin, resample_poly, upfirdn
+
+# Largest up/down factor considered when approximating the requested rate
+MAX_FACTOR = 1000
+# Requests at one rate before the whole recording is resampled and kept
+CACHE_AFTER = 3
+# Whole-recording copies kept per worker, least recently used evicted first
+CACHED_RATES = 2
+
+
+def ratio(sfreq_in, sfreq_out):
+    """(up, down) with sfreq_in * up / down as close to sfreq_out as MAX_FACTOR allows"""
+    if not 0 < sfreq_out < sfreq_in:
+        raise ValueError(f"sfreq must be between 0 and the recording rate ({sfreq_in:g} Hz)")
+    fraction = Fraction(sfreq_out / sfreq_in).limit_denominator(MAX_FACTOR)
+    if fraction.numerator == 0:
+        raise ValueError(f"sfreq {sfreq_out:g} Hz is too low for a {sfreq_in:g} Hz recording")
+    return fraction.numerator, fraction.denominator
+
+
+def design_filter(up, down):
+    """The Kaiser-windowed low-pass resample_poly uses (cutoff at the lower Nyquist)"""
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    return firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * up
+
+
+def output_length(n_times, up, down):
+    return -(-n_times * up // down)
+
+
+def resample_window(data, up, down, k0, k1, h=None):
+    """
+    Output samples k0..k1 (inclusive) of resample_poly(data, up, down, axis=1)
+    Reads only the input samples the filter reaches, and zeros beyond the recording
+    (resample_poly's default padding)
+    """
+    h = design_filter(up, down) if h is None else h
+    center = (len(h) - 1) // 2
+    n_times = data.shape[1]
+    # y[k] = sum_n x[n] h[k * down + center - n * up]
+    start = max(0, (k0 * down + center - len(h) + 1) // up)
+    stop = min(n_times, (k1 * down + center) // up + 1)
+    # Shift the filter so output m0 of upfirdn lands exactly on global sample k0
+    steps = k0 + -(-(center - start * up) // down)
+    shift = (steps - k0) * down - center + start * up
+    # In the data's precision, as resample_poly does; a float64 filter would upcast the window
+    h = np.concatenate([np.zeros(shift), h]).astype(data.dtype, copy=False)
+    out = upfirdn(h, data[:, start:stop], up, down, axis=1)
+    n = k1 - k0 + 1
+    window = out[:, steps:steps + n]
+    if window.shape[1] < n:
+        window = np.pad(window, ((0, 0), (0, n - window.shape[1])))
+    return window
+
+
+class Resampler:
+    """
+    Resampled windows, switching to a cached whole-recording copy for popular rates
+    Copies are keyed by (up, down); CACHE_AFTER requests at a rate trigger the copy, built
+    by that one request while concurrent requests keep reading windows directly
+    """
+
+    def __init__(self, cache_after=CACHE_AFTER, cached_rates=CACHED_RATES):
+        self.cache_after = cache_after
+        self.cached_rates = cached_rates
+        self._lock = threading.Lock()
+        self._requests = Counter()
+        self._copies = OrderedDict()
+        self._building = set()
+        self._filters = {}
+
+    def window(self, data, up, down, k0, k1):
+        """Output samples k0..k1 of the recording at sfreq * up / down; returns (window, cached)"""
+        key = (up, down)
+        with self._lock:
+            self._requests[key] += 1
+            copy = self._copies.get(key)
+            if copy is not None:
+                self._copies.move_to_end(key)
+            build = copy is None and key not in self._building and self._requests[key] >= self.cache_after
+            if build:
+                self._building.add(key)
+            if key not in self._filters:
+                self._filters[key] = design_filter(up, down)
+            h = self._filters[key]
+        if copy is not None:
+            return copy[:, k0:k1 + 1], True
+        if build:
+            try:
+                copy = resample_poly(data, up, down, axis=1)
+                with self._lock:
+                    self._copies[key] = copy
+                    while len(self._copies) > self.cached_rates:
+                        self._copies.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._building.discard(key)
+            return copy[:, k0:k1 + 1], False
+        return resample_window(data, up, down, k0, k1, h), False
+
+    def cache_info(self):
+        with self._lock:
+            return {"requests": dict(self._requests), "cached": list(self._copies), "building": list(self._building)}
+
+
+def output_range(tmin, tmax, sfreq_out, n_out):
+    """Inclusive output-grid sample range covering tmin..tmax, clipped to the recording"""
+    if tmax < tmin:
+        raise ValueError("tmax must not be less than tmin")
+    k0 = int(np.ceil(max(0.0, tmin) * sfreq_out - 1e-9))
+    k1 = min(int(np.floor(max(0.0, tmax) * sfreq_out + 1e-9)), n_out - 1)
+    if k1 < k0:
+        raise ValueError("empty window")
+    return k0, k1
@@ -7,52 +7,188 @@ matplotlib.use('Agg')
 
 import mne
 import numpy as np
-import matplotlib.pyplot as plt
-import io
 import os
+import base64
 import logging
 from functools import lru_cache
 from django.core.cache import cache
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F
 import hashlib
+from . import annotations, epochs, export, ica, live, metrics, reference, resample, search, source, spectral, stats, topomap
+from .metrics import span
+from .models import Annotation, AnnotationRevision
 
 logger = logging.getLogger(__name__)
 
 
+def _cache_get(family, cache_key):
+    """Read from the Django cache, counting the lookup per key family"""
+    value = cache.get(cache_key)
+    metrics.record_cache(family, value is not None)
+    return value
+
+
+def _window_bounds(raw, tmin, tmax):
+    """Sample range [start, stop) covering tmin..tmax inclusive, clipped to the recording"""
+    if tmax < tmin:
+        raise ValueError("tmax must not be less than tmin")
+    start, stop = raw.time_as_index([max(0.0, tmin), max(0.0, tmax)], use_rounding=True)
+    return int(min(start, raw.n_times)), int(min(stop + 1, raw.n_times))
+
+
 class EEGService:
     """Service class for EEG data processing using MNE-Python"""
 
     def __init__(self):
-        self.data_path = mne.datasets.sample.data_path()
-        self.subjects_dir = os.path.join(self.data_path, "subjects")
+        self.synthetic = getattr(settings, 'EEG_RECORDING', 'sample') == 'synthetic'
+        if self.synthetic:
+            # Generated on first use; the sample dataset is never downloaded
+            self.data_path = self.subjects_dir = self.recording_path = None
+        else:
+            self.data_path = mne.datasets.sample.data_path()
+            self.subjects_dir = os.path.join(self.data_path, "subjects")
+            self.recording_path = os.path.join(self.data_path, 'MEG', 'sample', 'sample_audvis_raw.fif')
+        # Background ICA fits; models are shared between workers through the cache directory
+        self.ica_store = ica.ICAStore(
+            os.path.join(settings.ENCEPHALIC_CACHE_DIR, 'ica'),
+            n_jobs=getattr(settings, 'ICA_N_JOBS', -1)
+        )
+        self.source_model = None
+        # Polyphase resampling for get_data; rates requested often get a whole-recording copy
+        self.resampler = resample.Resampler()
+        # Pre-built figures, one per thread, so topomaps render concurrently under gthread workers
+        self.topomap_renderer = topomap.TopomapRenderer({
+            "figsize": (6, 5),
+            "dpi": 100,
+            "title_size": 12,
+            "title_pad": 15,
+            "label_size": 10
+        })
+        # (revision, IntervalIndex) of the recording's annotations, rebuilt after any write
+        self._annotation_index = (None, None)
+        # Recordings whose file annotations are known to be in the database
+        self._imported = set()
+        # Live mode reads info, data, topomaps and spectra from the pushed-sample ring buffer
+        self.live = getattr(settings, 'EEG_SOURCE', 'file') == 'live'
         logger.info(f"EEG Service initialized with data path: {self.data_path}")
 
     @lru_cache(maxsize=1)
-    def get_raw_data(self):
+    def get_recording(self):
         """
         Load and cache raw EEG data
-        Uses LRU cache for in-memory caching
+        Uses LRU cache for in-memory caching; events are read from the stim
+        channel before it is dropped with the other non-EEG channels, then only
+        the EEG channels are loaded, and stored as EEG_DTYPE
         """
         logger.info("Loading raw EEG data")
-        raw = mne.io.read_raw_fif(
-            os.path.join(self.data_path, 'MEG', 'sample', 'sample_audvis_raw.fif'),
-            preload=True,
-            verbose=False
-        )
+        dtype = getattr(settings, 'EEG_DTYPE', 'float64')
+        if dtype not in ('float32', 'float64'):
+            raise ValueError(f"EEG_DTYPE must be float32 or float64, not {dtype!r}")
+        if self.synthetic:
+            raw = live.synthetic_recording()
+        else:
+            raw = mne.io.read_raw_fif(self.recording_path, preload=False, verbose=False)
+        events = epochs.find_stim_events(raw)
         raw.pick_types(eeg=True)
-        logger.info(f"Raw data loaded: {len(raw.ch_names)} channels, {raw.times[-1]:.2f}s duration")
+        # MNE always loads float64; the single-precision copy replaces it before anything else sees it
+        raw.load_data()
+        raw._data = raw._data.astype(dtype, copy=False)
+        logger.info(f"Raw data loaded: {len(raw.ch_names)} channels, {raw.times[-1]:.2f}s duration, {len(events)} events")
+        return raw, events
+
+    @lru_cache(maxsize=1)
+    def get_recording_fingerprint(self):
+        """Identity of the recording file, used to key artifacts persisted on disk"""
+        if self.synthetic:
+            # Generated from a fixed seed, so always the same recording
+            return 'synthetic'
+        return ica.recording_fingerprint(self.recording_path)
+
+    def get_raw_data(self):
+        """The cached EEG-only recording"""
+        return self.get_recording()[0]
+
+    def load_raw(self):
+        """Fetch the cached recording, counting the lookup as a cache hit or miss"""
+        with span('load'):
+            hit = self.get_recording.cache_info().currsize > 0
+            raw = self.get_raw_data()
+        metrics.record_cache('raw', hit)
         return raw
 
+    @lru_cache(maxsize=1)
+    def get_live_buffer(self):
+        """Live ring buffer, shared by all workers through memory-mapped files in the cache directory"""
+        ch_names = settings.LIVE_CHANNELS.split(',') if getattr(settings, 'LIVE_CHANNELS', None) else live.CHANNELS
+        buffer = live.LiveBuffer(
+            os.path.join(settings.ENCEPHALIC_CACHE_DIR, 'live'),
+            ch_names,
+            getattr(settings, 'LIVE_SFREQ', live.SFREQ),
+            getattr(settings, 'LIVE_SECONDS', live.SECONDS)
+        )
+        logger.info(f"Live buffer ready: {len(buffer.ch_names)} channels, {buffer.capacity / buffer.sfreq:.1f}s kept")
+        return buffer
+
+    @lru_cache(maxsize=1)
+    def get_live_info(self):
+        """MNE info of the live channels, for topomaps and montages"""
+        buffer = self.get_live_buffer()
+        return live.live_info(buffer.ch_names, buffer.sfreq)
+
+    @lru_cache(maxsize=16)
+    def get_live_montage(self, key):
+        """Re-referencing operator for the live channels"""
+        info = self.get_live_info()
+        return reference.build_montage(key[0], info.ch_names, reference.channel_positions(info), *key[1:])
+
+    def push_live(self, body, content_type, reset=False):
+        """Append pushed samples (float32 frames or JSON, see live.parse_push) to the live buffer"""
+        buffer = self.get_live_buffer()
+        if reset:
+            buffer.reset()
+            logger.info("Live buffer reset")
+        with span('compute'):
+            samples = live.parse_push(body, content_type, len(buffer.ch_names))
+            total = buffer.push(samples)
+        logger.debug(f"Live push: {samples.shape[1]} samples, {total} in total")
+        return {"received": samples.shape[1], "n_samples": total, "duration": total / buffer.sfreq}
+
+    def _get_live_window(self, tmin, tmax, reference_key=None):
+        """
+        Signal window from the live buffer, clipped to the samples still held
+        tmin is the actual start of the returned window, in seconds since acquisition began
+        """
+        buffer = self.get_live_buffer()
+        montage = self.get_live_montage(reference_key or ('original', None, None, reference.N_NEIGHBORS))
+        with span('slice'):
+            start, window = buffer.window(tmin, tmax)
+            data = montage.mix(window)
+        with span('serialize'):
+            return {
+                "labels": montage.labels,
+                "reference": montage.kind,
+                "data": data.tolist(),
+                "times": (np.arange(window.shape[1]) / buffer.sfreq).tolist(),
+                "sfreq": buffer.sfreq,
+                "tmin": start / buffer.sfreq,
+                "annotations": []
+            }
+
     def get_info(self):
         """Get EEG metadata"""
+        if self.live:
+            return self.get_live_buffer().info()
+
         cache_key = 'eeg_info'
-        cached_info = cache.get(cache_key)
+        cached_info = _cache_get('info', cache_key)
 
         if cached_info:
             logger.debug("Returning cached EEG info")
             return cached_info
 
-        raw = self.get_raw_data()
+        raw = self.load_raw()
         info = {
             "n_channels": len(raw.ch_names),
             "channel_names": raw.ch_names,
@@ -65,34 +201,91 @@ class EEGService:
         logger.info(f"EEG info cached: {info['n_channels']} channels")
         return info
 
-    def get_data(self, tmin=0, tmax=10):
+    def get_data(self, tmin=0, tmax=10, reference_key=None, sfreq=None):
+        """
+        Get EEG signal data for a specific time window, with the annotations overlapping it
+        Annotations are looked up after the cache so edits show up immediately
+        """
+        if self.live:
+            if sfreq is not None:
+                raise ValueError("sfreq is not supported for live data")
+            return self._get_live_window(float(tmin), float(tmax), reference_key)
+        result = self._get_data_window(tmin, tmax, reference_key, sfreq)
+        with span('slice'):
+            # Onsets stay on the recording's clock, not relative to the window
+            return {**result, "annotations": self.get_annotations(tmin, tmax)}
+
+    @lru_cache(maxsize=16)
+    def get_montage(self, key):
+        """Re-referencing operator for a parse_reference_params key; small, so several are kept"""
+        raw = self.get_raw_data()
+        return reference.build_montage(
+            key[0], raw.ch_names, reference.channel_positions(raw.info), *key[1:], dtype=raw._data.dtype
+        )
+
+    def get_montage_info(self):
+        """Sensor positions from the recording and the available re-references"""
+        raw = self.load_raw()
+        positions = reference.channel_positions(raw.info)
+        complete = not np.isnan(positions).any()
+        return {
+            "channel_names": raw.ch_names,
+            "positions": reference.positions_payload(raw.ch_names, positions),
+            "references": list(reference.REFERENCES),
+            "default_linked": [raw.ch_names[i] for i in reference.default_linked_refs(positions)] if complete else None
+        }
+
+    def _get_data_window(self, tmin=0, tmax=10, reference_key=None, sfreq=None):
         """
-        Get EEG signal data for a specific time window
-        Implements time-window fetching to reduce payload size
+        Signal data for a specific time window, re-referenced slice by slice
+        With sfreq the window is anti-aliased and resampled on the recording-wide output
+        grid, so consecutive windows stitch together exactly
         """
-        cache_key = f'eeg_data_tmin_{tmin}_tmax_{tmax}'
-        cached_data = cache.get(cache_key)
+        reference_key = reference_key or ('original', None, None, reference.N_NEIGHBORS)
+        cache_key = (
+            f'eeg_data_tmin_{tmin}_tmax_{tmax}_sfreq_{sfreq}'
+            f'_ref_{hashlib.md5(repr(reference_key).encode()).hexdigest()}'
+        )
+        cached_data = _cache_get('data', cache_key)
 
         if cached_data:
             logger.debug(f"Returning cached EEG data for window {tmin}-{tmax}s")
             return cached_data
 
-        raw = self.get_raw_data()
+        raw = self.load_raw()
 
         # Validate time range
         tmin = max(0, float(tmin))
         tmax = min(raw.times[-1], float(tmax))
 
-        # Crop to requested window
-        raw_cropped = raw.copy().crop(tmin=tmin, tmax=tmax)
-        data = raw_cropped.get_data()
-
-        result = {
-            "labels": raw_cropped.ch_names,
-            "data": data.tolist(),
-            "times": raw_cropped.times.tolist(),
-            "sfreq": float(raw.info['sfreq'])
-        }
+        hits = self.get_montage.cache_info().hits
+        montage = self.get_montage(reference_key)
+        metrics.record_cache('montage', self.get_montage.cache_info().hits > hits)
+
+        with span('slice'):
+            if sfreq is None:
+                # Slice the preloaded array; raw.copy().crop() would copy the whole recording first
+                start, stop = _window_bounds(raw, tmin, tmax)
+                data = montage.apply(raw._data, start, stop)
+                sfreq = raw.info['sfreq']
+            else:
+                up, down = resample.ratio(raw.info['sfreq'], sfreq)
+                sfreq = raw.info['sfreq'] * up / down
+                n_out = resample.output_length(raw.n_times, up, down)
+                start, stop = resample.output_range(tmin, tmax, sfreq, n_out)
+                window, cached = self.resampler.window(raw._data, up, down, start, stop)
+                metrics.record_cache('resample', cached)
+                data = montage.mix(window)
+                stop += 1
+
+        with span('serialize'):
+            result = {
+                "labels": montage.labels,
+                "reference": montage.kind,
+                "data": data.tolist(),
+                "times": (np.arange(stop - start) / sfreq).tolist(),
+                "sfreq": float(sfreq)
+            }
 
         # Cache for 5 minutes (data windows change frequently)
         cache.set(cache_key, result, timeout=300)
@@ -104,62 +297,38 @@ class EEGService:
         Generate topographic brain map at specific time point
         Implements aggressive caching since topomaps are expensive to generate
         """
+        if self.live:
+            return self._generate_live_topomap(float(time_point))
+
         # Round to 2 decimal places for cache key
         time_rounded = round(float(time_point), 2)
         cache_key = f'topomap_{time_rounded}'
 
-        cached_image = cache.get(cache_key)
+        cached_image = _cache_get('topomap', cache_key)
         if cached_image:
             logger.debug(f"Returning cached topomap for t={time_rounded}s")
             return cached_image
 
-        raw = self.get_raw_data()
-        times = raw.times
-
-        # Find closest time index
-        closest_time_index = (np.abs(times - time_point)).argmin()
-        actual_time = times[closest_time_index]
-
-        # Average over a small window (±0.5 seconds)
-        window_samples = int(0.5 * raw.info['sfreq'])
-        start_index = max(0, closest_time_index - window_samples)
-        stop_index = min(len(times), closest_time_index + window_samples)
-
-        data_at_time = raw.get_data(start=start_index, stop=stop_index).mean(axis=1)
-
-        # Create topographic plot with optimized settings
-        fig, ax = plt.subplots(figsize=(6, 5), facecolor='#000000', dpi=100)
-        ax.set_facecolor('#000000')
-
-        im, _ = mne.viz.plot_topomap(
-            data_at_time,
-            raw.info,
-            axes=ax,
-            show=False,
-            cmap='RdBu_r',
-            contours=6
-        )
+        raw = self.load_raw()
 
-        ax.set_title(
-            f'Topographic Map at {actual_time:.2f}s',
-            color='white',
-            fontsize=12,
-            pad=15
-        )
+        with span('slice'):
+            times = raw.times
+
+            # Find closest time index
+            closest_time_index = (np.abs(times - time_point)).argmin()
+            actual_time = times[closest_time_index]
 
-        # Customize colorbar
-        cbar = plt.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
-        cbar.ax.yaxis.set_tick_params(color='white')
-        cbar.ax.tick_params(labelcolor='white')
-        cbar.set_label('Amplitude (µV)', color='white', fontsize=10)
-        cbar.outline.set_edgecolor('white')
+            # Average over a small window (±0.5 seconds)
+            window_samples = int(0.5 * raw.info['sfreq'])
+            start_index = max(0, closest_time_index - window_samples)
+            stop_index = min(len(times), closest_time_index + window_samples)
 
-        # Save to bytes buffer
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', facecolor='#000000', bbox_inches='tight', dpi=100)
-        img_buffer.seek(0)
-        image_data = img_buffer.read()
-        plt.close(fig)
+            window = raw.get_data(start=start_index, stop=stop_index)
+
+        with span('compute'):
+            data_at_time = window.mean(axis=1)
+
+        image_data = self._topomap_png(data_at_time, raw.info, actual_time)
 
         # Cache for 5 minutes
         timeout = getattr(settings, 'TOPOMAP_CACHE_TIMEOUT', 300)
@@ -168,34 +337,57 @@ class EEGService:
         logger.info(f"Topomap generated and cached for t={actual_time:.2f}s")
         return image_data
 
+    def _generate_live_topomap(self, time_point):
+        """Topomap of the mean live signal within ±0.5 s of time_point; not cached, samples keep arriving"""
+        buffer = self.get_live_buffer()
+        with span('slice'):
+            _, window = buffer.window(time_point - 0.5, time_point + 0.5)
+            if window.shape[1] == 0:
+                raise ValueError(f"no live samples near {time_point:.2f}s")
+
+        with span('compute'):
+            data_at_time = window.mean(axis=1)
+
+        return self._topomap_png(data_at_time, self.get_live_info(), time_point)
+
+    def _topomap_png(self, data_at_time, info, actual_time):
+        """Render one map of per-channel values as PNG bytes"""
+        with span('render'):
+            template = self.topomap_renderer.template(info, data_at_time)
+            template.update(data_at_time, actual_time)
+
+        with span('serialize'):
+            return template.encode()
+
     def get_psd(self):
         """
         Compute Power Spectral Density
-        Cached to avoid redundant computations
+        Cached to avoid redundant computations; live spectra are maintained
+        segment by segment as samples arrive, so they are read rather than cached
         """
+        if self.live:
+            buffer = self.get_live_buffer()
+            with span('compute'):
+                psds, freqs = buffer.spectrum()
+            with span('serialize'):
+                return spectral.psd_payload(psds, freqs, buffer.ch_names)
+
         cache_key = 'eeg_psd'
-        cached_psd = cache.get(cache_key)
+        cached_psd = _cache_get('psd', cache_key)
 
         if cached_psd:
             logger.debug("Returning cached PSD data")
             return cached_psd
 
-        raw = self.get_raw_data()
+        raw = self.load_raw()
 
         # Compute PSD
         logger.debug("Computing power spectral density...")
-        spectrum = raw.compute_psd(fmax=50, verbose=False)
-        psds, freqs = spectrum.get_data(return_freqs=True)
-
-        # Average across channels
-        psd_mean = psds.mean(axis=0)
+        with span('compute'):
+            psds, freqs = spectral.compute_psd(raw)
 
-        result = {
-            "frequencies": freqs.tolist(),
-            "psd": psd_mean.tolist(),
-            "channel_psds": psds.tolist(),
-            "channel_names": raw.ch_names
-        }
+        with span('serialize'):
+            result = spectral.psd_payload(psds, freqs, raw.ch_names)
 
         # Cache for 10 minutes
         timeout = getattr(settings, 'PSD_CACHE_TIMEOUT', 600)
@@ -209,8 +401,12 @@ class EEGService:
         Get power in different frequency bands
         Reuses cached PSD computation
         """
+        if self.live:
+            with span('compute'):
+                return spectral.band_powers(*self.get_live_buffer().spectrum())
+
         cache_key = 'eeg_frequency_bands'
-        cached_bands = cache.get(cache_key)
+        cached_bands = _cache_get('bands', cache_key)
 
         if cached_bands:
             logger.debug("Returning cached frequency bands")
@@ -221,21 +417,8 @@ class EEGService:
         freqs = np.array(psd_data['frequencies'])
         psds = np.array(psd_data['channel_psds'])
 
-        # Define frequency bands
-        bands = {
-            'delta': (0.5, 4),
-            'theta': (4, 8),
-            'alpha': (8, 13),
-            'beta': (13, 30),
-            'gamma': (30, 50)
-        }
-
-        band_powers = {}
-        for band_name, (fmin, fmax) in bands.items():
-            freq_mask = (freqs >= fmin) & (freqs < fmax)
-            # Average across both channels and frequencies
-            band_power = psds[:, freq_mask].mean()
-            band_powers[band_name] = float(band_power)
+        with span('compute'):
+            band_powers = spectral.band_powers(psds, freqs)
 
         # Cache for 10 minutes
         timeout = getattr(settings, 'PSD_CACHE_TIMEOUT', 600)
@@ -244,6 +427,431 @@ class EEGService:
         logger.info(f"Frequency bands computed and cached: {list(band_powers.keys())}")
         return band_powers
 
+    def get_bootstrap(self, tmin=0, tmax=10, time_point=0.01):
+        """
+        Everything the dashboard needs on mount, as (part, payload) pairs
+        Yielded cheapest first so each part can be streamed as soon as it is ready;
+        every part comes from the same caches as its standalone endpoint, and
+        psd and bands share one spectral computation
+        """
+        yield 'info', self.get_info()
+        yield 'data', self.get_data(tmin, tmax)
+        image = base64.b64encode(self.generate_topomap(time_point)).decode('ascii')
+        yield 'topomap', {"time_point": time_point, "image": f"data:image/png;base64,{image}"}
+        yield 'psd', self.get_psd()
+        yield 'bands', self.get_frequency_bands()
+
+    def _ensure_file_annotations(self, fingerprint):
+        """Copy the recording's own annotations into the database the first time it is served"""
+        # Checked once per process; data windows would otherwise pay an extra query each
+        if fingerprint in self._imported:
+            return
+        if AnnotationRevision.objects.filter(recording=fingerprint, imported=True).exists():
+            self._imported.add(fingerprint)
+            return
+        rows = annotations.file_annotations(self.get_raw_data())
+        with transaction.atomic():
+            revision, _ = AnnotationRevision.objects.select_for_update().get_or_create(recording=fingerprint)
+            if revision.imported:
+                self._imported.add(fingerprint)
+                return
+            Annotation.objects.bulk_create(
+                [Annotation(recording=fingerprint, source='file', **row) for row in rows], batch_size=1000
+            )
+            AnnotationRevision.objects.filter(recording=fingerprint).update(
+                revision=F('revision') + 1, imported=True
+            )
+        self._imported.add(fingerprint)
+        logger.info(f"Imported {len(rows)} annotations from the recording file")
+
+    def _bump_annotation_revision(self, fingerprint):
+        revision, _ = AnnotationRevision.objects.select_for_update().get_or_create(recording=fingerprint)
+        AnnotationRevision.objects.filter(pk=revision.pk).update(revision=F('revision') + 1)
+
+    def get_annotation_index(self):
+        """Interval index over this recording's annotations, rebuilt when its revision moves"""
+        fingerprint = self.get_recording_fingerprint()
+        self._ensure_file_annotations(fingerprint)
+        revision = AnnotationRevision.objects.filter(recording=fingerprint).values_list('revision', flat=True).first()
+        built_at, index = self._annotation_index
+        hit = index is not None and built_at == revision
+        metrics.record_cache('annotations', hit)
+        if hit:
+            return index
+        with span('compute'):
+            rows = Annotation.objects.filter(recording=fingerprint).values(*annotations.FIELDS)
+            index = annotations.IntervalIndex(list(rows))
+        self._annotation_index = (revision, index)
+        return index
+
+    def get_annotations(self, tmin=None, tmax=None):
+        """Annotations overlapping [tmin, tmax] (every annotation when unbounded), in onset order"""
+        index = self.get_annotation_index()
+        if tmin is None and tmax is None:
+            return list(index.rows)
+        tmin = -np.inf if tmin is None else float(tmin)
+        tmax = np.inf if tmax is None else float(tmax)
+        if tmax < tmin:
+            raise ValueError("tmax must not be less than tmin")
+        return index.overlapping(tmin, tmax)
+
+    def create_annotations(self, items):
+        """Validate and insert annotations in one transaction; returns the stored rows"""
+        if not isinstance(items, list) or not items:
+            raise ValueError("annotations must be a non-empty list")
+        items = [annotations.normalize_annotation(item) for item in items]
+        fingerprint = self.get_recording_fingerprint()
+        self._ensure_file_annotations(fingerprint)
+        with transaction.atomic():
+            created = Annotation.objects.bulk_create(
+                [Annotation(recording=fingerprint, source='user', **item) for item in items], batch_size=1000
+            )
+            self._bump_annotation_revision(fingerprint)
+        return [{field: getattr(obj, field) for field in annotations.FIELDS} for obj in created]
+
+    def delete_annotations(self, ids):
+        """Delete annotations by id in one transaction; returns the number removed"""
+        if not isinstance(ids, list) or not ids:
+            raise ValueError("ids must be a non-empty list")
+        ids = [int(i) for i in ids]
+        fingerprint = self.get_recording_fingerprint()
+        with transaction.atomic():
+            deleted, _ = Annotation.objects.filter(recording=fingerprint, id__in=ids).delete()
+            self._bump_annotation_revision(fingerprint)
+        return deleted
+
+    def get_events(self):
+        """
+        Get events extracted from the stim channel at load
+        Sample indices are relative to the start of the data array
+        """
+        raw = self.load_raw()
+        events = self.get_recording()[1]
+        ids, counts = np.unique(events[:, 2], return_counts=True)
+
+        with span('serialize'):
+            return {
+                "samples": events[:, 0].tolist(),
+                "times": (events[:, 0] / raw.info['sfreq']).tolist(),
+                "event_ids": events[:, 2].tolist(),
+                "counts": {str(i): int(n) for i, n in zip(ids, counts)}
+            }
+
+    def get_evoked(self, event_id=None, tmin=-0.2, tmax=0.5, baseline=(-0.2, 0.0)):
+        """
+        Evoked average (ERP) and per-condition statistics
+        Cached by (event_id, tmin, tmax, baseline); epochs are gathered in one fancy-index
+        """
+        cache_key = f'evoked_{event_id}_{tmin}_{tmax}_{baseline}'.replace(' ', '')
+        cached_evoked = _cache_get('evoked', cache_key)
+
+        if cached_evoked:
+            logger.debug(f"Returning cached evoked for event_id={event_id}")
+            return cached_evoked
+
+        raw = self.load_raw()
+
+        with span('slice'):
+            start, stop, times = epochs.epoch_samples(raw.info['sfreq'], tmin, tmax)
+            onsets = epochs.select_events(self.get_recording()[1], event_id)[:, 0]
+            # raw._data is the preloaded array; raw.get_data() would copy the whole recording
+            data, _ = epochs.gather_epochs(raw._data, onsets, start, stop)
+            if len(data) == 0:
+                raise ValueError(f"No complete epochs for event_id={event_id}")
+
+        with span('compute'):
+            epochs.apply_baseline(data, times, baseline)
+            summary = epochs.summarize_epochs(data, times)
+
+        with span('serialize'):
+            result = {
+                "event_id": event_id,
+                "channel_names": raw.ch_names,
+                "times": times.tolist(),
+                "n_epochs": summary["n_epochs"],
+                "evoked": summary["evoked"].tolist(),
+                "std": summary["std"].tolist(),
+                "sem": summary["sem"].tolist(),
+                "gfp": summary["gfp"].tolist(),
+                "peak_latency": summary["peak_latency"],
+                "peak_gfp": summary["peak_gfp"]
+            }
+
+        timeout = getattr(settings, 'EVOKED_CACHE_TIMEOUT', 3600)
+        cache.set(cache_key, result, timeout=timeout)
+
+        logger.info(f"Evoked computed and cached: event_id={event_id}, {summary['n_epochs']} epochs")
+        return result
+
+    def get_epochs(self, event_id=None, tmin=-0.2, tmax=0.5, baseline=(-0.2, 0.0), start=0, count=10):
+        """
+        Get a page of individual epochs
+        Only the requested page is gathered, never the full epochs array
+        """
+        raw = self.load_raw()
+
+        with span('slice'):
+            first, stop, times = epochs.epoch_samples(raw.info['sfreq'], tmin, tmax)
+            events = epochs.select_events(self.get_recording()[1], event_id)
+            page = events[start:start + count]
+            data, kept = epochs.gather_epochs(raw._data, page[:, 0], first, stop)
+
+        with span('compute'):
+            epochs.apply_baseline(data, times, baseline)
+
+        with span('serialize'):
+            return {
+                "event_id": event_id,
+                "channel_names": raw.ch_names,
+                "times": times.tolist(),
+                "n_total": len(events),
+                "onsets": (page[kept, 0] / raw.info['sfreq']).tolist(),
+                "epochs": data.tolist()
+            }
+
+    @lru_cache(maxsize=1)
+    def get_stats_index(self):
+        """
+        Prefix moment index and whole-recording statistics, built in one streaming pass
+        Held in process memory: the index reads edge samples straight from the recording
+        """
+        data = self.get_raw_data()._data
+        index, moments = stats.StatsIndex.build(lambda a, b: data[:, a:b], data.shape[0], data.shape[1])
+        return index, moments.result()
+
+    def get_stats(self, tmin=None, tmax=None):
+        """
+        Per-channel mean, variance, RMS, min/max, kurtosis and line length
+        The whole recording when no window is given; any window costs O(channels)
+        """
+        raw = self.load_raw()
+
+        hit = self.get_stats_index.cache_info().currsize > 0
+        with span('compute'):
+            index, whole = self.get_stats_index()
+            if tmin is None and tmax is None:
+                start, stop = 0, raw.n_times
+                result = whole
+            else:
+                tmin = 0.0 if tmin is None else float(tmin)
+                tmax = raw.times[-1] if tmax is None else float(tmax)
+                start, stop = _window_bounds(raw, tmin, tmax)
+                result = index.window(start, stop)
+        metrics.record_cache('stats', hit)
+
+        with span('serialize'):
+            return {
+                **stats.serialize(result, raw.ch_names),
+                "tmin": float(start / raw.info['sfreq']),
+                "tmax": float((stop - 1) / raw.info['sfreq']),
+                "n_samples": int(stop - start)
+            }
+
+    def search(self, params):
+        """
+        Threshold crossings or top-k amplitude peaks over the recording (or a tmin..tmax window)
+        Candidate blocks come from the stats index zone maps; only those are read
+        """
+        raw = self.load_raw()
+        sfreq = raw.info['sfreq']
+        query = search.parse_search_params(params, sfreq)
+        picks = export.parse_channels(params.get('channels'), raw.ch_names)
+        tmin = float(params.get('tmin', 0))
+        tmax = float(params.get('tmax', raw.times[-1]))
+        start, stop = _window_bounds(raw, tmin, tmax)
+        if stop <= start:
+            raise ValueError("empty window")
+
+        hit = self.get_stats_index.cache_info().currsize > 0
+        with span('compute'):
+            index, _ = self.get_stats_index()
+            result = search.run_search(index, query, picks, start, stop, sfreq, raw.ch_names)
+        metrics.record_cache('stats', hit)
+        logger.info(f"Search {query} read {result['blocks_read']} of {result['blocks_total']} blocks")
+        return result
+
+    def export_recording(self, params):
+        """
+        Stream the recording (or a tmin..tmax window) as CSV, EDF or NPZ
+        Returns (body generator, content type, headers); chunks are read, filtered and
+        encoded one at a time, so memory stays flat for any export length
+        """
+        raw = self.load_raw()
+        fmt, picks, l_freq, h_freq = export.parse_export_params(params, raw)
+        tmin = float(params.get('tmin', 0))
+        tmax = float(params.get('tmax', raw.times[-1]))
+        start, stop = _window_bounds(raw, tmin, tmax)
+        if stop <= start:
+            raise ValueError("empty time window")
+
+        sfreq = raw.info['sfreq']
+        ch_names = [raw.ch_names[i] for i in picks]
+        reader = export.ChunkReader(raw._data, picks, sfreq, l_freq, h_freq)
+        headers = {'Content-Disposition': f'attachment; filename="{export.filename(fmt, tmin, tmax)}"'}
+
+        if fmt == 'csv':
+            body = export.stream_csv(reader, start, stop, ch_names, sfreq)
+        elif fmt == 'npz':
+            body = export.stream_npz(reader, start, stop, ch_names, sfreq)
+        else:
+            with span('compute'):
+                if reader.h is None:
+                    # EDF needs each channel's range up front; unfiltered ranges come from the stats index
+                    window = self.get_stats_index()[0].window(start, stop)
+                    vmin, vmax = window['min'][picks], window['max'][picks]
+                else:
+                    vmin, vmax = export.channel_ranges(reader, start, stop)
+            prefilter = f'HP:{l_freq or 0}Hz LP:{h_freq or 0}Hz' if reader.h is not None else ''
+            body = export.stream_edf(
+                reader, start, stop, ch_names, sfreq, vmin, vmax,
+                meas_date=raw.info['meas_date'], prefilter=prefilter
+            )
+            headers['Content-Length'] = str(export.edf_size(len(picks), stop - start, sfreq))
+
+        logger.info(f"Export started: {fmt}, samples {start}-{stop}, {len(picks)} channels")
+        return body, export.FORMATS[fmt][0], headers
+
+    def fit_ica(self, params=None):
+        """
+        Start a background ICA fit on a high-passed copy of the recording
+        Returns immediately; the fitted model is persisted keyed by recording and parameters
+        """
+        params = ica.normalize_params(params)
+        key = ica.model_key(self.get_recording_fingerprint(), params)
+        state = self.ica_store.submit(key, self.load_raw(), params)
+        return {**state, "params": params}
+
+    def get_ica_status(self, key):
+        """State of an ICA fit: ready, running, failed or missing"""
+        return self.ica_store.status(key)
+
+    def _load_ica(self, key):
+        raw = self.load_raw()
+        with span('load'):
+            hit = self.ica_store.cache_info().hits
+            operator = self.ica_store.operator(key, raw.ch_names)
+        metrics.record_cache('ica', self.ica_store.cache_info().hits > hit)
+        return raw, operator
+
+    def get_ica_components(self, key):
+        """Component topographies (one sensor pattern per component)"""
+        _, operator = self._load_ica(key)
+        with span('serialize'):
+            return {
+                "channel_names": operator.ch_names,
+                "n_components": operator.n_components,
+                "patterns": operator.patterns.T.tolist()
+            }
+
+    def get_ica_sources(self, key, tmin=0, tmax=10):
+        """
+        Component time courses for a window
+        One matrix product on the requested slice, never a refit
+        """
+        raw, operator = self._load_ica(key)
+
+        with span('slice'):
+            start, stop = _window_bounds(raw, float(tmin), float(tmax))
+            window = raw._data[:, start:stop]
+
+        with span('compute'):
+            sources = operator.sources(window)
+
+        with span('serialize'):
+            return {
+                "components": [f"ICA{i:03d}" for i in range(operator.n_components)],
+                "data": sources.tolist(),
+                "times": raw.times[start:stop].tolist(),
+                "sfreq": float(raw.info['sfreq'])
+            }
+
+    def get_ica_clean(self, key, tmin=0, tmax=10, exclude=()):
+        """Artifact-cleaned data for a window with the excluded components removed"""
+        raw, operator = self._load_ica(key)
+
+        with span('slice'):
+            start, stop = _window_bounds(raw, float(tmin), float(tmax))
+            window = raw._data[:, start:stop]
+
+        with span('compute'):
+            cleaned = operator.clean(window, exclude)
+
+        with span('serialize'):
+            return {
+                "labels": operator.ch_names,
+                "data": cleaned.tolist(),
+                "times": raw.times[start:stop].tolist(),
+                "sfreq": float(raw.info['sfreq']),
+                "exclude": sorted(set(exclude))
+            }
+
+    def get_source_model(self):
+        """Forward/inverse setup for the sample subject, persisted under the cache directory"""
+        if self.synthetic:
+            raise ValueError("source localization needs the sample recording (EEG_RECORDING=sample)")
+        if self.source_model is None:
+            sample_dir = os.path.join(self.data_path, 'MEG', 'sample')
+            self.source_model = source.SourceModel(
+                os.path.join(settings.ENCEPHALIC_CACHE_DIR, 'source'),
+                subject='sample',
+                subjects_dir=self.subjects_dir,
+                fwd_path=os.path.join(sample_dir, 'sample_audvis-meg-eeg-oct-6-fwd.fif'),
+                cov_path=os.path.join(sample_dir, 'sample_audvis-cov.fif'),
+                fingerprint=self.get_recording_fingerprint()
+            )
+        return self.source_model
+
+    def _load_inverse_kernel(self, method, snr):
+        raw = self.load_raw()
+        model = self.get_source_model()
+        with span('load'):
+            hit = model.cache_info().hits
+            kernel = model.kernel(raw, method, snr)
+        metrics.record_cache('inverse', model.cache_info().hits > hit)
+        return raw, model, kernel
+
+    def get_source_labels(self, tmin=0, tmax=1, method='dSPM', snr=3.0, parc='aparc'):
+        """
+        Per-label source time courses for a window
+        The inverse is built (or read from disk) once; each window is then a single
+        product with the label-reduced kernel
+        """
+        raw, model, kernel = self._load_inverse_kernel(method, snr)
+
+        with span('slice'):
+            start, stop = _window_bounds(raw, float(tmin), float(tmax))
+            window = raw._data[:, start:stop]
+
+        with span('compute'):
+            labels = model.labels(parc)
+            time_courses = kernel.label_time_courses(window, labels)
+
+        with span('serialize'):
+            return {
+                "labels": [label.name for label in labels],
+                "data": time_courses.tolist(),
+                "times": raw.times[start:stop].tolist(),
+                "method": method
+            }
+
+    def get_source_peaks(self, tmin=0, tmax=1, method='dSPM', snr=3.0, k=10):
+        """The k source vertices with the largest amplitude in a window"""
+        raw, _, kernel = self._load_inverse_kernel(method, snr)
+
+        with span('slice'):
+            start, stop = _window_bounds(raw, float(tmin), float(tmax))
+            window = raw._data[:, start:stop]
+
+        with span('compute'):
+            peaks = kernel.peaks(window, raw.times[start:stop], k)
+
+        with span('serialize'):
+            return {
+                "peaks": peaks,
+                "n_sources": kernel.n_sources,
+                "method": method
+            }
+
 
 # Singleton instance
 eeg_service = EEGService()
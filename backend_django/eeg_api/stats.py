@@ -0,0 +1,233 @@
+"""
+Per-channel signal statistics
+Whole-recording figures come from one chunked streaming pass with pairwise
+(Welford/Chan) moment merging; arbitrary windows are answered from blocked prefix
+sums of the first four power sums, so a window never rescans the samples it covers
+"""
+import numpy as np
+
+# Samples per prefix block: a window costs O(channels * (n_blocks_lookup + 2 * BLOCK_SIZE))
+BLOCK_SIZE = 256
+# Blocks per streaming chunk (64 * 256 samples ≈ 27 s at 600 Hz)
+CHUNK_BLOCKS = 64
+
+
+def _finalize(n, mean, m2, m4, vmin, vmax, line_length):
+    """Statistics from central moment sums (population variance, excess kurtosis)"""
+    n = max(n, 1)
+    variance = m2 / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kurtosis = np.where(m2 > 0, n * m4 / (m2 * m2) - 3.0, 0.0)
+    return {
+        "mean": mean,
+        "variance": variance,
+        "rms": np.sqrt(mean * mean + variance),
+        "min": vmin,
+        "max": vmax,
+        "kurtosis": kurtosis,
+        "line_length": line_length,
+    }
+
+
+class RunningMoments:
+    """Mergeable per-channel moments up to fourth order, plus extrema and line length"""
+
+    def __init__(self, n_channels):
+        self.n = 0
+        self.mean = np.zeros(n_channels)
+        self.m2 = np.zeros(n_channels)
+        self.m3 = np.zeros(n_channels)
+        self.m4 = np.zeros(n_channels)
+        self.min = np.full(n_channels, np.inf)
+        self.max = np.full(n_channels, -np.inf)
+        self.line_length = np.zeros(n_channels)
+        self._last = None
+
+    def update(self, chunk):
+        """Fold in the next contiguous (n_channels, n_samples) chunk"""
+        if chunk.shape[1] == 0:
+            return self
+        chunk = np.asarray(chunk, dtype=np.float64)
+        n_b = chunk.shape[1]
+        mean_b = chunk.mean(axis=1)
+        centered = chunk - mean_b[:, None]
+        sq = centered * centered
+        m2_b = sq.sum(axis=1)
+        m3_b = (sq * centered).sum(axis=1)
+        m4_b = (sq * sq).sum(axis=1)
+
+        self._merge(n_b, mean_b, m2_b, m3_b, m4_b)
+        np.minimum(self.min, chunk.min(axis=1), out=self.min)
+        np.maximum(self.max, chunk.max(axis=1), out=self.max)
+        self.line_length += np.abs(np.diff(chunk, axis=1)).sum(axis=1)
+        if self._last is not None:
+            self.line_length += np.abs(chunk[:, 0] - self._last)
+        self._last = chunk[:, -1].copy()
+        return self
+
+    def _merge(self, n_b, mean_b, m2_b, m3_b, m4_b):
+        # Pairwise update of central moment sums (Chan et al.; Pébay 2008)
+        n_a = self.n
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        d_n = delta / n
+        d_n2 = d_n * d_n
+        term1 = delta * d_n * n_a * n_b
+
+        self.m4 += (
+            m4_b
+            + term1 * d_n2 * (n_a * n_a - n_a * n_b + n_b * n_b)
+            + 6.0 * d_n2 * (n_a * n_a * m2_b + n_b * n_b * self.m2)
+            + 4.0 * d_n * (n_a * m3_b - n_b * self.m3)
+        )
+        self.m3 += (
+            m3_b
+            + term1 * d_n * (n_a - n_b)
+            + 3.0 * d_n * (n_a * m2_b - n_b * self.m2)
+        )
+        self.m2 += m2_b + term1
+        self.mean += d_n * n_b
+        self.n = n
+
+    def result(self):
+        return _finalize(self.n, self.mean, self.m2, self.m4, self.min, self.max, self.line_length)
+
+
+class StatsIndex:
+    """
+    Blocked prefix sums for O(channels) window statistics
+    Power sums are taken about a per-channel shift (the first chunk's mean) to keep
+    the moment reconstruction free of catastrophic cancellation
+    """
+
+    def __init__(self, shift, prefix, ll_prefix, block_min, block_max, read_chunk, n_times, block=BLOCK_SIZE):
+        self.shift = shift
+        self.prefix = prefix            # (4, n_channels, n_blocks + 1)
+        self.ll_prefix = ll_prefix      # (n_channels, n_blocks + 1), |diff| sums
+        self.block_min = block_min      # (n_channels, n_blocks), zone maps for search.py
+        self.block_max = block_max
+        self.block_absmax = np.maximum(block_max, -block_min)
+        self.read_chunk = read_chunk
+        self.n_times = n_times
+        self.block = block
+
+    @classmethod
+    def build(cls, read_chunk, n_channels, n_times, block=BLOCK_SIZE, chunk_blocks=CHUNK_BLOCKS):
+        """
+        One streaming pass over the recording
+        Returns the index together with the whole-recording RunningMoments
+        """
+        n_blocks = -(-n_times // block)
+        sums = np.zeros((4, n_channels, n_blocks))
+        ll = np.zeros((n_channels, n_blocks))
+        block_min = np.empty((n_channels, n_blocks))
+        block_max = np.empty((n_channels, n_blocks))
+        moments = RunningMoments(n_channels)
+        shift = None
+        previous = None
+
+        chunk_len = block * chunk_blocks
+        for start in range(0, n_times, chunk_len):
+            stop = min(start + chunk_len, n_times)
+            chunk = np.asarray(read_chunk(start, stop), dtype=np.float64)
+            moments.update(chunk)
+            if shift is None:
+                shift = chunk.mean(axis=1)
+
+            b0 = start // block
+            nb = -(-(stop - start) // block)
+            pad = nb * block - (stop - start)
+            y = chunk - shift[:, None]
+            # Pad the ragged last block with zeros (no contribution to sums) and edge values for extrema
+            y_sums = np.pad(y, ((0, 0), (0, pad))).reshape(n_channels, nb, block)
+            y_ext = np.pad(chunk, ((0, 0), (0, pad)), mode='edge').reshape(n_channels, nb, block)
+            sq = y_sums * y_sums
+            sums[0, :, b0:b0 + nb] = y_sums.sum(axis=2)
+            sums[1, :, b0:b0 + nb] = sq.sum(axis=2)
+            sums[2, :, b0:b0 + nb] = (sq * y_sums).sum(axis=2)
+            sums[3, :, b0:b0 + nb] = (sq * sq).sum(axis=2)
+            block_min[:, b0:b0 + nb] = y_ext.min(axis=2)
+            block_max[:, b0:b0 + nb] = y_ext.max(axis=2)
+
+            # |x[i+1] - x[i]| is attributed to the block holding sample i
+            if previous is not None:
+                ll[:, (start - 1) // block] += np.abs(chunk[:, 0] - previous)
+            diffs = np.abs(np.diff(chunk, axis=1))
+            diffs = np.pad(diffs, ((0, 0), (0, pad + 1))).reshape(n_channels, nb, block)
+            ll[:, b0:b0 + nb] += diffs.sum(axis=2)
+            previous = chunk[:, -1]
+
+        if shift is None:
+            shift = np.zeros(n_channels)
+        prefix = np.concatenate([np.zeros((4, n_channels, 1)), np.cumsum(sums, axis=2)], axis=2)
+        ll_prefix = np.concatenate([np.zeros((n_channels, 1)), np.cumsum(ll, axis=1)], axis=1)
+        index = cls(shift, prefix, ll_prefix, block_min, block_max, read_chunk, n_times, block)
+        return index, moments
+
+    def _edges(self, start, stop):
+        """Full-block range [b0, b1) inside [start, stop) and the partial edge ranges"""
+        b0 = -(-start // self.block)
+        b1 = stop // self.block
+        if b0 >= b1:
+            return None, [(start, stop)]
+        return (b0, b1), [(start, b0 * self.block), (b1 * self.block, stop)]
+
+    def window(self, start, stop):
+        """Statistics over samples [start, stop)"""
+        start, stop = max(0, int(start)), min(self.n_times, int(stop))
+        if stop <= start:
+            raise ValueError("empty window")
+        n = stop - start
+        n_channels = len(self.shift)
+        sums = np.zeros((4, n_channels))
+        vmin = np.full(n_channels, np.inf)
+        vmax = np.full(n_channels, -np.inf)
+
+        blocks, edges = self._edges(start, stop)
+        if blocks is not None:
+            b0, b1 = blocks
+            sums += self.prefix[:, :, b1] - self.prefix[:, :, b0]
+            np.minimum(vmin, self.block_min[:, b0:b1].min(axis=1), out=vmin)
+            np.maximum(vmax, self.block_max[:, b0:b1].max(axis=1), out=vmax)
+
+        for a, b in edges:
+            if b <= a:
+                continue
+            chunk = np.asarray(self.read_chunk(a, b), dtype=np.float64)
+            y = chunk - self.shift[:, None]
+            sq = y * y
+            sums += np.stack([y.sum(axis=1), sq.sum(axis=1), (sq * y).sum(axis=1), (sq * sq).sum(axis=1)])
+            np.minimum(vmin, chunk.min(axis=1), out=vmin)
+            np.maximum(vmax, chunk.max(axis=1), out=vmax)
+
+        s1, s2, s3, s4 = sums
+        m = s1 / n
+        m2 = s2 - n * m * m
+        m4 = s4 - 4.0 * m * s3 + 6.0 * m * m * s2 - 3.0 * n * m ** 4
+        np.maximum(m2, 0.0, out=m2)
+        line_length = self._line_length(start, stop)
+        return _finalize(n, m + self.shift, m2, m4, vmin, vmax, line_length)
+
+    def _line_length(self, start, stop):
+        # Sum of |x[i+1] - x[i]| for i in [start, stop - 1)
+        last = stop - 1
+        if last <= start:
+            return np.zeros(len(self.shift))
+        total = np.zeros(len(self.shift))
+        blocks, edges = self._edges(start, last)
+        if blocks is not None:
+            b0, b1 = blocks
+            total += self.ll_prefix[:, b1] - self.ll_prefix[:, b0]
+        for a, b in edges:
+            if b > a:
+                chunk = np.asarray(self.read_chunk(a, b + 1), dtype=np.float64)
+                total += np.abs(np.diff(chunk, axis=1)).sum(axis=1)
+        return total
+
+
+def serialize(stats, ch_names):
+    """JSON-ready statistics, one list per statistic in channel order"""
+    return {
+        "channel_names": list(ch_names),
+        **{name: np.asarray(values, dtype=np.float64).tolist() for name, values in stats.items()}
+    }
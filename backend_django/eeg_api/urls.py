@@ -1,14 +1,34 @@
 """
 EEG API URL Configuration
 """
-from django.urls import path
-from . import views
+from django.urls import path, register_converter
+from . import converters, views
+
+register_converter(converters.FloatConverter, 'float')
 
 urlpatterns = [
     path('health', views.health_check, name='health'),
+    path('metrics', views.get_metrics, name='metrics'),
     path('eeg-info', views.get_eeg_info, name='eeg-info'),
     path('eeg-data', views.get_eeg_data, name='eeg-data'),
+    path('eeg-montage', views.get_eeg_montage, name='eeg-montage'),
     path('eeg-topomap/<float:time_point>', views.generate_topomap, name='eeg-topomap'),
     path('eeg-psd', views.get_psd, name='eeg-psd'),
     path('eeg-bands', views.get_frequency_bands, name='eeg-bands'),
+    path('eeg-bootstrap', views.get_eeg_bootstrap, name='eeg-bootstrap'),
+    path('live/push', views.push_live, name='live-push'),
+    path('eeg-events', views.get_eeg_events, name='eeg-events'),
+    path('eeg-evoked', views.get_eeg_evoked, name='eeg-evoked'),
+    path('eeg-epochs', views.get_eeg_epochs, name='eeg-epochs'),
+    path('annotations', views.annotations, name='annotations'),
+    path('eeg-stats', views.get_eeg_stats, name='eeg-stats'),
+    path('eeg-export', views.export_eeg, name='eeg-export'),
+    path('eeg-search', views.search_eeg, name='eeg-search'),
+    path('eeg-source/labels', views.get_source_labels, name='eeg-source-labels'),
+    path('eeg-source/peaks', views.get_source_peaks, name='eeg-source-peaks'),
+    path('eeg-ica', views.fit_ica, name='eeg-ica'),
+    path('eeg-ica/<str:key>', views.get_ica_status, name='eeg-ica-status'),
+    path('eeg-ica/<str:key>/components', views.get_ica_components, name='eeg-ica-components'),
+    path('eeg-ica/<str:key>/sources', views.get_ica_sources, name='eeg-ica-sources'),
+    path('eeg-ica/<str:key>/clean', views.get_ica_clean, name='eeg-ica-clean'),
 ]
@@ -2,12 +2,14 @@
 EEG API Views
 RESTful endpoints for EEG data access
 """
+import json
 import logging
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from .services import eeg_service
+from . import epochs, metrics, reference, source
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +25,19 @@ def health_check(request):
     })
 
 
+@api_view(['GET'])
+def get_metrics(request):
+    """
+    Prometheus metrics for this worker process
+
+    Returns: text/plain exposition format (version 0.0.4)
+    """
+    return HttpResponse(
+        metrics.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
 @api_view(['GET'])
 def get_eeg_info(request):
     """
@@ -36,6 +51,8 @@ def get_eeg_info(request):
         "duration": float,
         "n_samples": int
     }
+    In live mode (EEG_SOURCE=live) duration and n_samples count everything received,
+    and "live": true, "buffer_start" and "buffer_seconds" describe what is still held.
     """
     try:
         logger.info("EEG info requested")
@@ -57,21 +74,36 @@ def get_eeg_data(request):
     Query Parameters:
     - tmin: float (default: 0) - Start time in seconds
     - tmax: float (default: 10) - End time in seconds
+    - reference: str (default: original) - original, average, linked, bipolar or laplacian
+    - ref_channels: str (optional) - Comma-separated reference channels for linked
+      (default: the most lateral left and right electrodes)
+    - pairs: str (optional) - Bipolar anode-cathode pairs, e.g. "Fp1-F3,F3-C3"
+      (default: front-to-back chains of nearest neighbours)
+    - n_neighbors: int (default: 4) - Neighbours averaged by the Laplacian
+    - sfreq: float (optional) - Output rate below the recording's; anti-aliased
+      polyphase resampling on a recording-wide grid, so windows stitch exactly
 
     Response:
     {
-        "labels": list[str],
+        "labels": list[str],  # bipolar labels are "anode-cathode"
+        "reference": str,
         "data": list[list[float]],
         "times": list[float],
-        "sfreq": float
+        "sfreq": float,
+        "annotations": list[dict]  # overlapping the window, onsets in recording time
     }
+    In live mode the window is clipped to the buffered samples, "tmin" gives its actual
+    start, annotations are empty and sfreq is not supported.
     """
     try:
         tmin = float(request.GET.get('tmin', 0))
         tmax = float(request.GET.get('tmax', 10))
         logger.info(f"EEG data requested for window {tmin}-{tmax}s")
 
-        data = eeg_service.get_data(tmin=tmin, tmax=tmax)
+        sfreq = request.GET.get('sfreq')
+        sfreq = float(sfreq) if sfreq else None
+        reference_key = reference.parse_reference_params(request.GET)
+        data = eeg_service.get_data(tmin=tmin, tmax=tmax, reference_key=reference_key, sfreq=sfreq)
         return Response(data)
     except ValueError as e:
         logger.error(f"Invalid parameters: {str(e)}")
@@ -87,6 +119,29 @@ def get_eeg_data(request):
         )
 
 
+@api_view(['GET'])
+def get_eeg_montage(request):
+    """
+    Get sensor positions from the recording and the available re-references
+
+    Response:
+    {
+        "channel_names": list[str],
+        "positions": [{"channel": str, "x": float, "y": float, "z": float}],  # head coords, metres
+        "references": list[str],
+        "default_linked": list[str] | null
+    }
+    """
+    try:
+        return Response(eeg_service.get_montage_info())
+    except Exception as e:
+        logger.error(f"Error in get_eeg_montage: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['GET'])
 def generate_topomap(request, time_point):
     """
@@ -105,7 +160,8 @@ def generate_topomap(request, time_point):
             image_data,
             content_type='image/png',
             headers={
-                'Cache-Control': 'public, max-age=300',  # Cache for 5 minutes
+                # Live maps change as samples arrive; recording maps are cached for 5 minutes
+                'Cache-Control': 'no-store' if eeg_service.live else 'public, max-age=300',
             }
         )
     except ValueError as e:
@@ -139,6 +195,12 @@ def get_psd(request):
         logger.info("PSD data requested")
         psd_data = eeg_service.get_psd()
         return Response(psd_data)
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         logger.error(f"Error in get_psd: {str(e)}", exc_info=True)
         return Response(
@@ -165,9 +227,644 @@ def get_frequency_bands(request):
         logger.info("Frequency bands requested")
         bands = eeg_service.get_frequency_bands()
         return Response(bands)
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         logger.error(f"Error in get_frequency_bands: {str(e)}", exc_info=True)
         return Response(
             {"error": str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['POST'])
+def push_live(request):
+    """
+    Append samples to the live buffer (requires EEG_SOURCE=live)
+
+    Query Parameters:
+    - reset: bool (default: false) - Clear the buffer before appending
+
+    Body:
+    - application/octet-stream: little-endian float32 frames, one value per channel per sample
+    - application/json: {"data": list[list[float]]}  # one list per channel
+
+    Response:
+    {
+        "received": int,
+        "n_samples": int,  # received since acquisition (or the last reset) began
+        "duration": float
+    }
+    """
+    if not eeg_service.live:
+        return Response(
+            {"error": "Live mode is off; start the backend with EEG_SOURCE=live"},
+            status=status.HTTP_409_CONFLICT
+        )
+    try:
+        reset = request.GET.get('reset', 'false').lower() == 'true'
+        return Response(eeg_service.push_live(request.body, request.content_type, reset))
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in push_live: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_eeg_bootstrap(request):
+    """
+    Dashboard bootstrap: info, initial window, topomap, PSD and bands in one response
+
+    Query Parameters:
+    - tmin: float (default: 0) - Initial window start in seconds
+    - tmax: float (default: 10) - Initial window end in seconds
+    - time_point: float (default: 0.01) - Time of the first topomap
+
+    Response: application/x-ndjson, one line per part as soon as it is ready
+    {"part": "info" | "data" | "topomap" | "psd" | "bands", "data": {...}}
+    Parts carry the payload of the matching endpoint; topomap is
+    {"time_point": float, "image": "data:image/png;base64,..."}.
+    A failure after streaming started arrives as {"part": "error", "data": {"error": str}}
+    """
+    try:
+        tmin = float(request.GET.get('tmin', 0))
+        tmax = float(request.GET.get('tmax', 10))
+        time_point = float(request.GET.get('time_point', 0.01))
+        logger.info(f"Bootstrap requested: window {tmin}-{tmax}s, topomap at {time_point}s")
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def body():
+        try:
+            for part, payload in eeg_service.get_bootstrap(tmin, tmax, time_point):
+                with metrics.span('serialize'):
+                    line = json.dumps({"part": part, "data": payload})
+                yield line + '\n'
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-band
+            logger.error(f"Error in get_eeg_bootstrap: {str(e)}", exc_info=True)
+            yield json.dumps({"part": "error", "data": {"error": str(e)}}) + '\n'
+
+    return StreamingHttpResponse(metrics.streamed(body()), content_type='application/x-ndjson')
+
+
+def _epoch_params(request):
+    """Read event_id, tmin, tmax and baseline from query parameters (times rounded to ms)"""
+    event_id = request.GET.get('event_id')
+    event_id = int(event_id) if event_id not in (None, '', 'all') else None
+    tmin = round(float(request.GET.get('tmin', -0.2)), 3)
+    tmax = round(float(request.GET.get('tmax', 0.5)), 3)
+    baseline = epochs.parse_baseline(request.GET.get('baseline'), tmin)
+    return event_id, tmin, tmax, baseline
+
+
+@api_view(['GET'])
+def get_eeg_events(request):
+    """
+    Get events extracted from the stim channel
+
+    Response:
+    {
+        "samples": list[int],
+        "times": list[float],
+        "event_ids": list[int],
+        "counts": dict[str, int]
+    }
+    """
+    try:
+        logger.info("EEG events requested")
+        return Response(eeg_service.get_events())
+    except Exception as e:
+        logger.error(f"Error in get_eeg_events: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_eeg_evoked(request):
+    """
+    Get the evoked response (ERP) and per-condition statistics
+
+    Query Parameters:
+    - event_id: int (default: all events)
+    - tmin: float (default: -0.2) - Epoch start relative to the event
+    - tmax: float (default: 0.5) - Epoch end relative to the event
+    - baseline: "start,end" | "none" (default: tmin,0)
+
+    Response:
+    {
+        "event_id": int | null,
+        "channel_names": list[str],
+        "times": list[float],
+        "n_epochs": int,
+        "evoked": list[list[float]],
+        "std": list[list[float]],
+        "sem": list[list[float]],
+        "gfp": list[float],
+        "peak_latency": float,
+        "peak_gfp": float
+    }
+    """
+    try:
+        event_id, tmin, tmax, baseline = _epoch_params(request)
+        logger.info(f"Evoked requested: event_id={event_id}, {tmin}s to {tmax}s")
+        return Response(eeg_service.get_evoked(event_id, tmin, tmax, baseline))
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in get_eeg_evoked: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_eeg_epochs(request):
+    """
+    Get a page of individual epochs
+
+    Query Parameters:
+    - event_id, tmin, tmax, baseline: as for eeg-evoked
+    - start: int (default: 0) - Index of the first epoch
+    - count: int (default: 10, max: 100) - Number of epochs
+
+    Response:
+    {
+        "event_id": int | null,
+        "channel_names": list[str],
+        "times": list[float],
+        "n_total": int,
+        "onsets": list[float],
+        "epochs": list[list[list[float]]]
+    }
+    """
+    try:
+        event_id, tmin, tmax, baseline = _epoch_params(request)
+        start = max(0, int(request.GET.get('start', 0)))
+        count = min(100, max(1, int(request.GET.get('count', 10))))
+        logger.info(f"Epochs requested: event_id={event_id}, epochs {start}-{start + count}")
+        return Response(eeg_service.get_epochs(event_id, tmin, tmax, baseline, start, count))
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in get_eeg_epochs: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET', 'POST', 'DELETE'])
+def annotations(request):
+    """
+    Read, create or delete recording annotations
+
+    GET Query Parameters:
+    - tmin: float (optional) - Window start time in seconds
+    - tmax: float (optional) - Window end time in seconds
+    Without either, every annotation is returned
+
+    POST body (created in one transaction, 201):
+    {"annotations": [{"onset": float, "duration": float, "description": str,
+                      "kind": "stimulus" | "response" | "artifact" | "custom", "color": str}]}
+
+    DELETE body (deleted in one transaction), or ?ids=1,2,3:
+    {"ids": list[int]}
+
+    Response (GET and POST):
+    {
+        "annotations": [{"id", "onset", "duration", "description", "kind", "color", "source"}],
+        "count": int
+    }
+    """
+    try:
+        if request.method == 'POST':
+            items = request.data.get('annotations') if isinstance(request.data, dict) else None
+            created = eeg_service.create_annotations(items)
+            logger.info(f"Created {len(created)} annotations")
+            return Response({"annotations": created, "count": len(created)}, status=status.HTTP_201_CREATED)
+
+        if request.method == 'DELETE':
+            ids = request.data.get('ids') if isinstance(request.data, dict) else None
+            if ids is None:
+                ids = [i for i in request.GET.get('ids', '').split(',') if i]
+            deleted = eeg_service.delete_annotations(ids)
+            logger.info(f"Deleted {deleted} annotations")
+            return Response({"deleted": deleted})
+
+        tmin = request.GET.get('tmin')
+        tmax = request.GET.get('tmax')
+        tmin = float(tmin) if tmin is not None else None
+        tmax = float(tmax) if tmax is not None else None
+        rows = eeg_service.get_annotations(tmin, tmax)
+        logger.info(f"Returning {len(rows)} annotations for {tmin}-{tmax}s")
+        return Response({"annotations": rows, "count": len(rows)})
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in annotations: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_eeg_stats(request):
+    """
+    Get per-channel signal statistics
+
+    Query Parameters:
+    - tmin: float (optional) - Window start time in seconds
+    - tmax: float (optional) - Window end time in seconds
+    Without either, statistics cover the whole recording
+
+    Response:
+    {
+        "channel_names": list[str],
+        "mean": list[float],
+        "variance": list[float],
+        "rms": list[float],
+        "min": list[float],
+        "max": list[float],
+        "kurtosis": list[float],  # excess kurtosis
+        "line_length": list[float],
+        "tmin": float,
+        "tmax": float,
+        "n_samples": int
+    }
+    """
+    try:
+        tmin = request.GET.get('tmin')
+        tmax = request.GET.get('tmax')
+        tmin = float(tmin) if tmin is not None else None
+        tmax = float(tmax) if tmax is not None else None
+        logger.info(f"Stats requested: tmin={tmin}, tmax={tmax}")
+        return Response(eeg_service.get_stats(tmin, tmax))
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in get_eeg_stats: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def export_eeg(request):
+    """
+    Stream the recording as a file download
+
+    Query Parameters:
+    - format: str (default: csv) - One of csv, edf, npz
+    - tmin: float (default: 0) - Start time in seconds
+    - tmax: float (default: end of recording) - End time in seconds
+    - channels: str (optional) - Comma-separated channel names (default: all)
+    - l_freq, h_freq: float (optional) - Band-pass edges in Hz (zero-phase FIR)
+
+    Response: chunked file body
+    - csv: header row "time,<channels>", one row per sample, volts
+    - edf: EDF file in µV, 16-bit, roughly one-second data records
+    - npz: arrays data (n_channels, n_times), times, ch_names, sfreq
+    """
+    try:
+        body, content_type, headers = eeg_service.export_recording(request.GET)
+        response = StreamingHttpResponse(body, content_type=content_type)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in export_eeg: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def search_eeg(request):
+    """
+    Search for amplitude threshold crossings or the largest peaks
+
+    Query Parameters:
+    - type: str (default: threshold) - threshold or peaks
+    - channels: str (optional) - Comma-separated channel names (default: all)
+    - tmin, tmax: float (optional) - Window in seconds (default: whole recording)
+    - threshold: float (required for threshold) - Amplitude in volts
+    - direction: str (default: abs) - abs (|x| > threshold), above or below
+    - limit: int (default/max: 1000) - Maximum intervals returned
+    - k: int (default: 10, max: 100) - Number of peaks
+    - min_separation: float (default: 0.1) - Seconds between peaks on one channel
+
+    Response:
+    {
+        "type": "threshold" | "peaks",
+        "intervals": [{"channel", "tmin", "tmax", "peak_time", "peak"}],  # threshold
+        "truncated": bool,                                                  # threshold
+        "peaks": [{"channel", "time", "value"}],                            # peaks
+        "count": int,
+        "tmin": float,
+        "tmax": float,
+        "blocks_read": int,
+        "blocks_total": int
+    }
+    """
+    try:
+        logger.info(f"Search requested: {dict(request.GET.items())}")
+        return Response(eeg_service.search(request.GET))
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in search_eeg: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _ica_not_ready(key, e):
+    """409 response for a model that is still fitting or was never requested"""
+    return Response(
+        {"error": str(e), **eeg_service.get_ica_status(key)},
+        status=status.HTTP_409_CONFLICT
+    )
+
+
+@api_view(['POST'])
+def fit_ica(request):
+    """
+    Start a background ICA fit
+
+    Request body (all optional):
+    {
+        "n_components": int (default: 20),
+        "method": "fastica" | "infomax" | "picard",
+        "random_state": int,
+        "l_freq": float (default: 1.0) - High-pass applied to the fitting copy,
+        "decim": int (default: 3) - Sample decimation during the fit
+    }
+
+    Response (202 while fitting, 200 once ready):
+    {
+        "key": str,
+        "status": "running" | "ready",
+        "params": dict
+    }
+    """
+    try:
+        logger.info("ICA fit requested")
+        state = eeg_service.fit_ica(request.data or None)
+        code = status.HTTP_200_OK if state['status'] == 'ready' else status.HTTP_202_ACCEPTED
+        return Response(state, status=code)
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in fit_ica: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_ica_status(request, key):
+    """
+    Get the state of an ICA fit
+
+    Response:
+    {
+        "key": str,
+        "status": "ready" | "running" | "failed" | "missing",
+        "error": str (when failed)
+    }
+    """
+    return Response(eeg_service.get_ica_status(key))
+
+
+@api_view(['GET'])
+def get_ica_components(request, key):
+    """
+    Get ICA component topographies
+
+    Response:
+    {
+        "channel_names": list[str],
+        "n_components": int,
+        "patterns": list[list[float]]
+    }
+    """
+    try:
+        return Response(eeg_service.get_ica_components(key))
+    except LookupError as e:
+        return _ica_not_ready(key, e)
+    except Exception as e:
+        logger.error(f"Error in get_ica_components: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_ica_sources(request, key):
+    """
+    Get ICA component time courses for a time window
+
+    Query Parameters:
+    - tmin: float (default: 0) - Start time in seconds
+    - tmax: float (default: 10) - End time in seconds
+
+    Response:
+    {
+        "components": list[str],
+        "data": list[list[float]],
+        "times": list[float],
+        "sfreq": float
+    }
+    """
+    try:
+        tmin = float(request.GET.get('tmin', 0))
+        tmax = float(request.GET.get('tmax', 10))
+        return Response(eeg_service.get_ica_sources(key, tmin, tmax))
+    except LookupError as e:
+        return _ica_not_ready(key, e)
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in get_ica_sources: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_ica_clean(request, key):
+    """
+    Get artifact-cleaned EEG data for a time window
+
+    Query Parameters:
+    - tmin: float (default: 0) - Start time in seconds
+    - tmax: float (default: 10) - End time in seconds
+    - exclude: comma-separated component indices to remove
+
+    Response:
+    {
+        "labels": list[str],
+        "data": list[list[float]],
+        "times": list[float],
+        "sfreq": float,
+        "exclude": list[int]
+    }
+    """
+    try:
+        tmin = float(request.GET.get('tmin', 0))
+        tmax = float(request.GET.get('tmax', 10))
+        exclude = [int(i) for i in request.GET.get('exclude', '').split(',') if i.strip()]
+        return Response(eeg_service.get_ica_clean(key, tmin, tmax, exclude))
+    except LookupError as e:
+        return _ica_not_ready(key, e)
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in get_ica_clean: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_source_labels(request):
+    """
+    Get per-label source time courses for a time window
+
+    Query Parameters:
+    - tmin: float (default: 0) - Start time in seconds
+    - tmax: float (default: 1) - End time in seconds
+    - method: "MNE" | "dSPM" | "sLORETA" | "eLORETA" (default: dSPM)
+    - snr: float (default: 3) - Regularization, lambda2 = 1 / snr**2
+    - parc: str (default: aparc) - FreeSurfer parcellation
+
+    Response:
+    {
+        "labels": list[str],
+        "data": list[list[float]],
+        "times": list[float],
+        "method": str
+    }
+    """
+    try:
+        tmin = float(request.GET.get('tmin', 0))
+        tmax = float(request.GET.get('tmax', 1))
+        method, snr = source.parse_source_params(request.GET)
+        parc = request.GET.get('parc', 'aparc')
+        logger.info(f"Source label time courses requested: {tmin}s to {tmax}s, {method}")
+        return Response(eeg_service.get_source_labels(tmin, tmax, method, snr, parc))
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in get_source_labels: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_source_peaks(request):
+    """
+    Get the strongest source vertices in a time window
+
+    Query Parameters:
+    - tmin, tmax, method, snr: as for eeg-source/labels
+    - k: int (default: 10, max: 100) - Number of peaks
+
+    Response:
+    {
+        "peaks": list[{"hemi": str, "vertex": int, "amplitude": float, "time": float}],
+        "n_sources": int,
+        "method": str
+    }
+    """
+    try:
+        tmin = float(request.GET.get('tmin', 0))
+        tmax = float(request.GET.get('tmax', 1))
+        method, snr = source.parse_source_params(request.GET)
+        k = min(100, max(1, int(request.GET.get('k', 10))))
+        logger.info(f"Source peaks requested: {tmin}s to {tmax}s, {method}, k={k}")
+        return Response(eeg_service.get_source_peaks(tmin, tmax, method, snr, k))
+    except ValueError as e:
+        logger.error(f"Invalid parameters: {str(e)}")
+        return Response(
+            {"error": f"Invalid parameters: {str(e)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error in get_source_peaks: {str(e)}", exc_info=True)
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
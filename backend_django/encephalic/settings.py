@@ -32,6 +32,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.gzip.GZipMiddleware',  # Enable gzip compression
+    'eeg_api.middleware.MetricsMiddleware',  # Innermost, so it times rendering alone
 ]
 
 ROOT_URLCONF = 'encephalic.urls'
@@ -52,11 +53,14 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'encephalic.wsgi.application'
 
-# Database (not needed for this app, but required by Django)
+# Database: recording annotations (create the tables with `python manage.py migrate`)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            'timeout': 30,  # Workers share the file; wait out each other's write transactions
+        },
     }
 }
 
@@ -88,6 +92,12 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.JSONParser',
     ],
     'EXCEPTION_HANDLER': 'eeg_api.exceptions.custom_exception_handler',
+    # Anonymous API: django.contrib.auth is not installed
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': [],
+    'UNAUTHENTICATED_USER': None,
+    # JSON is the only renderer; frees ?format= for endpoint parameters (eeg-export)
+    'URL_FORMAT_OVERRIDE': None,
 }
 
 # Cache settings - Use Redis for production, in-memory for development
@@ -154,3 +164,25 @@ LOGGING = {
 EEG_CACHE_TIMEOUT = 3600  # 1 hour
 TOPOMAP_CACHE_TIMEOUT = 300  # 5 minutes
 PSD_CACHE_TIMEOUT = 600  # 10 minutes
+EVOKED_CACHE_TIMEOUT = 3600  # 1 hour
+
+# Derived artifacts (ICA models, ...) persist next to the MNE data so they survive restarts
+ENCEPHALIC_CACHE_DIR = os.environ.get(
+    'ENCEPHALIC_CACHE_DIR', os.path.join(os.path.expanduser('~'), 'mne_data', 'encephalic')
+)
+ICA_N_JOBS = int(os.environ.get('ICA_N_JOBS', -1))
+
+# EEG_RECORDING=synthetic serves a generated recording instead of downloading the MNE sample data
+EEG_RECORDING = os.environ.get('EEG_RECORDING', 'sample')
+# EEG_DTYPE=float32 stores the recording (and computes slices, topomaps and PSDs) in single precision
+EEG_DTYPE = os.environ.get('EEG_DTYPE', 'float64')
+
+# EEG_SOURCE=live serves info, data, topomap, PSD and bands from samples pushed to /api/live/push
+EEG_SOURCE = os.environ.get('EEG_SOURCE', 'file')
+LIVE_CHANNELS = os.environ.get('LIVE_CHANNELS')  # Comma-separated; defaults to 19 10-20 electrodes
+LIVE_SFREQ = float(os.environ.get('LIVE_SFREQ', 250))
+LIVE_SECONDS = float(os.environ.get('LIVE_SECONDS', 60))
+
+# Instrumentation: per-request sampling profiles, requested with the X-Encephalic-Profile: 1 header
+ENABLE_PROFILING = os.environ.get('ENABLE_PROFILING', 'false').lower() == 'true'  # Parsed as in Flask
+PROFILE_DIR = os.environ.get('PROFILE_DIR')  # Defaults to <tmp>/encephalic-profiles
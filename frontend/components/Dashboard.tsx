@@ -25,11 +25,14 @@ import {
   ChevronUp
 } from 'lucide-react'
 import {
-  useEEGInfo,
-  useEEGData,
-  usePSDData,
-  useBandData,
+  useAnnotations,
+  useDashboardBootstrap,
+  useEEGStats,
+  useMontage,
+  useThresholdSearch,
   useTopomap,
+  getExportUrl,
+  type ExportFormat,
 } from '@/hooks/useEEGData'
 import { SignalsPanel } from './panels/SignalsPanel'
 import { TopomapPanel } from './panels/TopomapPanel'
@@ -43,7 +46,7 @@ import { FilterControlsPanel } from './panels/FilterControlsPanel'
 import { SpectrogramPanel } from './panels/SpectrogramPanel'
 import { ConnectivityPanel } from './panels/ConnectivityPanel'
 import { ElectrodeMontagePanel } from './panels/ElectrodeMontagePanel'
-import { EventMarkingPanel } from './panels/EventMarkingPanel'
+import { EventMarkingPanel, EVENT_TYPES } from './panels/EventMarkingPanel'
 import { ArtifactDetectionPanel } from './panels/ArtifactDetectionPanel'
 import { ThemeToggle } from './ThemeToggle'
 
@@ -58,21 +61,44 @@ type FeatureCategory =
   | 'connectivity'
   | 'export'
 
+const INITIAL_TIME_POINT = 0.01
+// Amplitude excursions beyond this (volts) are flagged as artifacts
+const ARTIFACT_THRESHOLD = 100e-6
+// Annotations are fetched one page of this many seconds around the time point at a time
+const ANNOTATION_PAGE = 10
+
 export default function Dashboard() {
   // State
-  const [timePoint, setTimePoint] = useState(0.01)
+  const [timePoint, setTimePoint] = useState(INITIAL_TIME_POINT)
   const [isPlaying, setIsPlaying] = useState(false)
   const [selectedChannels, setSelectedChannels] = useState<string[]>([])
-  const [events, setEvents] = useState<any[]>([])
   const [activeFeature, setActiveFeature] = useState<FeatureCategory>('signals')
   const [sidebarCollapsed, setSidebarCollapsed] = useState(false)
 
-  // Data hooks
-  const { data: eegInfo, loading: infoLoading } = useEEGInfo()
-  const { data: eegData, loading: dataLoading } = useEEGData(0, 10)
-  const { data: psdData, loading: psdLoading } = usePSDData()
-  const { data: bandData, loading: bandLoading } = useBandData()
-  const { imageUrl: topomap, loading: topomapLoading } = useTopomap(timePoint, 200)
+  // Data hooks: one streamed bootstrap request covers everything shown on mount
+  const bootstrap = useDashboardBootstrap(0, 10, INITIAL_TIME_POINT)
+  const { info: eegInfo, data: eegData, psd: psdData, bands: bandData } = bootstrap
+  const { info: infoLoading, data: dataLoading, psd: psdLoading, bands: bandLoading } = bootstrap.loading
+  const { data: statsData, loading: statsLoading } = useEEGStats(0, 10, activeFeature === 'export')
+
+  // The first topomap arrives with the bootstrap; later time points are fetched on demand
+  const liveTopomap = timePoint !== INITIAL_TIME_POINT
+  const fetchedTopomap = useTopomap(timePoint, 200, liveTopomap)
+  const topomap = liveTopomap ? fetchedTopomap.imageUrl : bootstrap.topomap?.image ?? null
+  const topomapLoading = liveTopomap ? fetchedTopomap.loading : bootstrap.loading.topomap
+
+  // Annotations persist server-side; only the page containing the time point is loaded
+  const annotationStart = Math.floor(timePoint / ANNOTATION_PAGE) * ANNOTATION_PAGE
+  const { annotations, addAnnotations, deleteAnnotations } = useAnnotations(
+    annotationStart, annotationStart + ANNOTATION_PAGE, activeFeature === 'epochs'
+  )
+  const events = annotations.map(a => ({
+    id: String(a.id),
+    time: a.onset,
+    label: a.description,
+    type: a.kind,
+    color: a.color ?? EVENT_TYPES.find(t => t.type === a.kind)!.color
+  }))
 
   // Playback effect
   useEffect(() => {
@@ -104,6 +130,14 @@ export default function Dashboard() {
     setIsPlaying(!isPlaying)
   }
 
+  // Exports stream from the server, so the whole recording downloads without passing through JSON
+  const downloadExport = (format: ExportFormat) => {
+    const link = document.createElement('a')
+    link.href = getExportUrl(format, { channels: selectedChannels })
+    link.download = ''
+    link.click()
+  }
+
   const handleChannelToggle = (channel: string) => {
     setSelectedChannels(prev =>
       prev.includes(channel)
@@ -116,21 +150,32 @@ export default function Dashboard() {
     setSelectedChannels(channels)
   }
 
-  const handleAddEvent = (event: any) => {
-    setEvents(prev => [...prev, { ...event, id: Date.now().toString() }])
+  const handleAddEvent = (event: Omit<typeof events[number], 'id'>) => {
+    addAnnotations([{
+      onset: event.time,
+      duration: 0,
+      description: event.label,
+      kind: event.type,
+      color: event.color
+    }])
   }
 
   const handleDeleteEvent = (id: string) => {
-    setEvents(prev => prev.filter(e => e.id !== id))
+    deleteAnnotations([Number(id)])
   }
 
   // Mock data for features
-  const mockElectrodeData = eegData ? {
-    positions: eegData.labels.slice(0, 10).map((label, i) => ({
-      channel: label,
-      x: Math.cos(i * 0.6) * 0.9,
-      y: Math.sin(i * 0.6) * 0.9,
-      z: 0.3 + Math.random() * 0.4
+  // Real sensor positions, scaled onto the unit head sphere drawn by the montage panel
+  const { data: montage, loading: montageLoading } = useMontage(activeFeature === 'topomap')
+  const headRadius = montage
+    ? Math.max(...montage.positions.map(p => Math.hypot(p.x, p.y, p.z)), Number.EPSILON)
+    : 1
+  const electrodeData = montage ? {
+    positions: montage.positions.map(p => ({
+      channel: p.channel,
+      x: p.x / headRadius,
+      y: p.y / headRadius,
+      z: p.z / headRadius
     })),
     selectedChannels
   } : null
@@ -142,11 +187,21 @@ export default function Dashboard() {
     )
   } : null
 
-  const mockArtifacts = [
-    { type: 'eye_blink' as const, channel: 'Fp1', time: 2.5, duration: 0.2, severity: 'medium' as const },
-    { type: 'muscle' as const, channel: 'T4', time: 4.2, duration: 0.5, severity: 'high' as const },
-    { type: 'movement' as const, channel: 'C3', time: 7.1, duration: 0.3, severity: 'low' as const },
-  ]
+  // Large-amplitude excursions over the whole recording, found from server-side zone maps
+  const { data: artifactSearch, loading: artifactsLoading } = useThresholdSearch(
+    ARTIFACT_THRESHOLD, undefined, undefined, activeFeature === 'preprocessing'
+  )
+  // A threshold crossing says nothing about its cause, so these are not labelled as movement
+  const artifacts = (artifactSearch?.intervals ?? []).map(interval => {
+    const ratio = Math.abs(interval.peak) / ARTIFACT_THRESHOLD
+    return {
+      type: 'amplitude' as const,
+      channel: interval.channel,
+      time: interval.tmin,
+      duration: interval.tmax - interval.tmin,
+      severity: ratio > 3 ? 'high' as const : ratio > 2 ? 'medium' as const : 'low' as const
+    }
+  })
 
   // Feature navigation
   const features = [
@@ -291,7 +346,7 @@ export default function Dashboard() {
                     />
                   </div>
                   <div className="h-full">
-                    <ElectrodeMontagePanel data={mockElectrodeData} loading={false} />
+                    <ElectrodeMontagePanel data={electrodeData} loading={montageLoading} />
                   </div>
                 </div>
               )}
@@ -304,7 +359,7 @@ export default function Dashboard() {
                       <FilterControlsPanel />
                     </div>
                     <div>
-                      <ArtifactDetectionPanel artifacts={mockArtifacts} loading={false} />
+                      <ArtifactDetectionPanel artifacts={artifacts} loading={artifactsLoading} />
                     </div>
                   </div>
                   <div className="h-full">
@@ -476,10 +531,14 @@ export default function Dashboard() {
               {activeFeature === 'export' && (
                 <div className="h-full grid grid-cols-1 lg:grid-cols-3 gap-4">
                   <div className="lg:col-span-2 h-full">
-                    <ExportPanel />
+                    <ExportPanel
+                      onExportCSV={() => downloadExport('csv')}
+                      onExportEDF={() => downloadExport('edf')}
+                      onExportNPZ={() => downloadExport('npz')}
+                    />
                   </div>
                   <div className="h-full">
-                    <StatsPanel data={eegData} loading={dataLoading} />
+                    <StatsPanel data={statsData} loading={statsLoading} />
                   </div>
                 </div>
               )}
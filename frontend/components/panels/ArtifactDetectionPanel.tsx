@@ -9,7 +9,7 @@ import { AlertTriangle, Eye, Zap, Activity, Loader2 } from 'lucide-react'
 import { Badge } from '@/components/ui/badge'
 
 interface ArtifactDetection {
-  type: 'eye_blink' | 'muscle' | 'movement' | 'line_noise'
+  type: 'eye_blink' | 'muscle' | 'movement' | 'line_noise' | 'amplitude'
   channel: string
   time: number
   duration: number
@@ -46,6 +46,12 @@ const ARTIFACT_TYPES = {
     icon: Zap,
     color: 'purple',
     description: '50/60 Hz electrical interference'
+  },
+  amplitude: {
+    label: 'High Amplitude',
+    icon: AlertTriangle,
+    color: 'yellow',
+    description: 'Excursions above the amplitude threshold, of any origin'
   }
 }
 
@@ -25,7 +25,7 @@ interface EventMarkingPanelProps {
   currentTime?: number
 }
 
-const EVENT_TYPES = [
+export const EVENT_TYPES = [
   { type: 'stimulus', label: 'Stimulus', color: '#3b82f6', icon: '⚡' },
   { type: 'response', label: 'Response', color: '#10b981', icon: '✓' },
   { type: 'artifact', label: 'Artifact', color: '#ef4444', icon: '⚠' },
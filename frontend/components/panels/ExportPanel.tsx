@@ -13,6 +13,8 @@ interface ExportPanelProps {
   onExportPNG?: () => void
   onExportSVG?: () => void
   onExportCSV?: () => void
+  onExportEDF?: () => void
+  onExportNPZ?: () => void
   onExportPDF?: () => void
 }
 
@@ -20,6 +22,8 @@ export function ExportPanel({
   onExportPNG,
   onExportSVG,
   onExportCSV,
+  onExportEDF,
+  onExportNPZ,
   onExportPDF
 }: ExportPanelProps) {
   const [exporting, setExporting] = useState<string | null>(null)
@@ -66,6 +70,22 @@ export function ExportPanel({
       color: 'emerald',
       callback: onExportCSV
     },
+    {
+      id: 'edf',
+      label: 'EDF Recording',
+      description: 'European Data Format, full recording',
+      icon: FileSpreadsheet,
+      color: 'teal',
+      callback: onExportEDF
+    },
+    {
+      id: 'npz',
+      label: 'NumPy Archive',
+      description: 'Arrays for Python analysis',
+      icon: FileSpreadsheet,
+      color: 'indigo',
+      callback: onExportNPZ
+    },
     {
       id: 'pdf',
       label: 'PDF Report',
@@ -176,6 +196,7 @@ export function ExportPanel({
             <li>PNG for presentations and publications</li>
             <li>SVG for editing in vector graphics software</li>
             <li>CSV for further analysis in Python/R/MATLAB</li>
+            <li>EDF and NPZ stream the full recording from the server</li>
           </ul>
         </div>
       </CardContent>
@@ -7,6 +7,7 @@ import React, { useMemo } from 'react'
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card'
 import { BarChart3, TrendingUp, Activity, Zap, Loader2, AlertCircle } from 'lucide-react'
 import { Badge } from '@/components/ui/badge'
+import type { EEGStats } from '@/hooks/useEEGData'
 
 interface ChannelStats {
   channel: string
@@ -20,30 +21,21 @@ interface ChannelStats {
 }
 
 interface StatsPanelProps {
-  data: {
-    times: number[]
-    data: number[][]
-    labels: string[]
-  } | null
+  data: EEGStats | null
   loading: boolean
 }
 
 export function StatsPanel({ data, loading }: StatsPanelProps) {
+  // Moments come from /api/eeg-stats; only derived ratios are formed here
   const channelStats = useMemo(() => {
     if (!data) return []
 
-    return data.labels.map((label, idx) => {
-      const channelData = data.data[idx]
-      const mean = channelData.reduce((a, b) => a + b, 0) / channelData.length
-      const std = Math.sqrt(
-        channelData.reduce((sum, val) => sum + Math.pow(val - mean, 2), 0) /
-          channelData.length
-      )
-      const min = Math.min(...channelData)
-      const max = Math.max(...channelData)
-      const rms = Math.sqrt(
-        channelData.reduce((sum, val) => sum + val * val, 0) / channelData.length
-      )
+    return data.channel_names.map((label, idx) => {
+      const mean = data.mean[idx]
+      const std = Math.sqrt(data.variance[idx])
+      const min = data.min[idx]
+      const max = data.max[idx]
+      const rms = data.rms[idx]
       const peakToPeak = max - min
 
       // Simple SNR estimate (signal power / noise power)
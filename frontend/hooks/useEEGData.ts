@@ -44,6 +44,30 @@ async function fetchWithRetry<T>(
   throw lastError
 }
 
+export type ExportFormat = 'csv' | 'edf' | 'npz'
+
+export interface ExportOptions {
+  tmin?: number
+  tmax?: number
+  channels?: string[]
+  l_freq?: number
+  h_freq?: number
+}
+
+/**
+ * URL of a streamed server-side export; the browser downloads it directly,
+ * so long recordings never pass through JSON
+ */
+export function getExportUrl(format: ExportFormat, options: ExportOptions = {}) {
+  const params = new URLSearchParams({ format })
+  if (options.tmin !== undefined) params.set('tmin', String(options.tmin))
+  if (options.tmax !== undefined) params.set('tmax', String(options.tmax))
+  if (options.channels?.length) params.set('channels', options.channels.join(','))
+  if (options.l_freq !== undefined) params.set('l_freq', String(options.l_freq))
+  if (options.h_freq !== undefined) params.set('h_freq', String(options.h_freq))
+  return `${API_URL}/api/eeg-export?${params.toString()}`
+}
+
 /**
  * Hook to check backend health and initialization status
  */
@@ -93,11 +117,41 @@ export interface EEGInfo {
   n_samples: number
 }
 
+export interface Annotation {
+  id: number
+  onset: number
+  duration: number
+  description: string
+  kind: 'stimulus' | 'response' | 'artifact' | 'custom'
+  color: string | null
+  source: 'file' | 'user'
+}
+
+export type NewAnnotation = Omit<Annotation, 'id' | 'source'>
+
+export type EEGReference = 'original' | 'average' | 'linked' | 'bipolar' | 'laplacian'
+
 export interface EEGData {
   labels: string[]
+  reference?: EEGReference
   data: number[][]
   times: number[]
   sfreq: number
+  annotations?: Annotation[]
+}
+
+export interface ElectrodePosition {
+  channel: string
+  x: number
+  y: number
+  z: number
+}
+
+export interface MontageInfo {
+  channel_names: string[]
+  positions: ElectrodePosition[]
+  references: EEGReference[]
+  default_linked: string[] | null
 }
 
 export interface PSDData {
@@ -107,6 +161,20 @@ export interface PSDData {
   channel_names: string[]
 }
 
+export interface EEGStats {
+  channel_names: string[]
+  mean: number[]
+  variance: number[]
+  rms: number[]
+  min: number[]
+  max: number[]
+  kurtosis: number[]
+  line_length: number[]
+  tmin: number
+  tmax: number
+  n_samples: number
+}
+
 export interface BandData {
   delta: number
   theta: number
@@ -143,7 +211,16 @@ export function useEEGInfo() {
   return { data, loading, error }
 }
 
-export function useEEGData(tmin: number = 0, tmax: number = 10) {
+/**
+ * Signal window, re-referenced server-side one slice at a time
+ * Pass sfreq below the recording rate for an anti-aliased, resampled window
+ */
+export function useEEGData(
+  tmin: number = 0,
+  tmax: number = 10,
+  reference: EEGReference = 'original',
+  sfreq?: number
+) {
   const [data, setData] = useState<EEGData | null>(null)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<Error | null>(null)
@@ -154,7 +231,7 @@ export function useEEGData(tmin: number = 0, tmax: number = 10) {
         setLoading(true)
         const response = await fetchWithRetry(() =>
           axios.get(`${API_URL}/api/eeg-data`, {
-            params: { tmin, tmax }
+            params: { tmin, tmax, reference, sfreq }
           })
         )
         setData(response.data)
@@ -168,8 +245,191 @@ export function useEEGData(tmin: number = 0, tmax: number = 10) {
     }
 
     fetchData()
+  }, [tmin, tmax, reference, sfreq])
+
+  return { data, loading, error }
+}
+
+/**
+ * Sensor positions read from the recording (head coordinates, metres)
+ */
+export function useMontage(enabled: boolean = true) {
+  const [data, setData] = useState<MontageInfo | null>(null)
+  const [loading, setLoading] = useState(true)
+  const [error, setError] = useState<Error | null>(null)
+
+  useEffect(() => {
+    if (!enabled) return
+
+    const fetchMontage = async () => {
+      try {
+        setLoading(true)
+        const response = await fetchWithRetry(() =>
+          axios.get(`${API_URL}/api/eeg-montage`)
+        )
+        setData(response.data)
+        setError(null)
+      } catch (err) {
+        setError(err as Error)
+        console.error('Error fetching montage:', err)
+      } finally {
+        setLoading(false)
+      }
+    }
+
+    fetchMontage()
+  }, [enabled])
+
+  return { data, loading, error }
+}
+
+/**
+ * Per-channel statistics computed server-side
+ * Omit tmin/tmax for whole-recording figures
+ */
+export function useEEGStats(tmin?: number, tmax?: number, enabled: boolean = true) {
+  const [data, setData] = useState<EEGStats | null>(null)
+  const [loading, setLoading] = useState(true)
+  const [error, setError] = useState<Error | null>(null)
+
+  useEffect(() => {
+    if (!enabled) return
+
+    const fetchStats = async () => {
+      try {
+        setLoading(true)
+        const response = await fetchWithRetry(() =>
+          axios.get(`${API_URL}/api/eeg-stats`, {
+            params: { tmin, tmax }
+          })
+        )
+        setData(response.data)
+        setError(null)
+      } catch (err) {
+        setError(err as Error)
+        console.error('Error fetching EEG stats:', err)
+      } finally {
+        setLoading(false)
+      }
+    }
+
+    fetchStats()
+  }, [tmin, tmax, enabled])
+
+  return { data, loading, error }
+}
+
+/**
+ * Server-side annotations overlapping [tmin, tmax], persisted per recording
+ * Creates and deletes are single requests (one transaction each) and update the list in place
+ */
+export function useAnnotations(tmin: number, tmax: number, enabled: boolean = true) {
+  const [annotations, setAnnotations] = useState<Annotation[]>([])
+  const [loading, setLoading] = useState(true)
+  const [error, setError] = useState<Error | null>(null)
+
+  useEffect(() => {
+    if (!enabled) return
+
+    const fetchAnnotations = async () => {
+      try {
+        setLoading(true)
+        const response = await fetchWithRetry(() =>
+          axios.get(`${API_URL}/api/annotations`, {
+            params: { tmin, tmax }
+          })
+        )
+        setAnnotations(response.data.annotations)
+        setError(null)
+      } catch (err) {
+        setError(err as Error)
+        console.error('Error fetching annotations:', err)
+      } finally {
+        setLoading(false)
+      }
+    }
+
+    fetchAnnotations()
+  }, [tmin, tmax, enabled])
+
+  const addAnnotations = useCallback(async (items: NewAnnotation[]) => {
+    try {
+      const response = await axios.post(`${API_URL}/api/annotations`, { annotations: items })
+      const created: Annotation[] = response.data.annotations
+      setAnnotations(prev =>
+        [...prev, ...created.filter(a => a.onset <= tmax && a.onset + a.duration >= tmin)]
+          .sort((a, b) => a.onset - b.onset)
+      )
+      setError(null)
+    } catch (err) {
+      setError(err as Error)
+      console.error('Error creating annotations:', err)
+    }
   }, [tmin, tmax])
 
+  const deleteAnnotations = useCallback(async (ids: number[]) => {
+    try {
+      await axios.delete(`${API_URL}/api/annotations`, { data: { ids } })
+      setAnnotations(prev => prev.filter(a => !ids.includes(a.id)))
+      setError(null)
+    } catch (err) {
+      setError(err as Error)
+      console.error('Error deleting annotations:', err)
+    }
+  }, [])
+
+  return { annotations, loading, error, addAnnotations, deleteAnnotations }
+}
+
+export interface ThresholdInterval {
+  channel: string
+  tmin: number
+  tmax: number
+  peak_time: number
+  peak: number
+}
+
+export interface ThresholdSearch {
+  intervals: ThresholdInterval[]
+  count: number
+  truncated: boolean
+  blocks_read: number
+  blocks_total: number
+}
+
+/**
+ * Intervals where |amplitude| exceeds threshold (volts), found server-side
+ * The server reads only blocks whose zone map can match, so whole-recording queries are cheap
+ */
+export function useThresholdSearch(threshold: number, tmin?: number, tmax?: number, enabled: boolean = true) {
+  const [data, setData] = useState<ThresholdSearch | null>(null)
+  const [loading, setLoading] = useState(true)
+  const [error, setError] = useState<Error | null>(null)
+
+  useEffect(() => {
+    if (!enabled) return
+
+    const fetchSearch = async () => {
+      try {
+        setLoading(true)
+        const response = await fetchWithRetry(() =>
+          axios.get(`${API_URL}/api/eeg-search`, {
+            params: { type: 'threshold', threshold, tmin, tmax }
+          })
+        )
+        setData(response.data)
+        setError(null)
+      } catch (err) {
+        setError(err as Error)
+        console.error('Error searching EEG:', err)
+      } finally {
+        setLoading(false)
+      }
+    }
+
+    fetchSearch()
+  }, [threshold, tmin, tmax, enabled])
+
   return { data, loading, error }
 }
 
@@ -231,9 +491,10 @@ export function useBandData() {
 
 /**
  * Debounced topomap fetching hook
- * Prevents excessive requests during slider movement
+ * Prevents excessive requests during slider movement; disabled while the
+ * bootstrap topomap is on screen
  */
-export function useTopomap(timePoint: number, debounceMs: number = 200) {
+export function useTopomap(timePoint: number, debounceMs: number = 200, enabled: boolean = true) {
   const [imageUrl, setImageUrl] = useState<string | null>(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<Error | null>(null)
@@ -245,6 +506,7 @@ export function useTopomap(timePoint: number, debounceMs: number = 200) {
     if (timeoutRef.current) {
       clearTimeout(timeoutRef.current)
     }
+    if (!enabled) return
 
     // Set new debounced fetch
     timeoutRef.current = setTimeout(async () => {
@@ -279,7 +541,7 @@ export function useTopomap(timePoint: number, debounceMs: number = 200) {
         clearTimeout(timeoutRef.current)
       }
     }
-  }, [timePoint, debounceMs])
+  }, [timePoint, debounceMs, enabled])
 
   // Cleanup URL on unmount
   useEffect(() => {
@@ -292,3 +554,108 @@ export function useTopomap(timePoint: number, debounceMs: number = 200) {
 
   return { imageUrl, loading, error }
 }
+
+export interface BootstrapTopomap {
+  time_point: number
+  image: string
+}
+
+type BootstrapPart = 'info' | 'data' | 'topomap' | 'psd' | 'bands'
+
+export interface DashboardBootstrap {
+  info: EEGInfo | null
+  data: EEGData | null
+  topomap: BootstrapTopomap | null
+  psd: PSDData | null
+  bands: BandData | null
+  loading: Record<BootstrapPart, boolean>
+  error: Error | null
+}
+
+const BOOTSTRAP_PARTS: BootstrapPart[] = ['info', 'data', 'topomap', 'psd', 'bands']
+
+/**
+ * Everything the dashboard shows on mount from one streamed request
+ * /api/eeg-bootstrap sends one NDJSON line per part, so each panel renders as
+ * soon as its part arrives instead of waiting on five separate requests
+ */
+export function useDashboardBootstrap(tmin: number = 0, tmax: number = 10, timePoint: number = 0.01) {
+  const [state, setState] = useState<DashboardBootstrap>({
+    info: null,
+    data: null,
+    topomap: null,
+    psd: null,
+    bands: null,
+    loading: { info: true, data: true, topomap: true, psd: true, bands: true },
+    error: null
+  })
+
+  useEffect(() => {
+    const controller = new AbortController()
+
+    const receive = (line: string) => {
+      const message = JSON.parse(line)
+      if (message.part === 'error') {
+        throw new Error(message.data.error)
+      }
+      setState(prev => ({
+        ...prev,
+        [message.part]: message.data,
+        loading: { ...prev.loading, [message.part]: false }
+      }))
+    }
+
+    const fetchBootstrap = async () => {
+      const params = new URLSearchParams({
+        tmin: String(tmin),
+        tmax: String(tmax),
+        time_point: String(timePoint)
+      })
+
+      // Same 503 backoff as fetchWithRetry while the backend is initializing
+      let response: Response | null = null
+      for (let attempt = 0; attempt <= 3; attempt++) {
+        response = await fetch(`${API_URL}/api/eeg-bootstrap?${params}`, { signal: controller.signal })
+        if (response.status !== 503 || attempt === 3) break
+        const delay = 1000 * Math.pow(2, attempt)
+        console.log(`Backend initializing, retrying in ${delay}ms... (attempt ${attempt + 1}/3)`)
+        await new Promise(resolve => setTimeout(resolve, delay))
+      }
+      if (!response || !response.ok || !response.body) {
+        throw new Error(`Bootstrap request failed with status ${response?.status}`)
+      }
+
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        let newline = buffer.indexOf('\n')
+        while (newline >= 0) {
+          const line = buffer.slice(0, newline).trim()
+          buffer = buffer.slice(newline + 1)
+          if (line) receive(line)
+          newline = buffer.indexOf('\n')
+        }
+      }
+      if (buffer.trim()) receive(buffer.trim())
+    }
+
+    fetchBootstrap()
+      .catch(err => {
+        if (controller.signal.aborted) return
+        console.error('Error fetching dashboard bootstrap:', err)
+        setState(prev => ({
+          ...prev,
+          error: err as Error,
+          loading: Object.fromEntries(BOOTSTRAP_PARTS.map(part => [part, false])) as Record<BootstrapPart, boolean>
+        }))
+      })
+
+    return () => controller.abort()
+  }, [tmin, tmax, timePoint])
+
+  return state
+}